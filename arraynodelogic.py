@@ -5,25 +5,66 @@
 # Features:
 #   - Flags perceptual pole zones with locked centroids
 #   - Ingests samples with exposure-aware logic
+#   - Batch ingestion through the vectorized matcher (batch_matcher.py)
 #   - Assigns neighbor relationships across HSV space
-#   - Logs near-pole hits for diagnostic review
+#   - Logs near-pole hits for diagnostic review: samples within pole_radius of a
+#     pole zone are counted per pole, and only the last NEAR_POLE_KEEP of them
+#     are kept on the node (independent of metrics, so grid data never depends
+#     on instrumentation)
+#   - Caches the anchor table of the last grid ingested without one, so
+#     ingest_sample doesn't repack the whole grid per call
+#   - Latency / sample / near-pole counters through metrics.py when enabled
 # Created by: Craig Wilson / Copilot
-# Last Updated: 2025-09-04
+# Last Updated: 2026-10-17
 # ------------------------------------------------------------
 
 import json
 
+import numpy as np
+
+import metrics
+from batch_matcher import as_hsv_array, build_anchor_table, match_batch, result_records
+
+POLE_RADIUS = 32        # Default L1 HSV distance from a pole zone counted as a near-pole hit
+NEAR_POLE_KEEP = 32     # Most recent near-pole samples kept per pole node
+
+_cached_table = None    # (grid, len(grid), AnchorTable) for the last grid packed here
+
+
+def grid_anchor_table(grid):
+    """
+    build_anchor_table(grid), reused while grid is the same dict with the same
+    number of nodes. Call invalidate_anchor_table() after editing node anchors
+    or color_ids in place; set_pole_zone / assign_neighbors already do.
+    """
+    global _cached_table
+    cached = _cached_table
+    if cached is not None and cached[0] is grid and cached[1] == len(grid):
+        return cached[2]
+    table = build_anchor_table(grid)
+    _cached_table = (grid, len(grid), table)
+    return table
+
+
+def invalidate_anchor_table(grid=None):
+    """Drops the cached anchor table (only if it belongs to grid, when given)."""
+    global _cached_table
+    if grid is None or (_cached_table is not None and _cached_table[0] is grid):
+        _cached_table = None
+
+
 # ----------------------------
 # Pole Zone Setup
 # ----------------------------
 
-def set_pole_zone(grid, h, s, v):
+def set_pole_zone(grid, h, s, v, store=None):
+    invalidate_anchor_table(grid)
     grid[(h, s, v)] = {
         "color_id": None,
         "sample_density": 0,
         "pole_locked": True,
         "neighbors": [],
-        "samples": [],
+        "samples": store.view((h, s, v)) if store is not None else [],
         "near_pole_hits": []
     }
 
@@ -32,15 +73,18 @@ def set_pole_zone(grid, h, s, v):
 # Neighbor Assignment
 # ----------------------------
 
-def assign_neighbors(grid, h, s, v, neighbor_ids):
-    node = grid.setdefault((h, s, v), {
-        "color_id": None,
-        "sample_density": 0,
-        "pole_locked": False,
-        "neighbors": [],
-        "samples": [],
-        "near_pole_hits": []
-    })
+def assign_neighbors(grid, h, s, v, neighbor_ids, store=None):
+    node = grid.get((h, s, v))
+    if node is None:
+        invalidate_anchor_table(grid)
+        node = grid[(h, s, v)] = {
+            "color_id": None,
+            "sample_density": 0,
+            "pole_locked": False,
+            "neighbors": [],
+            "samples": store.view((h, s, v)) if store is not None else [],
+            "near_pole_hits": []
+        }
     node["neighbors"] = neighbor_ids
 
 
@@ -48,7 +92,65 @@ def assign_neighbors(grid, h, s, v, neighbor_ids):
 # Sample Ingestion
 # ----------------------------
 
-def ingest_sample(sample, grid):
+def _log_near_pole_hits(samples, grid, pole_keys, radius=POLE_RADIUS):
+    """
+    Per pole: near_pole_count += hits, near_pole_hits keeps the last
+    NEAR_POLE_KEEP samples. Python only loops over poles that were hit.
+    """
+    poles = np.array(pole_keys, dtype=np.int32).reshape(-1, 3)
+    hsv = as_hsv_array(samples).astype(np.int32)
+    near = np.abs(hsv[:, None, :] - poles[None, :, :]).sum(axis=2) <= radius
+    counts = near.sum(axis=0)
+    for p in np.flatnonzero(counts).tolist():
+        node = grid.get(pole_keys[p])
+        if node is None:
+            continue
+        count = int(counts[p])
+        node["near_pole_count"] = node.get("near_pole_count", 0) + count
+        hits = node.setdefault("near_pole_hits", [])
+        hits.extend(samples[i] for i in np.flatnonzero(near[:, p])[-NEAR_POLE_KEEP:].tolist())
+        del hits[:-NEAR_POLE_KEEP]
+        metrics.inc("near_pole_hits", count, pole=",".join(map(str, pole_keys[p])))
+
+
+@metrics.timed("ingest_batch")
+def ingest_batch(samples, grid, table=None, pole_radius=POLE_RADIUS):
+    """
+    Ingests a batch of HSV samples into the reference grid in one vectorized pass.
+
+    Args:
+        samples (list): [{"h": int, "s": int, "v": int, "source": str}, ...]
+        grid (dict): Reference grid keyed by (h, s, v)
+        table (AnchorTable): Optional prebuilt anchors; defaults to grid_anchor_table(grid)
+        pole_radius (int): L1 HSV distance counted as a near-pole hit
+
+    Returns:
+        list: One ingest_sample() result dict per sample
+    """
+    if table is None:
+        table = grid_anchor_table(grid)
+
+    if not len(table):
+        return [{"color_id": None, "confidence": 0.0, "drift": [0, 0, 0]} for _ in samples]
+
+    metrics.inc("batches", stage="ingest")
+    metrics.inc("samples", len(samples), stage="ingest")
+    color_ids, drift, confidence = match_batch(samples, table)
+
+    if table.pole_keys:
+        _log_near_pole_hits(samples, grid, table.pole_keys, pole_radius)
+
+    # Log samples to nodes keyed by their exact HSV (optional)
+    for sample in samples:
+        node = grid.get((sample["h"], sample["s"], sample["v"]))
+        if node:
+            node.setdefault("samples", []).append(sample)
+
+    return result_records(color_ids, drift, confidence)
+
+
+@metrics.timed("ingest_sample")
+def ingest_sample(sample, grid, table=None):
     """
     Ingests a single HSV sample into the reference grid.
     Anchors it, logs drift, and returns diagnostic result.
@@ -56,6 +158,7 @@ def ingest_sample(sample, grid):
     Args:
         sample (dict): {"h": int, "s": int, "v": int, "source": str}
         grid (dict): Reference grid keyed by (h, s, v)
+        table (AnchorTable): Optional prebuilt anchors; defaults to grid_anchor_table(grid)
 
     Returns:
         dict: {
@@ -64,35 +167,4 @@ def ingest_sample(sample, grid):
             "drift": [int, int, int]
         }
     """
-    h, s, v = sample["h"], sample["s"], sample["v"]
-    source = sample.get("source", "unknown")
-
-    # Step 1: Find closest anchor
-    best_match = None
-    min_drift = float("inf")
-
-    for key, node in grid.items():
-        anchor_h, anchor_s, anchor_v = node["anchor"]
-        drift = [h - anchor_h, s - anchor_s, v - anchor_v]
-        magnitude = sum(abs(d) for d in drift)
-
-        if magnitude < min_drift:
-            min_drift = magnitude
-            best_match = {
-                "color_id": node["color_id"],
-                "drift": drift,
-                "confidence": max(0, 1 - magnitude / 765)  # Normalize over max drift
-            }
-
-    # Step 2: Log sample to node (optional)
-    if best_match:
-        grid_key = (h, s, v)
-        node = grid.get(grid_key)
-        if node:
-            node.setdefault("samples", []).append(sample)
-
-    return best_match or {
-        "color_id": None,
-        "confidence": 0.0,
-        "drift": [0, 0, 0]
-    }
+    return ingest_batch([sample], grid, table)[0]
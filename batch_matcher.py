@@ -0,0 +1,291 @@
+# ------------------------------------------------------------
+# 🧱 Tool: batch_matcher.py
+# Purpose: Vectorized anchor matching for BrickBeast's perceptual color grid
+# Scope: Packs grid anchors into one contiguous array and matches HSV sample batches
+# Features:
+#   - Builds an AnchorTable once from any grid keyed by (h, s, v)
+#   - Builds an AnchorTable from ColorRegistry drift centers
+#   - Matches an (N, 3) HSV array in one call (L1 drift / 765 confidence)
+#   - Processes large batches in chunks so peak memory stays bounded
+#   - Ties resolve to the first anchor in grid order, same as the node loop
+#   - Records pole-zone keys so ingest can log near-pole hits
+#   - match_batch latency recorded under the "match" stage (metrics.py)
+#   - match_topk: exact top-k candidates + best-vs-runner-up margin via argpartition;
+#     with tolerances, a hue-sorted window (searchsorted) settles samples whose
+#     k-th best beats every anchor outside it without a full distance row
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+
+import metrics
+
+MAX_L1_DRIFT = 765          # 3 channels x 255
+NO_COLOR_ID = -1            # Stand-in for color_id None inside integer arrays
+DEFAULT_CHUNK = 4096        # Samples matched per chunk
+TOLERANCE_KEYS = ("hue", "sat", "val")
+
+
+class AnchorTable:
+    """Contiguous anchor arrays packed from a reference grid."""
+
+    def __init__(self, anchors, color_ids, keys=None, pole_keys=(), tolerance=None):
+        self.anchors = np.ascontiguousarray(anchors, dtype=np.float64).reshape(-1, 3)
+        self.color_ids = np.ascontiguousarray(color_ids, dtype=np.int64)
+        self.keys = list(keys) if keys is not None else [None] * len(self.color_ids)
+        self.pole_keys = list(pole_keys)    # Grid keys of set_pole_zone() nodes
+        # Optional (n, 3) per-anchor tolerance box (ColorReference.tolerance)
+        self.tolerance = None if tolerance is None else np.asarray(tolerance, dtype=np.float64).reshape(-1, 3)
+        # Integer anchors keep the distance math exact and cheap
+        self.integral = bool(np.all(self.anchors == np.round(self.anchors)))
+
+    def __len__(self):
+        return len(self.color_ids)
+
+
+def _anchor_hsv(anchor):
+    if isinstance(anchor, dict):
+        return anchor["h"], anchor["s"], anchor["v"]
+    return tuple(anchor)
+
+
+def build_anchor_table(grid):
+    """
+    Packs every anchored node of a grid into an AnchorTable.
+    Nodes without an anchor (pole zones, neighbor stubs) are skipped; pole
+    zone keys are kept separately in pole_keys.
+    """
+    anchors, color_ids, keys, pole_keys = [], [], [], []
+    for key, node in grid.items():
+        anchor = node.get("anchor")
+        if anchor is None:
+            if node.get("pole_locked") and "near_pole_hits" in node:
+                pole_keys.append(key)
+            continue
+        anchors.append(_anchor_hsv(anchor))
+        cid = node.get("color_id")
+        color_ids.append(NO_COLOR_ID if cid is None else cid)
+        keys.append(key)
+    return AnchorTable(np.array(anchors, dtype=np.float64).reshape(-1, 3), color_ids, keys, pole_keys)
+
+
+def anchor_table_from_registry(registry):
+    """Packs ColorRegistry drift centers (or a {color_id: ColorReference} dict) into an AnchorTable."""
+    if hasattr(registry, "anchor_table"):
+        return registry.anchor_table()      # Gathered straight from its PaletteTable
+    refs = registry.registry if hasattr(registry, "registry") else registry
+    anchors = [ref.drift_center for ref in refs.values()]
+    color_ids = [ref.color_id for ref in refs.values()]
+    tolerance = [[ref.tolerance[k] for k in TOLERANCE_KEYS] for ref in refs.values()]
+    return AnchorTable(np.array(anchors, dtype=np.float64).reshape(-1, 3), color_ids, color_ids,
+                       tolerance=np.array(tolerance, dtype=np.float64).reshape(-1, 3))
+
+
+def as_hsv_array(samples):
+    """Accepts an (N, 3) array or a list of {"h", "s", "v"} dicts."""
+    if isinstance(samples, np.ndarray):
+        return samples.reshape(-1, 3)
+    return np.array([[s["h"], s["s"], s["v"]] for s in samples]).reshape(-1, 3)
+
+
+def match_indices(hsv, table, chunk=DEFAULT_CHUNK):
+    """
+    Returns (anchor_index, l1_distance) for every row of an (N, 3) HSV array.
+    anchor_index is -1 when the table is empty.
+    """
+    hsv = as_hsv_array(hsv)
+    n = len(hsv)
+    index = np.full(n, -1, dtype=np.int64)
+    if len(table) == 0:
+        return index, np.full(n, np.inf)
+
+    dtype = np.int32 if table.integral and np.issubdtype(hsv.dtype, np.integer) else np.float64
+    anchors = table.anchors.astype(dtype)
+    magnitude = np.empty(n, dtype=dtype)
+
+    for start in range(0, n, chunk):
+        block = hsv[start:start + chunk].astype(dtype)
+        # Accumulate per channel to avoid a (chunk, anchors, 3) temporary
+        dist = np.abs(block[:, 0, None] - anchors[None, :, 0])
+        dist += np.abs(block[:, 1, None] - anchors[None, :, 1])
+        dist += np.abs(block[:, 2, None] - anchors[None, :, 2])
+        best = np.argmin(dist, axis=1)
+        index[start:start + chunk] = best
+        magnitude[start:start + chunk] = dist[np.arange(len(block)), best]
+
+    return index, magnitude
+
+
+@metrics.timed("match")
+def match_batch(hsv, table, chunk=DEFAULT_CHUNK):
+    """
+    Matches a batch of HSV samples against the anchor table.
+
+    Args:
+        hsv (np.ndarray | list): (N, 3) HSV array or list of sample dicts
+        table (AnchorTable): Packed anchors from build_anchor_table()
+
+    Returns:
+        tuple: (color_ids (N,), drift (N, 3), confidence (N,))
+    """
+    hsv = as_hsv_array(hsv)
+    index, magnitude = match_indices(hsv, table, chunk)
+    n = len(hsv)
+
+    if len(table) == 0:
+        return (np.full(n, NO_COLOR_ID, dtype=np.int64),
+                np.zeros((n, 3), dtype=np.int64),
+                np.zeros(n))
+
+    color_ids = table.color_ids[index]
+    if table.integral and np.issubdtype(hsv.dtype, np.integer):
+        # Signed math so uint8 camera arrays don't wrap
+        drift = hsv.astype(np.int64) - table.anchors[index].astype(np.int64)
+    else:
+        drift = hsv - table.anchors[index]
+    confidence = np.maximum(0, 1 - magnitude / MAX_L1_DRIFT)
+    return color_ids, drift, confidence
+
+
+def _topk_rows(dist, k, integral, index=None):
+    """
+    Column indices of the k smallest per row, sorted, ties to the lower anchor
+    index (guaranteed for integer distances). index[j] is the anchor behind
+    column j; None when the columns are the anchors themselves.
+    """
+    n_cols = dist.shape[1]
+    k = min(k, n_cols)
+    every = np.broadcast_to(np.arange(n_cols), dist.shape)
+    if integral:
+        # Unique integer keys make argpartition break ties exactly like argmin
+        if index is None:
+            key = dist.astype(np.int64) * n_cols + np.arange(n_cols)
+        else:
+            key = dist.astype(np.int64) * (int(index.max()) + 1) + index
+        part = np.argpartition(key, k - 1, axis=1)[:, :k] if k < n_cols else every
+        picked = np.take_along_axis(key, part, axis=1)
+        return np.take_along_axis(part, np.argsort(picked, axis=1), axis=1)
+    part = np.argpartition(dist, k - 1, axis=1)[:, :k] if k < n_cols else every
+    ties = part if index is None else index[part]
+    order = np.lexsort((ties, np.take_along_axis(dist, part, axis=1)), axis=-1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _fill_topk(out_ids, out_dist, rows, dist, top, index, table):
+    """Writes the ranked columns top of dist (column j = anchor index[j], or j) into rows of the result arrays."""
+    out_ids[rows] = table.color_ids[top if index is None else index[top]]
+    out_dist[rows] = np.take_along_axis(dist, top, axis=1).astype(np.float64)
+
+
+@metrics.timed("match_topk")
+def match_topk(hsv, table, k=3, prune=True, chunk=DEFAULT_CHUNK):
+    """
+    Top-k candidate query for a batch of HSV samples.
+
+    Candidates are ranked by full L1 distance over every anchor, so the best
+    candidate is always the match_batch answer. When the table carries
+    tolerances (anchor_table_from_registry) and prune is set, samples and
+    anchors are sorted by hue and each chunk of samples is first ranked against
+    the anchors within the widest hue tolerance of its hue range (searchsorted).
+    Any anchor outside that window is further than that tolerance plus the
+    sample's distance to the chunk's hue edge in hue alone, so a sample whose
+    k-th best window distance is within that bound is settled; the rest fall
+    back to ranking every anchor. The is_within_tolerance
+    box test only reports whether some tolerance box holds the sample.
+
+    Args:
+        hsv (np.ndarray | list): (N, 3) HSV array or list of sample dicts
+        table (AnchorTable): Packed anchors / drift centers
+        k (int): Candidates returned per sample
+
+    Returns:
+        dict: {
+            "color_ids": (N, k) int64, best first (-1 = no candidate),
+            "distance": (N, k) float64 L1 (inf = no candidate),
+            "margin": (N,) runner-up minus best distance (inf = single anchor),
+            "candidates": (N,) anchors whose distance was computed per sample,
+            "in_tolerance": (N,) True when some anchor's tolerance box holds the sample
+        }
+    """
+    hsv = as_hsv_array(hsv)
+    n, n_anchors = len(hsv), len(table)
+    k = max(1, min(k, n_anchors)) if n_anchors else k
+    candidates = np.full(n, n_anchors, dtype=np.int64)
+    in_tolerance = np.zeros(n, dtype=bool)
+    if not n_anchors:
+        return {"color_ids": np.full((n, k), NO_COLOR_ID, dtype=np.int64), "distance": np.full((n, k), np.inf),
+                "margin": np.full(n, np.inf), "candidates": candidates, "in_tolerance": in_tolerance}
+
+    ranked = min(max(k, 2), n_anchors)     # Always rank the runner-up for the margin
+    color_ids = np.full((n, ranked), NO_COLOR_ID, dtype=np.int64)
+    distance = np.full((n, ranked), np.inf)
+    integral = table.integral and np.issubdtype(hsv.dtype, np.integer)
+    dtype = np.int32 if integral else np.float64
+    anchors = table.anchors.astype(dtype)
+    tolerance = table.tolerance if prune else None
+    if tolerance is not None:
+        # Hue-sorted samples and anchors: each chunk first tries the anchor slice
+        # within the widest hue tolerance of its hue range
+        samples = np.argsort(hsv[:, 0], kind="stable")
+        by_hue = np.argsort(anchors[:, 0], kind="stable")
+        hues = anchors[by_hue, 0]
+        reach = tolerance[:, 0].max()
+
+    for start in range(0, n, chunk):
+        rows = slice(start, start + chunk) if tolerance is None else samples[start:start + chunk]
+        block = hsv[rows].astype(dtype)
+        fallback = rows
+
+        if tolerance is not None:
+            lo = np.searchsorted(hues, block[0, 0] - reach, side="left")
+            hi = np.searchsorted(hues, block[-1, 0] + reach, side="right")
+            window = by_hue[lo:hi]
+            box = np.ones((len(block), len(window)), dtype=bool)
+            dist = np.zeros((len(block), len(window)), dtype=dtype)
+            for c in range(3):
+                diff = np.abs(block[:, c, None] - anchors[None, window, c])
+                dist += diff
+                box &= diff <= tolerance[None, window, c]
+            # Boxes outside the window cannot hold the sample: its hue is beyond every hue tolerance
+            in_tolerance[rows] = box.any(axis=1)
+
+            settled = np.zeros(len(block), dtype=bool)
+            if len(window) >= ranked:
+                top = _topk_rows(dist, ranked, integral, window)
+                # Hue gap to the nearest anchor left out of the window, per sample
+                bound = reach + np.minimum(block[:, 0] - block[0, 0], block[-1, 0] - block[:, 0])
+                settled = np.take_along_axis(dist, top[:, -1:], axis=1)[:, 0] <= bound
+                if settled.any():
+                    candidates[rows[settled]] = len(window)
+                    _fill_topk(color_ids, distance, rows[settled], dist[settled], top[settled], window, table)
+            fallback = rows[~settled]
+            block = block[~settled]
+
+        if len(block):
+            dist = np.zeros((len(block), n_anchors), dtype=dtype)
+            for c in range(3):
+                diff = np.abs(block[:, c, None] - anchors[None, :, c])
+                dist += diff
+            _fill_topk(color_ids, distance, fallback, dist, _topk_rows(dist, ranked, integral), None, table)
+
+    margin = distance[:, 1] - distance[:, 0] if ranked > 1 else np.full(n, np.inf)
+    return {"color_ids": color_ids[:, :k], "distance": distance[:, :k], "margin": margin,
+            "candidates": candidates, "in_tolerance": in_tolerance}
+
+
+def ambiguous(result, min_margin):
+    """Samples of a match_topk() result whose best match is within min_margin of the runner-up."""
+    return result["margin"] < min_margin
+
+
+def result_records(color_ids, drift, confidence):
+    """Expands batch arrays into the per-sample result dicts used by ingest_sample."""
+    return [
+        {
+            "color_id": None if cid == NO_COLOR_ID else cid,
+            "drift": d,
+            "confidence": c
+        }
+        for cid, d, c in zip(color_ids.tolist(), drift.tolist(), confidence.tolist())
+    ]
@@ -0,0 +1,328 @@
+# ------------------------------------------------------------
+# 🧱 Tool: benchmark_suite.py
+# Purpose: Benchmarks BrickBeast's ingest, area array, calibration and persistence hot paths
+# Scope: Generates synthetic samples around bricklink_colours.json anchors, times each
+#        hot path at several sizes, records peak memory, and compares against a baseline
+# Features:
+#   - Gaussian sample clouds around palette anchors, 1e3 – 1e7 samples
+#   - Times ingest_sample, ingest_batch, load_area_array, ColorRegistry.calibrate,
+#     ColorNode.add_sample and grid save/load (JSON and binary snapshot)
+#   - Peak Python memory per case via tracemalloc (separate, untimed run)
+#   - Each case's time is the median of --repeat runs, so one noisy run can't
+#     trip (or hide) a regression
+#   - Compares against the committed reference benchmark_baseline.json and fails
+#     (exit 1) on regressions beyond a threshold; a missing baseline is an error
+#     (exit 2), never silently recreated; --update-baseline rewrites it
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from arraynodelogic import ingest_batch, ingest_sample
+from batch_matcher import build_anchor_table
+from color_node import ColorNode
+from colorreferance import ColorRegistry
+from grid_presistence import load_grid_json, load_grid_snapshot, save_grid_json, save_grid_snapshot
+from load_area_array import load_area_array
+from palette_table import PaletteTable
+from reference_loader import build_reference_grid, load_bricklink_colours
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.25    # Fractional slowdown / memory growth counted as a regression
+DEFAULT_REPEAT = 5
+DEFAULT_SIGMA = 6.0         # HSV units of spread around each anchor
+HUE_PERIOD = 180            # bricklink_colours.json uses OpenCV hue
+
+
+# ----------------------------
+# Synthetic Samples
+# ----------------------------
+
+def generate_samples(palette, n, sigma=DEFAULT_SIGMA, seed=0):
+    """
+    Gaussian clouds around the palette's hsv anchors.
+
+    Returns:
+        tuple: (hsv (n, 3) uint8, anchor index per sample (n,))
+    """
+    anchors = np.array([entry["hsv"] for entry in palette.values()], dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    which = rng.integers(0, len(anchors), n)
+    hsv = anchors[which] + rng.normal(0, sigma, (n, 3))
+    hsv[:, 0] %= HUE_PERIOD
+    return np.clip(np.rint(hsv), 0, 255).astype(np.uint8), which
+
+
+def sample_dicts(hsv, source="cam_bench"):
+    return [{"h": h, "s": s, "v": v, "source": source} for h, s, v in hsv.tolist()]
+
+
+def registry_file(palette, path, seed=0):
+    """Writes a ColorReference.json-style registry with jittered drift centers."""
+    rng = np.random.default_rng(seed)
+    entries = []
+    for entry in palette.values():
+        center = [float(c) for c in entry["hsv"]]
+        entries.append({
+            "color_id": entry["colourID"],
+            "color_name": entry["colourName"],
+            "reset_center": center,
+            "anchor_center": center,
+            "drift_center": (np.array(center) + rng.normal(0, 1.5, 3)).tolist(),
+            "max_drift": 6.0,
+            "tolerance": {"hue": 12, "sat": 20, "val": 25},
+        })
+    with open(path, "w") as f:
+        json.dump(entries, f)
+    return path
+
+
+# ----------------------------
+# Cases
+# ----------------------------
+# Each case is setup(ctx, n) → run(); only run() is timed
+
+def _case_ingest_sample(ctx, n):
+    samples = sample_dicts(ctx["hsv"][:n])
+    grid = build_reference_grid(ctx["palette"])
+    table = build_anchor_table(grid)
+
+    def run():
+        for sample in samples:
+            ingest_sample(sample, grid, table)
+    return run
+
+
+def _case_ingest_batch(ctx, n):
+    samples = sample_dicts(ctx["hsv"][:n])
+    grid = build_reference_grid(ctx["palette"])
+    table = build_anchor_table(grid)
+    return lambda: ingest_batch(samples, grid, table)
+
+
+def _case_load_area_array(ctx, n):
+    samples = sample_dicts(ctx["hsv"][:n])
+    return lambda: load_area_array(samples, {})
+
+
+def _case_calibrate(ctx, n):
+    registry = ColorRegistry(ctx["registry_path"])
+    initial = {cid: ref.drift_center.copy() for cid, ref in registry.registry.items()}
+
+    def run():
+        for cid, ref in registry.registry.items():
+            ref.drift_center = initial[cid].copy()
+        registry.calibrate()
+    return run
+
+
+def _case_color_node(ctx, n):
+    entries = list(ctx["palette"].values())
+    table = PaletteTable(capacity=len(entries))
+    nodes = [ColorNode(e["colourID"], e["colourName"], e["rgb"], e["hsv"], e["type"],
+                       {"hue": 12, "sat": 20, "val": 25}, 6.0, table=table) for e in entries]
+    pairs = list(zip(ctx["which"][:n].tolist(), ctx["hsv"][:n].tolist()))
+
+    def run():
+        for i, sample in pairs:
+            nodes[i].add_sample(sample)
+    return run
+
+
+def _loaded_grid(ctx, n):
+    grid = build_reference_grid(ctx["palette"])
+    load_area_array(sample_dicts(ctx["hsv"][:n]), grid)
+    return grid
+
+
+def _case_grid_save_json(ctx, n):
+    grid = _loaded_grid(ctx, n)
+    path = os.path.join(ctx["tmpdir"], f"grid_{n}.json")
+    return lambda: save_grid_json(path, grid)
+
+
+def _case_grid_load_json(ctx, n):
+    path = os.path.join(ctx["tmpdir"], f"grid_{n}.json")
+    save_grid_json(path, _loaded_grid(ctx, n))
+    return lambda: load_grid_json(path)
+
+
+def _case_grid_save_snapshot(ctx, n):
+    grid = _loaded_grid(ctx, n)
+    path = os.path.join(ctx["tmpdir"], f"grid_{n}.bbgrid")
+    return lambda: save_grid_snapshot(path, grid)
+
+
+def _case_grid_load_snapshot(ctx, n):
+    path = os.path.join(ctx["tmpdir"], f"grid_{n}.bbgrid")
+    save_grid_snapshot(path, _loaded_grid(ctx, n))
+    return lambda: load_grid_snapshot(path).to_grid()
+
+
+# name: (setup, scales_with_n)
+CASES = {
+    "ingest_sample": (_case_ingest_sample, True),
+    "ingest_batch": (_case_ingest_batch, True),
+    "load_area_array": (_case_load_area_array, True),
+    "calibrate": (_case_calibrate, False),
+    "color_node_add_sample": (_case_color_node, True),
+    "grid_save_json": (_case_grid_save_json, True),
+    "grid_load_json": (_case_grid_load_json, True),
+    "grid_save_snapshot": (_case_grid_save_snapshot, True),
+    "grid_load_snapshot": (_case_grid_load_snapshot, True),
+}
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+
+def measure(setup, ctx, n, repeat=DEFAULT_REPEAT, memory=True):
+    """Median and best of repeat wall times, then one tracemalloc run for peak memory."""
+    times = []
+    for _ in range(max(1, repeat)):
+        run = setup(ctx, n)
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        run = setup(ctx, n)
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"seconds": float(np.median(times)), "best_seconds": min(times), "peak_bytes": peak}
+
+
+def run_suite(sizes=DEFAULT_SIZES, cases=None, repeat=DEFAULT_REPEAT, memory=True,
+              palette_path="bricklink_colours.json", log=print):
+    """
+    Returns:
+        dict: {"meta": {...}, "results": {"<case>@<n>": {"seconds" (median), "best_seconds",
+              "peak_bytes", "samples"}}}
+    """
+    palette = load_bricklink_colours(palette_path)
+    sizes = sorted(int(n) for n in sizes)
+    hsv, which = generate_samples(palette, max(sizes))
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ctx = {
+            "palette": palette, "hsv": hsv, "which": which, "tmpdir": tmpdir,
+            "registry_path": registry_file(palette, os.path.join(tmpdir, "ColorReference.json")),
+        }
+        for name in cases or CASES:
+            setup, scales = CASES[name]
+            for n in (sizes if scales else [len(palette)]):
+                key = f"{name}@{n}"
+                result = measure(setup, ctx, n, repeat, memory)
+                result["samples"] = n
+                results[key] = result
+                peak = f"{result['peak_bytes'] / 2**20:8.1f} MB" if result["peak_bytes"] is not None else ""
+                log(f"  {key:<32} {result['seconds']:10.4f} s  "
+                    f"{result['seconds'] / n * 1e6:9.2f} µs/sample  {peak}")
+
+    meta = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "sizes": sizes,
+        "repeat": repeat,
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares median times (and peak memory); cases missing from the baseline
+    are skipped, see uncovered().
+
+    Returns:
+        list: [(key, metric, baseline_value, current_value), ...] regressions
+    """
+    regressions = []
+    for key, result in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            old, new = base.get(metric), result.get(metric)
+            if old and new is not None and new > old * (1 + threshold):
+                regressions.append((key, metric, old, new))
+    return regressions
+
+
+def uncovered(current, baseline):
+    """Case keys that ran but have no baseline entry to compare against."""
+    return sorted(set(current["results"]) - set(baseline.get("results", {})))
+
+
+def environment_changes(current, baseline):
+    """Meta fields (python, numpy, machine) that differ from the baseline's."""
+    old = baseline.get("meta", {})
+    return {key: (old.get(key), current["meta"][key]) for key in ("python", "numpy", "machine")
+            if old.get(key) != current["meta"][key]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="BrickBeast hot-path benchmarks")
+    parser.add_argument("--sizes", nargs="+", type=float, default=DEFAULT_SIZES,
+                        help="sample counts, e.g. 1e3 1e5 1e7")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), help="subset of cases to run")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="timed runs per case; the median is compared")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="write this run as the new baseline instead of comparing")
+    args = parser.parse_args(argv)
+
+    if not args.update_baseline and not os.path.exists(args.baseline):
+        print(f"ERROR: baseline {args.baseline} not found; nothing to compare against. "
+              f"Restore the committed one or run with --update-baseline.", file=sys.stderr)
+        return 2
+
+    current = run_suite(args.sizes, args.cases, args.repeat, not args.no_memory)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    for key, (old, new) in environment_changes(current, baseline).items():
+        print(f"WARNING: baseline {key} is {old}, this run {new}; timings may not be comparable")
+    missing = uncovered(current, baseline)
+    if missing:
+        print(f"WARNING: no baseline for {', '.join(missing)}; not compared")
+    regressions = compare(current, baseline, args.threshold)
+    for key, metric, old, new in regressions:
+        print(f"REGRESSION {key} {metric}: {old:.4g} → {new:.4g} (+{(new / old - 1):.0%})")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# ------------------------------------------------------------
+# 🧱 Tool: camera_correction.py
+# Purpose: Per-camera colour correction applied before BrickBeast matching
+# Scope: Fits, caches, saves and applies one correction per sample "source"
+# Features:
+#   - Affine correction (3x3 matrix + offset) fitted by least squares from
+#     reference samples of known BrickLink colours
+#   - Optional per-camera 3D LUT (G x G x G x 3) with trilinear lookup; in HSV
+#     mode its hue axis spans one HUE_PERIOD and wraps, and corner hues are
+#     interpolated across the seam rather than through the middle of the wheel
+#   - Affine path is cached as three 256-entry per-channel tables, so applying
+#     it is three lookups + one add per pixel, done in place on uint8 arrays
+#   - HSV mode wraps hue (OpenCV 0–180) instead of clipping it
+#   - Cached channel tables are keyed on the matrix and offset, so editing
+#     either (in place or by assignment) rebuilds them
+#   - Batch mode corrects mixed-camera arrays grouped by source id
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import json
+import os
+
+import numpy as np
+
+HUE_PERIOD = 180        # OpenCV hue scale used by bricklink_colours.json
+CHUNK = 1 << 20         # Pixels corrected per pass
+
+
+class CameraCorrection:
+    def __init__(self, matrix=None, offset=None, lut=None, space="rgb"):
+        if space not in ("rgb", "hsv"):
+            raise ValueError(f"Unknown color space: {space}")
+        self.matrix = np.eye(3) if matrix is None else np.asarray(matrix, dtype=np.float64)
+        self.offset = np.zeros(3) if offset is None else np.asarray(offset, dtype=np.float64)
+        self.lut = None if lut is None else np.asarray(lut, dtype=np.float32)
+        self.space = space
+        self._tables = None
+        self._tables_key = None
+
+    # ----------------------------
+    # Fitting
+    # ----------------------------
+
+    @classmethod
+    def fit(cls, measured, reference, space="rgb"):
+        """
+        Least-squares affine fit mapping measured camera values onto reference values.
+
+        Args:
+            measured (np.ndarray): (N, 3) values seen by this camera
+            reference (np.ndarray): (N, 3) known values for the same samples
+        """
+        measured = np.asarray(measured, dtype=np.float64).reshape(-1, 3)
+        reference = np.asarray(reference, dtype=np.float64).reshape(-1, 3).copy()
+        if len(measured) < 4:
+            raise ValueError("Need at least 4 reference samples to fit a correction")
+        if space == "hsv":
+            # Unwrap reference hue next to measured hue so reds don't fit across the seam
+            gap = (reference[:, 0] - measured[:, 0] + HUE_PERIOD / 2) % HUE_PERIOD - HUE_PERIOD / 2
+            reference[:, 0] = measured[:, 0] + gap
+
+        design = np.hstack([measured, np.ones((len(measured), 1))])
+        solution, *_ = np.linalg.lstsq(design, reference, rcond=None)
+        return cls(matrix=solution[:3].T, offset=solution[3], space=space)
+
+    @classmethod
+    def fit_from_palette(cls, measured, color_ids, palette, space="rgb"):
+        """Fits against bricklink_colours.json entries: palette[str(color_id)][space]."""
+        reference = [palette[str(cid)][space] for cid in color_ids]
+        return cls.fit(measured, reference, space)
+
+    # ----------------------------
+    # Applying
+    # ----------------------------
+
+    def _channel_tables(self):
+        # T[c][x] = matrix[:, c] * x, so corrected = T[0][x0] + T[1][x1] + T[2][x2] + offset
+        key = self.matrix.tobytes() + self.offset.tobytes()
+        if self._tables is None or key != self._tables_key:
+            self._tables_key = key
+            levels = np.arange(256, dtype=np.float32)[:, None]
+            self._tables = [levels * self.matrix[:, c].astype(np.float32) for c in range(3)]
+            self._tables[0] = self._tables[0] + self.offset.astype(np.float32)
+        return self._tables
+
+    def _finish(self, values, out):
+        if self.space == "hsv":
+            values[:, 0] = np.mod(np.rint(values[:, 0]), HUE_PERIOD)
+            np.clip(values[:, 1:], 0, 255, out=values[:, 1:])
+        else:
+            np.clip(values, 0, 255, out=values)
+        np.rint(values, out=values)
+        out[...] = values
+
+    def _apply_lut(self, pixels):
+        grid = self.lut.shape[0]
+        hsv = self.space == "hsv"
+        pos = pixels.astype(np.float32) * ((grid - 1) / 255.0)
+        base = np.minimum(pos.astype(np.int64), grid - 2)
+        if hsv:
+            # Hue cell i sits at i * HUE_PERIOD / grid; the last cell wraps onto the first
+            pos[:, 0] = np.mod(pixels[:, 0], HUE_PERIOD) * np.float32(grid / HUE_PERIOD)
+            base[:, 0] = np.minimum(pos[:, 0].astype(np.int64), grid - 1)
+        frac = pos - base
+        result = np.zeros(pixels.shape, dtype=np.float32)
+        for corner in range(8):
+            bits = np.array([(corner >> 2) & 1, (corner >> 1) & 1, corner & 1])
+            weight = np.prod(np.where(bits, frac, 1 - frac), axis=1)
+            idx = base + bits
+            if hsv:
+                idx[:, 0] %= grid
+            value = self.lut[idx[:, 0], idx[:, 1], idx[:, 2]]
+            if hsv:
+                # Unwrap each corner's hue next to the first corner's before blending
+                if corner == 0:
+                    ref = value[:, 0].copy()
+                else:
+                    value[:, 0] = ref + (value[:, 0] - ref + HUE_PERIOD / 2) % HUE_PERIOD - HUE_PERIOD / 2
+            result += weight[:, None] * value
+        return result
+
+    def apply(self, values, out=None):
+        """
+        Corrects a (..., 3) uint8 array. Pass out=values to correct in place.
+        Returns the corrected array.
+        """
+        values = np.asarray(values)
+        if values.dtype != np.uint8:
+            raise TypeError("Camera correction expects uint8 arrays")
+        if out is None:
+            out = np.empty_like(values)
+        flat_in = values.reshape(-1, 3)
+        flat_out = out.reshape(-1, 3)
+
+        for start in range(0, len(flat_in), CHUNK):
+            pixels = flat_in[start:start + CHUNK]
+            if self.lut is not None:
+                corrected = self._apply_lut(pixels)
+            else:
+                t0, t1, t2 = self._channel_tables()
+                corrected = t0[pixels[:, 0]] + t1[pixels[:, 1]] + t2[pixels[:, 2]]
+            self._finish(corrected, flat_out[start:start + CHUNK])
+        return out
+
+    def to_dict(self):
+        data = {"space": self.space, "matrix": self.matrix.tolist(), "offset": self.offset.tolist()}
+        if self.lut is not None:
+            data["lut"] = self.lut.tolist()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("matrix"), data.get("offset"), data.get("lut"), data.get("space", "rgb"))
+
+
+class CorrectionRegistry:
+    """Corrections keyed by sample "source"; sources without one pass through untouched."""
+
+    def __init__(self, corrections=None):
+        self.corrections = dict(corrections or {})
+
+    def __contains__(self, source):
+        return source in self.corrections
+
+    def set(self, source, correction):
+        self.corrections[source] = correction
+
+    def correct(self, values, source, in_place=True):
+        correction = self.corrections.get(source)
+        if correction is None:
+            return values
+        return correction.apply(values, out=values if in_place else None)
+
+    def correct_sample(self, sample):
+        """Corrects one {"h", "s", "v", "source"} dict; returns a new dict."""
+        correction = self.corrections.get(sample.get("source"))
+        if correction is None:
+            return dict(sample)
+        hsv = correction.apply(np.array([[sample["h"], sample["s"], sample["v"]]], dtype=np.uint8))[0]
+        h, s, v = hsv.tolist()
+        return {**sample, "h": h, "s": s, "v": v}
+
+    def correct_batch(self, values, source_ids, sources):
+        """
+        Corrects a mixed-camera (N, 3) uint8 array in place.
+
+        Args:
+            source_ids (np.ndarray): (N,) index into sources for each row
+            sources (list): Source names, e.g. SampleStore.sources
+        """
+        source_ids = np.asarray(source_ids)
+        for sid in np.unique(source_ids).tolist():
+            correction = self.corrections.get(sources[sid])
+            if correction is None:
+                continue
+            rows = np.flatnonzero(source_ids == sid)
+            values[rows] = correction.apply(values[rows])
+        return values
+
+    def save(self, filepath):
+        tmp = f"{filepath}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({src: c.to_dict() for src, c in self.corrections.items()}, f, indent=2)
+        os.replace(tmp, filepath)
+
+    @classmethod
+    def load(cls, filepath):
+        if not os.path.exists(filepath):
+            return cls()
+        with open(filepath, "r") as f:
+            return cls({src: CameraCorrection.from_dict(d) for src, d in json.load(f).items()})
@@ -7,12 +7,16 @@
 #   - Updates metadata entries by color_id
 #   - Retrieves metadata for diagnostic use
 #   - Saves updated metadata to disk
+#   - load_color_store(): shared SQLite store (color_metadata_store.py) seeded
+#     from the JSON file, for multi-process use without whole-file rewrites
 # Created by: Craig Wilson / Copilot
-# Last Updated: 2025-09-04
+# Last Updated: 2026-10-17
 # ------------------------------------------------------------
 import json
 import os
 
+from color_metadata_store import DEFAULT_DB, ColorMetadataStore
+
 def load_color_table(filepath):
     if os.path.exists(filepath):
         with open(filepath, "r") as f:
@@ -30,3 +34,10 @@ def update_color_metadata(color_table, color_id, metadata):
 
 def get_color_metadata(color_table, color_id):
     return color_table.get(str(color_id), {})
+
+def load_color_store(filepath, db_path=DEFAULT_DB):
+    # Same data as load_color_table(), but updates are per-entry upserts, not a full rewrite
+    store = ColorMetadataStore(db_path)
+    if not len(store) and os.path.exists(filepath):
+        store.import_json(filepath)
+    return store
@@ -0,0 +1,258 @@
+# ------------------------------------------------------------
+# 🧱 Tool: color_metadata_store.py
+# Purpose: Shared, indexed colour metadata store for BrickBeast
+# Scope: SQLite (WAL) replacement for colorTable's whole-file JSON rewrite;
+#        joins BrickLink names / types, store SKUs and calibration notes by color_id
+# Features:
+#   - One row per (color_id, section), so processes updating different sections
+#     (e.g. "BrickLink", "Store", "Calibration") never overwrite each other
+#   - color_id primary key plus a case-insensitive name index
+#   - WAL mode + busy timeout: many readers and one writer across processes
+#   - Batched upserts in a single transaction (executemany)
+#   - Fixed SQL strings, so reads reuse sqlite3's prepared-statement cache
+#   - In-process LRU of parsed metadata for hot lookups; get() hands out copies.
+#     Other processes' commits are noticed via PRAGMA data_version, checked at
+#     most every check_interval seconds (and once per get_many batch)
+#   - Imports / exports the colorTable JSON layout ({color_id: {section: value}})
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_DB = "color_metadata.db"
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_TIMEOUT = 30.0      # Seconds to wait on another process's write lock
+DEFAULT_CHECK_INTERVAL = 0.05   # Seconds an external commit may go unnoticed by cached reads
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS color_metadata (
+    color_id INTEGER NOT NULL,
+    section  TEXT NOT NULL,
+    value    TEXT NOT NULL,
+    PRIMARY KEY (color_id, section)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS color_names (
+    color_id INTEGER PRIMARY KEY,
+    name     TEXT,
+    type     TEXT
+);
+CREATE INDEX IF NOT EXISTS color_names_name ON color_names (name COLLATE NOCASE);
+"""
+
+_SELECT_ONE = "SELECT section, value FROM color_metadata WHERE color_id = ?"
+_SELECT_ALL = "SELECT color_id, section, value FROM color_metadata ORDER BY color_id"
+_SELECT_BY_NAME = "SELECT color_id FROM color_names WHERE name = ? COLLATE NOCASE ORDER BY color_id"
+_UPSERT = """
+INSERT INTO color_metadata (color_id, section, value) VALUES (?, ?, ?)
+ON CONFLICT (color_id, section) DO UPDATE SET value = excluded.value
+"""
+_UPSERT_NAME = """
+INSERT INTO color_names (color_id, name, type) VALUES (?, ?, ?)
+ON CONFLICT (color_id) DO UPDATE SET
+    name = coalesce(excluded.name, name),
+    type = coalesce(excluded.type, type)
+"""
+
+
+def _name_fields(metadata):
+    """(name, type) from a metadata update: BrickLink section first, then top-level keys."""
+    source = metadata.get("BrickLink")
+    if not isinstance(source, dict):
+        source = metadata
+    return source.get("name"), source.get("type")
+
+
+def _copy_json(value):
+    """Deep copy of a json.loads() value; about twice as fast as copy.deepcopy."""
+    if isinstance(value, dict):
+        return {key: _copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
+class ColorMetadataStore:
+    """
+    Usage:
+        with ColorMetadataStore("color_metadata.db") as store:
+            store.update(5, {"Store": {"sku": "RED-01"}})
+            store.get(5)               # {"BrickLink": {...}, "Store": {...}}
+            store.find_by_name("Red")  # [5]
+    """
+
+    def __init__(self, path=DEFAULT_DB, cache_size=DEFAULT_CACHE_SIZE, timeout=DEFAULT_TIMEOUT,
+                 check_interval=DEFAULT_CHECK_INTERVAL):
+        self.path = path
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False,
+                                     isolation_level=None, cached_statements=64)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._data_version = self._read_data_version()
+        self._checked = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT count(DISTINCT color_id) FROM color_metadata").fetchone()[0]
+
+    # ----------------------------
+    # Reads
+    # ----------------------------
+
+    def _read_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _check_external_writes(self, force=False):
+        # data_version only moves when *another* connection commits; our own
+        # writes evict their entries directly, so polling it can be throttled
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        version = self._read_data_version()
+        if version != self._data_version:
+            self._data_version = version
+            self._cache.clear()
+
+    def _lookup(self, color_id):
+        metadata = self._cache.get(color_id)
+        if metadata is None:
+            rows = self._conn.execute(_SELECT_ONE, (color_id,)).fetchall()
+            metadata = {section: json.loads(value) for section, value in rows}
+            self._remember(color_id, metadata)
+        else:
+            self._cache.move_to_end(color_id)
+        return metadata
+
+    def get(self, color_id, copy=True):
+        """
+        Metadata dict for color_id ({} when unknown). Returns a copy; with
+        copy=False the shared cached dict is returned and must not be mutated.
+        """
+        color_id = int(color_id)
+        with self._lock:
+            self._check_external_writes()
+            metadata = self._lookup(color_id)
+        return _copy_json(metadata) if copy else metadata
+
+    def get_many(self, color_ids, copy=True):
+        """{color_id: metadata} with one external-write check for the whole batch."""
+        with self._lock:
+            self._check_external_writes(force=True)
+            found = {int(cid): self._lookup(int(cid)) for cid in color_ids}
+        if copy:
+            found = {cid: _copy_json(metadata) for cid, metadata in found.items()}
+        return found
+
+    def find_by_name(self, name):
+        """color_ids whose BrickLink name matches (case-insensitive)."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(_SELECT_BY_NAME, (name,))]
+
+    def _remember(self, color_id, metadata):
+        if self.cache_size <= 0:
+            return
+        self._cache[color_id] = metadata
+        self._cache.move_to_end(color_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # ----------------------------
+    # Writes
+    # ----------------------------
+
+    def update(self, color_id, metadata):
+        """Same merge as colorTable.update_color_metadata: top-level sections replace."""
+        self.upsert_many([(color_id, metadata)])
+        return self.get(color_id)
+
+    def upsert_many(self, items):
+        """
+        Merges many (color_id, metadata) pairs in one transaction.
+
+        Returns:
+            int: Number of color_ids written
+        """
+        rows, names, touched = [], [], set()
+        for color_id, metadata in items:
+            color_id = int(color_id)
+            touched.add(color_id)
+            rows.extend((color_id, section, json.dumps(value)) for section, value in metadata.items())
+            name, type_ = _name_fields(metadata)
+            if name is not None or type_ is not None:
+                names.append((color_id, name, type_))
+        if not rows:
+            return 0
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(_UPSERT, rows)
+                if names:
+                    self._conn.executemany(_UPSERT_NAME, names)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            for color_id in touched:
+                self._cache.pop(color_id, None)
+        return len(touched)
+
+    def delete(self, color_id):
+        color_id = int(color_id)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM color_metadata WHERE color_id = ?", (color_id,))
+                self._conn.execute("DELETE FROM color_names WHERE color_id = ?", (color_id,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._cache.pop(color_id, None)
+
+    # ----------------------------
+    # JSON Layout
+    # ----------------------------
+
+    def import_json(self, source):
+        """Loads a colorTable / bricklink_metadata.json file (or dict) into the store."""
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "r") as f:
+                source = json.load(f)
+        return self.upsert_many(source.items())
+
+    def to_dict(self):
+        """Whole store in the colorTable JSON layout: {str(color_id): {section: value}}."""
+        table = {}
+        with self._lock:
+            for color_id, section, value in self._conn.execute(_SELECT_ALL):
+                table.setdefault(str(color_id), {})[section] = json.loads(value)
+        return table
+
+    def export_json(self, filepath):
+        """Writes to_dict() atomically (temp file + rename)."""
+        tmp = f"{filepath}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, filepath)
@@ -7,8 +7,15 @@
 # Scope:
 #   - Stores color anchors and drift center
 #   - Ingests samples, updates drift and confidence
+#   - Streaming confidence statistics with one bounded raw-sample ring buffer
+#   - confidence_avg is the mean distance at ingest over the retained samples,
+#     kept as a running window sum (O(1) per sample); the RMS distance of every
+#     sample to the current center is exposed separately as confidence_rms
 #   - Supports tolerance checks and drift locking
 #   - Links metadata for diagnostics
+#   - add_sample latency and drift outcomes recorded through metrics.py when enabled
+#   - __slots__ view onto a PaletteTable row (palette_table.py): anchors, drift center,
+#     tolerance, max_drift and lock flag live in shared arrays
 #
 # Linked Files:
 #   - Imports: colorreferance.py (legacy logic), colorTable.py (metadata), reference_loader.py (data loader),
@@ -23,55 +30,156 @@
 #
 # Notes:
 #   - No weighing by color amount; matching is by confidence.
-#   - Consensus color ID is reached after multiple images.
+#   - Consensus color ID is reached after multiple images (consensus.py).
 #   - Masking logic is handled in a separate module.
 #
 # Author: Craig Wilson / Copilot
-# Last Updated: 2025-09-05
+# Last Updated: 2026-10-17
+
+import math
 
 import numpy as np
 
-class ColorNode:
-    def __init__(self, color_id, name, rgb_anchor, hsv_anchor, type_, tolerance, max_drift, metadata=None):
+import metrics
+from palette_table import TableColumn, TableRowView, ToleranceColumn, tolerance_dict
+
+DEFAULT_SAMPLE_BUFFER = 256  # Raw samples kept per node; 0 keeps none
+
+class ColorNode(TableRowView):
+    __slots__ = ("_table", "_row", "color_id", "name", "type", "confidence_avg", "metadata",
+                 "sample_count", "_sample_mean", "_sample_m2", "distance_mean", "_distance_m2",
+                 "_ring", "_ring_distance", "_ring_distance_sum", "_ring_size", "_ring_pos")
+
+    rgb_anchor = TableColumn("rgb")
+    hsv_anchor = TableColumn("anchor")
+    drift_center = TableColumn("drift_center")
+    last_drift_vector = TableColumn("last_drift_vector")
+    tolerance = ToleranceColumn()   # {"hue", "sat", "val"} view onto the table row
+    max_drift = TableColumn("max_drift", float)
+    drift_locked = TableColumn("locked", bool)
+
+    def __init__(self, color_id, name, rgb_anchor, hsv_anchor, type_, tolerance, max_drift, metadata=None,
+                 sample_buffer=DEFAULT_SAMPLE_BUFFER, table=None):
         self.color_id = color_id
         self.name = name
-        self.rgb_anchor = np.array(rgb_anchor, dtype=float)
-        self.hsv_anchor = np.array(hsv_anchor, dtype=float)
         self.type = type_
-        self.tolerance = tolerance  # dict: {"hue": int, "sat": int, "val": int}
-        self.max_drift = max_drift
-        self.samples = []
-        self.drift_center = self.hsv_anchor.copy()
-        self.drift_locked = False
+        # Pass one PaletteTable for a whole palette; a lone node gets a STANDALONE_TABLE row
+        self._bind(table, color_id, anchor=hsv_anchor, rgb=rgb_anchor,
+                   tolerance=tolerance, max_drift=max_drift)
         self.confidence_avg = 1.0
-        self.last_drift_vector = np.zeros(3)
         self.metadata = metadata or {}
 
-    def add_sample(self, hsv_sample):
-        self.samples.append(hsv_sample)
-        if not self.drift_locked and self.is_within_tolerance(hsv_sample):
-            self.apply_drift(hsv_sample)
+        # Streaming statistics (constant memory, O(1) per sample)
+        self.sample_count = 0
+        self._sample_mean = np.zeros(3)     # Running mean of all samples
+        self._sample_m2 = 0.0               # Running sum of squared deviations from that mean
+        self.distance_mean = 0.0            # Running mean of distance to drift_center at ingest
+        self._distance_m2 = 0.0
+        self._ring = np.empty((sample_buffer, 3))      # Most recent raw samples only
+        self._ring_distance = np.empty(sample_buffer)  # Their distance to drift_center at ingest
+        self._ring_distance_sum = 0.0
+        self._ring_size = 0
+        self._ring_pos = 0
+
+    @metrics.timed("color_node_add_sample")
+    def add_sample(self, hsv_sample, dampener=0.2):
+        sample = np.array(hsv_sample, dtype=float)
+        self._update_statistics(sample)
+        if self.drift_locked:
+            metrics.inc("node_drift", outcome="locked")
+        elif self.is_within_tolerance(sample):
+            self.apply_drift(sample, dampener)
+            metrics.inc("node_drift", outcome="applied")
+        else:
+            metrics.inc("node_drift", outcome="out_of_tolerance")
         self.update_confidence()
 
     def is_within_tolerance(self, sample_hsv):
-        sample = np.array(sample_hsv, dtype=float)
-        return all(
-            abs(sample[i] - self.drift_center[i]) <= self.tolerance[key]
-            for i, key in enumerate(["hue", "sat", "val"])
-        )
+        return self._table.row_within_tolerance(self._row, sample_hsv)
 
     def apply_drift(self, sample_hsv, dampener=0.2):
         sample = np.array(sample_hsv, dtype=float)
-        offset = (sample - self.drift_center) * dampener
-        self.drift_center += offset
+        center = self.drift_center
+        offset = (sample - center) * dampener
+        self.drift_center = center + offset
         self.last_drift_vector = offset
 
+    @property
+    def samples(self):
+        """Retained samples, oldest first, as an (n, 3) float array copy."""
+        if self._ring_size < len(self._ring):
+            return self._ring[:self._ring_size].copy()
+        return np.roll(self._ring, -self._ring_pos, axis=0)
+
+    def _update_statistics(self, sample):
+        # Welford updates for the sample cloud and for distance-at-ingest
+        self.sample_count += 1
+        delta = sample - self._sample_mean
+        self._sample_mean += delta / self.sample_count
+        self._sample_m2 += float(delta @ (sample - self._sample_mean))
+
+        offset = sample - self.drift_center
+        distance = math.sqrt(offset @ offset)
+        if len(self._ring):
+            self._push_ring(sample, distance)
+        d_delta = distance - self.distance_mean
+        self.distance_mean += d_delta / self.sample_count
+        self._distance_m2 += d_delta * (distance - self.distance_mean)
+
+    def _push_ring(self, sample, distance):
+        pos = self._ring_pos
+        if self._ring_size == len(self._ring):
+            self._ring_distance_sum -= self._ring_distance[pos]     # Evict the oldest
+        else:
+            self._ring_size += 1
+        self._ring[pos] = sample
+        self._ring_distance[pos] = distance
+        self._ring_distance_sum += distance
+        self._ring_pos = (pos + 1) % len(self._ring)
+        if not self._ring_pos:
+            # Once per wrap: drop the rounding error the add/subtract pairs accumulate
+            self._ring_distance_sum = float(self._ring_distance.sum())
+
+    @property
+    def distance_var(self):
+        if self.sample_count < 2:
+            return 0.0
+        return self._distance_m2 / (self.sample_count - 1)
+
+    def rms_distance(self):
+        """
+        RMS distance of every sample seen to the *current* drift_center.
+        Exact after the center moves: E|x - c|² = M2 / n + |mean - c|².
+        """
+        if not self.sample_count:
+            return None
+        offset = self._sample_mean - self.drift_center
+        return float(np.sqrt(self._sample_m2 / self.sample_count + offset @ offset))
+
+    def mean_distance(self):
+        """
+        Mean distance at ingest of the retained samples (the last sample_buffer),
+        read from a running window sum in O(1). Without a buffer, falls back to
+        the running mean distance at ingest over every sample.
+        """
+        if not self.sample_count:
+            return None
+        if not self._ring_size:
+            return self.distance_mean
+        return self._ring_distance_sum / self._ring_size
+
     def update_confidence(self):
-        if not self.samples:
+        if not self.sample_count:
             self.confidence_avg = None
             return
-        avg_dist = np.mean([np.linalg.norm(np.array(s) - self.drift_center) for s in self.samples])
-        self.confidence_avg = 1 / (1 + avg_dist)  # Example scaling
+        self.confidence_avg = 1 / (1 + self.mean_distance())  # Example scaling
+
+    @property
+    def confidence_rms(self):
+        """1 / (1 + rms_distance()) over every sample seen."""
+        if not self.sample_count:
+            return None
+        return 1 / (1 + self.rms_distance())
 
     def to_dict(self):
         return {
@@ -81,10 +189,14 @@ class ColorNode:
             "hsv_anchor": self.hsv_anchor.tolist(),
             "drift_center": self.drift_center.tolist(),
             "type": self.type,
-            "tolerance": self.tolerance,
+            "tolerance": tolerance_dict(self._table.tolerance[self._row]),
             "max_drift": self.max_drift,
-            "samples": self.samples,
+            "samples": self.samples.tolist(),
+            "sample_count": self.sample_count,
+            "distance_mean": self.distance_mean,
+            "distance_var": self.distance_var,
             "confidence_avg": self.confidence_avg,
+            "confidence_rms": self.confidence_rms,
             "last_drift_vector": self.last_drift_vector.tolist(),
             "drift_locked": self.drift_locked,
             "metadata": self.metadata
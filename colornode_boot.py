@@ -3,20 +3,22 @@
 # Purpose: Boots BrickBeast’s perceptual grid with pole zones and neighbor logic
 # Scope: Initializes grid structure, flags pole zones, and assigns sample neighbors
 # Features:
-#   - Calls initialize_reference_grid() from arraynodelogic
+#   - Builds the reference grid from bricklink_colours.json via reference_loader
+#     when no grid is passed in
 #   - Flags black and white pole zones with locked centroids
 #   - Assigns example neighbor relationships for diagnostic linkage
 #   - Prints boot confirmation and returns grid object
 # Created by: Craig Wilson / Copilot
-# Last Updated: 2025-09-04
+# Last Updated: 2026-10-17
 # ------------------------------------------------------------
 
 import arraynodelogic as gridlogic 
-import json
+from reference_loader import build_reference_grid, load_bricklink_colours
 
-def boot_brickbeast():
+def boot_brickbeast(grid=None, colour_json_path="bricklink_colours.json"):
     # Initialize grid
-    grid = gridlogic.initialize_reference_grid()
+    if grid is None:
+        grid = build_reference_grid(load_bricklink_colours(colour_json_path))
 
     # Define pole zones
     gridlogic.set_pole_zone(grid, 0, 0, 0)         # Black
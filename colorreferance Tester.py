@@ -23,7 +23,7 @@ red = reg.registry[5]
 
 # Apply drift if allowed
 if red.can_drift(sample_hsv, reg.registry):
-    red.apply_drift(sample_hsv)
+    reg.apply_drift(red.color_id, sample_hsv)  # Relaxes only affected neighbors
     print(f"Red drift updated to: {red.drift_center}")
 else:
     print("Drift not allowed for Red")
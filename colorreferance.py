@@ -5,83 +5,117 @@
 # Features:
 #   - Loads color data from ColorReference.json
 #   - Applies dampened drift logic across registry entries
+#   - Calibrates with sort-and-sweep neighbor pruning and reports pass stats
+#   - Incremental worklist recalibration after single drift updates; visits
+#     follow registry order so it lands on the same centers as calibrate()
 #   - Validates sample tolerance and drift eligibility
 #   - Saves calibrated registry and timestamped backup
+#   - Journals drift changes; periodic atomic checkpoints compact the journal
+#   - save() diffs the table columns against the last saved snapshot, so centers
+#     moved through a ColorReference view are journaled without mark_dirty()
+#   - Calibrate / save latency and can_drift rejection reasons through metrics.py
+#   - Optional DriftHistory (drift_history.py) records every applied drift
+#   - ColorReference is a __slots__ view onto the registry's PaletteTable
+#     (palette_table.py); calibration and checkpoints work on gathered arrays
 # Created by: Craig Wilson / Copilot
-# Last Updated: 2025-09-04
+# Last Updated: 2026-10-17
 # ------------------------------------------------------------
 
 import json
 import os
+import heapq
+import time
 from datetime import datetime
 import numpy as np
 
-class ColorReference:
-    def __init__(self, data):
-        self.color_id = data["color_id"]
-        self.name = data["color_name"]
+import metrics
+from batch_matcher import AnchorTable
+from palette_table import PaletteTable, TableColumn, TableRowView, ToleranceColumn, gather, tolerance_dict
 
-        self.reset_center = np.array(data["reset_center"], dtype=float)
-        self.anchor_center = np.array(data["anchor_center"], dtype=float)
-        self.drift_center = np.array(data["drift_center"], dtype=float)
+class ColorReference(TableRowView):
+    """
+    View onto one PaletteTable row. Centers, tolerance, max_drift and the lock
+    flag live in the table; pass the registry's table to share it. A color_id
+    already in that table raises unless replace=True (journal replay).
+    """
 
-        self.max_drift = data.get("max_drift", 5.0)
-        self.tolerance = data["tolerance"]
+    __slots__ = ("_table", "_row", "color_id", "name", "edge_ratio", "confidence_avg")
 
+    reset_center = TableColumn("reset")
+    anchor_center = TableColumn("anchor")
+    drift_center = TableColumn("drift_center")
+    last_drift_vector = TableColumn("last_drift_vector")
+    tolerance = ToleranceColumn()
+    max_drift = TableColumn("max_drift", float)
+    drift_locked = TableColumn("locked", bool)
+
+    def __init__(self, data, table=None, replace=False):
+        self.color_id = data["color_id"]
+        self.name = data["color_name"]
         self.edge_ratio = data.get("edge_ratio", 0.0)
         self.confidence_avg = data.get("confidence_avg", 1.0)
-        self.last_drift_vector = np.array(data.get("last_drift_vector", [0, 0, 0]), dtype=float)
-        self.drift_locked = data.get("drift_locked", False)
+
+        self._bind(
+            table,
+            self.color_id,
+            anchor=data["anchor_center"],
+            drift_center=data["drift_center"],
+            reset=data["reset_center"],
+            tolerance=data["tolerance"],
+            max_drift=data.get("max_drift", 5.0),
+            locked=data.get("drift_locked", False),
+            last_drift_vector=data.get("last_drift_vector", [0, 0, 0]),
+            replace=replace,
+        )
 
     def to_dict(self):
-        return {
-            "color_id": self.color_id,
-            "color_name": self.name,
-            "reset_center": self.reset_center.tolist(),
-            "anchor_center": self.anchor_center.tolist(),
-            "drift_center": self.drift_center.tolist(),
-            "max_drift": self.max_drift,
-            "tolerance": self.tolerance,
-            "edge_ratio": self.edge_ratio,
-            "confidence_avg": self.confidence_avg,
-            "last_drift_vector": self.last_drift_vector.tolist(),
-            "drift_locked": self.drift_locked
-        }
+        return _records([self])[0]
 
     def is_within_tolerance(self, sample_hsv):
-        sample = np.array(sample_hsv, dtype=float)
-        return all(
-            abs(sample[i] - self.drift_center[i]) <= self.tolerance[key]
-            for i, key in enumerate(["hue", "sat", "val"])
-        )
+        return self._table.row_within_tolerance(self._row, sample_hsv)
 
     def drift_magnitude(self):
         return np.linalg.norm(self.drift_center - self.anchor_center)
 
     def can_drift(self, sample_hsv, registry):
         if self.drift_locked:
+            metrics.inc("drift_rejections", reason="locked")
             return False
         sample = np.array(sample_hsv, dtype=float)
         proposed = self.drift_center + (sample - self.drift_center) / 20
-        for other in registry.values():
-            if other.color_id == self.color_id:
-                continue
-            dist = np.linalg.norm(proposed - other.drift_center)
-            if dist < self.max_drift + other.max_drift:
-                return False
-        return np.linalg.norm(proposed - self.anchor_center) <= self.max_drift
+        others = [other for other in registry.values() if other.color_id != self.color_id]
+        dist = np.linalg.norm(proposed - gather(others, "drift_center"), axis=1)
+        if np.any(dist < self.max_drift + gather(others, "max_drift")):
+            metrics.inc("drift_rejections", reason="neighbor_overlap")
+            return False
+        if np.linalg.norm(proposed - self.anchor_center) > self.max_drift:
+            metrics.inc("drift_rejections", reason="max_drift")
+            return False
+        return True
 
     def apply_drift(self, sample_hsv, dampener=0.2):
         sample = np.array(sample_hsv, dtype=float)
-        offset = (sample - self.drift_center) * dampener
-        self.drift_center += offset
+        center = self.drift_center
+        offset = (sample - center) * dampener
+        self.drift_center = center + offset
         self.last_drift_vector = offset
 
 
 class ColorRegistry:
-    def __init__(self, path="ColorReference.json"):
+    def __init__(self, path="ColorReference.json", checkpoint_every=500, fsync=False, history=None):
         self.path = path
+        self.history = history                    # Optional DriftHistory fed by apply_drift()
+        self.journal_path = path + ".journal"
+        self.checkpoint_every = checkpoint_every  # Journal entries between checkpoints
+        self.fsync = fsync                        # fsync every journal append (power-loss safe)
         self.registry = {}
+        self.table = PaletteTable()               # Backing arrays for every ColorReference
+        self.last_calibration = None
+        self._dirty = set()
+        self._unsaved = set()
+        self._saved_rows = {}                     # color_id → row of the last saved snapshot
+        self._saved = {}                          # Column → array as last written to disk
+        self._journal_entries = 0
         self.load_and_calibrate()
 
     def load_and_calibrate(self):
@@ -92,51 +126,324 @@ class ColorRegistry:
             raw_data = json.load(f)
 
         for entry in raw_data:
-            ref = ColorReference(entry)
+            ref = ColorReference(entry, self.table)
             self.registry[ref.color_id] = ref
 
+        self._journal_entries = self.replay_journal()
+        self._snapshot()                          # What is on disk, before calibration moves it
         self.calibrate()
 
-    def dampened_drift_vector(self, ref, dampener=0.2):
-        target = ref.drift_center
-        vectors = []
+    def replay_journal(self):
+        """
+        Re-applies journaled entries on top of the checkpoint. Each line is a
+        full ColorReference record, so replay is idempotent; a torn last line
+        from a crash mid-append is cut off so later appends start clean.
+        """
+        if not os.path.exists(self.journal_path):
+            return 0
+        replayed = good = 0
+        with open(self.journal_path, 'rb+') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("torn entry")
+                    entry = json.loads(line)
+                except ValueError:
+                    f.truncate(good)
+                    break
+                ref = ColorReference(entry, self.table, replace=True)   # Overwrites the row in place
+                self.registry[ref.color_id] = ref
+                good += len(line)
+                replayed += 1
+        return replayed
 
-        for other in self.registry.values():
-            if other.color_id == ref.color_id:
-                continue
+    def dampened_drift_vector(self, ref, dampener=0.2, neighbors=None):
+        """
+        Mean push-away vector for ref from every overlapping neighbor.
+        neighbors: optional list of candidate ColorReferences (pre-pruned);
+        defaults to the whole registry.
+        """
+        if neighbors is None:
+            neighbors = [other for other in self.registry.values() if other.color_id != ref.color_id]
+        if not neighbors:
+            return np.array([0.0, 0.0, 0.0])
+
+        centers = gather(neighbors, "drift_center")
+        other_drift = gather(neighbors, "max_drift")
+
+        vector = ref.drift_center - centers
+        distance = np.sqrt(np.einsum("ij,ij->i", vector, vector))
+        close = distance < ref.max_drift + other_drift
+
+        if not close.any():
+            return np.array([0.0, 0.0, 0.0])
 
-            neighbor = other.drift_center
-            vector = target - neighbor
-            distance = np.linalg.norm(vector)
+        unit_vector = vector[close] / distance[close, None]
+        safe_distance = distance[close] - other_drift[close]
+        damped_vectors = unit_vector * safe_distance[:, None] * dampener
+        return np.mean(damped_vectors, axis=0)
 
-            if distance < ref.max_drift + other.max_drift:
-                unit_vector = vector / distance
-                safe_distance = distance - other.max_drift
-                damped_vector = unit_vector * safe_distance * dampener
-                vectors.append(damped_vector)
+    def _candidate_neighbors(self, refs, reach):
+        """
+        Sort-and-sweep along hue: returns, per ref, the other refs whose centers
+        lie within max_drift + other.max_drift + reach. O(n log n + pairs).
+        """
+        centers = gather(refs, "drift_center")
+        radii = gather(refs, "max_drift")
+        if not len(refs):
+            return []
 
-        if vectors:
-            return np.mean(vectors, axis=0)
-        return np.array([0.0, 0.0, 0.0])
+        order = np.argsort(centers[:, 0], kind="stable")
+        hue = centers[order, 0]
+        window = 2 * radii.max() + reach
+        lo = np.searchsorted(hue, hue - window, side="left")
+        hi = np.searchsorted(hue, hue + window, side="right")
 
+        candidates = [[] for _ in refs]
+        for pos, i in enumerate(order):
+            near = order[lo[pos]:hi[pos]]
+            near = near[near != i]
+            if not len(near):
+                continue
+            gap = np.linalg.norm(centers[near] - centers[i], axis=1)
+            near = near[gap < radii[i] + radii[near] + reach]
+            # Registry order keeps the neighbor mean identical to the all-pairs loop
+            candidates[i] = [refs[j] for j in np.sort(near)]
+        return candidates
+
+    @metrics.timed("calibrate")
     def calibrate(self, threshold=0.01, max_passes=10, dampener=0.2):
+        """
+        Relaxes overlapping drift centers apart.
+
+        Each pass only visits neighbor pairs that can interact: a center moves at
+        most dampener * max_drift per pass, so pairs further apart than
+        max_drift + other.max_drift + 2 * dampener * max(max_drift) are skipped.
+
+        Returns:
+            dict: {"passes": int, "changes": int, "pairs": int, "elapsed": float}
+        """
+        start = time.perf_counter()
+        refs = list(self.registry.values())
+        reach = 2 * dampener * max((ref.max_drift for ref in refs), default=0.0)
+        passes = total_changes = pairs = 0
+
         for _ in range(max_passes):
+            passes += 1
             changes = 0
-            for ref in self.registry.values():
-                vector = self.dampened_drift_vector(ref, dampener)
+            candidates = self._candidate_neighbors(refs, reach)
+            for ref, neighbors in zip(refs, candidates):
+                if not neighbors:
+                    continue
+                pairs += len(neighbors)
+                vector = self.dampened_drift_vector(ref, dampener, neighbors)
                 projected = ref.drift_center + vector
                 if np.linalg.norm(projected - ref.drift_center) > threshold:
                     ref.drift_center = projected
                     ref.last_drift_vector = vector
+                    self._unsaved.add(ref.color_id)
                     changes += 1
+            total_changes += changes
             if changes == 0:
                 break
 
+        self.last_calibration = {
+            "passes": passes,
+            "changes": total_changes,
+            "pairs": pairs,
+            "elapsed": time.perf_counter() - start
+        }
+        return self.last_calibration
+
+    def mark_dirty(self, color_id):
+        """Queues a reference whose drift center was moved outside the registry."""
+        self._dirty.add(color_id)
+        self._unsaved.add(color_id)
+
+    def apply_drift(self, color_id, sample_hsv, dampener=0.2, recalibrate=True, source="unknown", timestamp=None):
+        """
+        Applies drift to one reference and, by default, relaxes only the
+        references its move affects. source / timestamp label the drift in
+        self.history when one is attached.
+        """
+        ref = self.registry[color_id]
+        if self.history is not None:
+            self.history.record(color_id, np.asarray(sample_hsv, dtype=float) - ref.drift_center, source, timestamp)
+        ref.apply_drift(sample_hsv, dampener)
+        self.mark_dirty(color_id)
+        if recalibrate:
+            return self.recalibrate_dirty()
+        return None
+
+    @metrics.timed("recalibrate_dirty")
+    def recalibrate_dirty(self, threshold=0.01, max_passes=10, dampener=0.2):
+        """
+        Incremental calibrate(): starts from the dirty references and their
+        overlapping neighbors, and only re-queues neighbors of references that
+        actually move. Each pass visits its worklist in registry order, and a
+        neighbor later in the registry is still relaxed in the current pass, so
+        from a calibrated registry this reaches the same centers as a full
+        calibrate() with the same max_passes bound.
+
+        Returns:
+            dict: {"passes": int, "steps": int, "changes": int, "elapsed": float}
+        """
+        start = time.perf_counter()
+        refs = list(self.registry.values())
+        row = {ref.color_id: i for i, ref in enumerate(refs)}
+        centers = gather(refs, "drift_center")
+        radii = gather(refs, "max_drift")
+
+        def overlapping(i):
+            gap = np.linalg.norm(centers - centers[i], axis=1)
+            near = np.flatnonzero(gap < radii[i] + radii)
+            return near[near != i]
+
+        pending = set()
+        for color_id in self._dirty:
+            if color_id in row:
+                pending.add(row[color_id])
+                pending.update(overlapping(row[color_id]).tolist())
+        self._dirty.clear()
+
+        passes = steps = changes = 0
+        while pending and passes < max_passes:
+            passes += 1
+            worklist = sorted(pending)
+            queued = set(worklist)
+            pending = set()
+            while worklist:
+                i = heapq.heappop(worklist)
+                steps += 1
+
+                ref = refs[i]
+                before = overlapping(i)
+                if not len(before):
+                    continue
+                vector = self.dampened_drift_vector(ref, dampener, [refs[j] for j in before])
+                projected = ref.drift_center + vector
+                if np.linalg.norm(projected - ref.drift_center) > threshold:
+                    ref.drift_center = projected
+                    ref.last_drift_vector = vector
+                    self._unsaved.add(ref.color_id)
+                    centers[i] = projected
+                    changes += 1
+                    pending.add(i)
+                    for j in np.union1d(before, overlapping(i)).tolist():
+                        if j > i and j not in queued:
+                            queued.add(j)
+                            heapq.heappush(worklist, j)    # Not visited yet this pass
+                        elif j < i:
+                            pending.add(j)
+
+        return {"passes": passes, "steps": steps, "changes": changes, "elapsed": time.perf_counter() - start}
+
+    def _snapshot(self):
+        """Records the persisted table columns as they now stand on disk."""
+        refs = list(self.registry.values())
+        self._saved_rows = {ref.color_id: i for i, ref in enumerate(refs)}
+        self._saved = {name: gather(refs, name) for name in _RECORD_COLUMNS}
+
+    def _changed_ids(self):
+        """color_ids whose table columns differ from the last saved snapshot."""
+        refs = list(self.registry.values())
+        rows = np.array([self._saved_rows.get(ref.color_id, -1) for ref in refs], dtype=np.int64)
+        changed = rows < 0
+        if changed.all():
+            return {ref.color_id for ref in refs}
+        rows = np.maximum(rows, 0)
+        for name, saved in self._saved.items():
+            differs = gather(refs, name) != saved[rows]
+            changed |= differs.reshape(len(refs), -1).any(axis=1)
+        return {ref.color_id for ref, moved in zip(refs, changed) if moved}
+
+    @metrics.timed("registry_save")
     def save(self):
-        with open(self.path, 'w') as f:
-            json.dump([ref.to_dict() for ref in self.registry.values()], f, indent=2)
+        """
+        Appends every changed reference to the journal. Changes are found by
+        diffing the table columns against the last saved snapshot (one
+        vectorized compare per column), so centers moved through
+        ColorReference.apply_drift or by assigning drift_center are caught;
+        mark_dirty() is only needed for fields outside the table, such as
+        confidence_avg. Writes follow the number of changed references, so
+        this is cheap enough to call after every accepted drift.
+        """
+        changed = sorted(self._unsaved.union(self._changed_ids()) & self.registry.keys())
+        if not changed:
+            self._unsaved.clear()
+            return 0
+        lines = "".join(json.dumps(record) + "\n" for record in _records(self.registry[cid] for cid in changed))
+        with open(self.journal_path, 'a') as f:
+            f.write(lines)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        written = len(changed)
+        self._journal_entries += written
+        self._unsaved.clear()
+        self._snapshot()
+
+        if self._journal_entries >= self.checkpoint_every:
+            self.checkpoint()
+        return written
+
+    @metrics.timed("registry_checkpoint")
+    def checkpoint(self):
+        """
+        Atomically rewrites the full registry (write-temp-then-rename), refreshes
+        the dated backup, then compacts the journal.
+        """
+        records = _records(self.registry.values())
+        _write_json_atomic(self.path, records)
 
         date_stamp = datetime.now().strftime("%Y-%m-%d")
-        backup_path = f"ColorReference_backup_{date_stamp}.json"
-        with open(backup_path, 'w') as f:
-            json.dump([ref.to_dict() for ref in self.registry.values()], f, indent=2)
+        backup_path = os.path.join(os.path.dirname(self.path), f"ColorReference_backup_{date_stamp}.json")
+        _write_json_atomic(backup_path, records)
+
+        # A crash before this point just replays already-checkpointed entries
+        with open(self.journal_path, 'w'):
+            pass
+        self._journal_entries = 0
+        self._unsaved.clear()
+        self._snapshot()
+
+    def anchor_table(self):
+        """Drift centers + tolerances in registry order, for batch_matcher."""
+        refs = list(self.registry.values())
+        color_ids = [ref.color_id for ref in refs]
+        return AnchorTable(gather(refs, "drift_center"), color_ids, color_ids,
+                           tolerance=gather(refs, "tolerance"))
+
+
+_RECORD_COLUMNS = ("reset", "anchor", "drift_center", "max_drift", "tolerance", "last_drift_vector", "locked")
+
+
+def _records(refs):
+    """ColorReference.to_dict() for many references, reading each column once."""
+    refs = list(refs)
+    columns = {name: gather(refs, name).tolist() for name in _RECORD_COLUMNS}
+    return [
+        {
+            "color_id": ref.color_id,
+            "color_name": ref.name,
+            "reset_center": columns["reset"][i],
+            "anchor_center": columns["anchor"][i],
+            "drift_center": columns["drift_center"][i],
+            "max_drift": columns["max_drift"][i],
+            "tolerance": tolerance_dict(columns["tolerance"][i]),
+            "edge_ratio": ref.edge_ratio,
+            "confidence_avg": ref.confidence_avg,
+            "last_drift_vector": columns["last_drift_vector"][i],
+            "drift_locked": columns["locked"][i]
+        }
+        for i, ref in enumerate(refs)
+    ]
+
+
+def _write_json_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
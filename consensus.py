@@ -0,0 +1,134 @@
+# ------------------------------------------------------------
+# 🧱 Tool: consensus.py
+# Purpose: Reaches a per-part consensus color ID across multiple images
+# Scope: Accumulates batch match results frame by frame and tells the capture
+#        loop when it can stop imaging a part
+# Features:
+#   - Confidence-weighted votes per color_id (np.bincount per frame)
+#   - Early stop once the leader's share margin over the runner-up passes a threshold
+#   - min_frames / max_frames bounds; max_frames forces a decision
+#   - Accepts batch matcher arrays or classify_frame() histograms
+#   - ConsensusTracker runs many parts at once and reports frames-per-decision;
+#     it remembers only the most recent decisions (bounded), stats() uses counters
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from batch_matcher import NO_COLOR_ID
+
+DEFAULT_MARGIN = 0.35       # (leader - runner-up) / total vote weight needed to stop
+DEFAULT_MIN_FRAMES = 1
+DEFAULT_MAX_FRAMES = 8
+DEFAULT_RECENT = 4096       # Decided parts remembered so late frames are ignored
+
+
+class ConsensusAggregator:
+    def __init__(self, margin=DEFAULT_MARGIN, min_frames=DEFAULT_MIN_FRAMES, max_frames=DEFAULT_MAX_FRAMES):
+        self.margin = margin
+        self.min_frames = min_frames
+        self.max_frames = max_frames
+        self.votes = {}
+        self.frames = 0
+        self.decision = None
+
+    @property
+    def should_stop(self):
+        return self.decision is not None
+
+    def add_frame(self, color_ids, confidence):
+        """Adds one frame's per-sample matches. Returns the decision dict once reached."""
+        color_ids = np.asarray(color_ids)
+        confidence = np.asarray(confidence, dtype=np.float64)
+        valid = color_ids != NO_COLOR_ID
+        ids, inverse = np.unique(color_ids[valid], return_inverse=True)
+        weights = np.bincount(inverse, weights=confidence[valid], minlength=len(ids))
+        return self._add_votes(zip(ids.tolist(), weights.tolist()))
+
+    def add_histogram(self, histogram):
+        """Adds one classify_frame() histogram: pixels x mean confidence per color_id."""
+        return self._add_votes(
+            (cid, entry["pixels"] * entry["confidence"])
+            for cid, entry in histogram.items() if cid is not None
+        )
+
+    def _add_votes(self, votes):
+        if self.decision is not None:
+            return self.decision
+        for cid, weight in votes:
+            self.votes[cid] = self.votes.get(cid, 0.0) + weight
+        self.frames += 1
+        return self._decide()
+
+    def standing(self):
+        """Current (leader, runner-up weight, margin) without deciding."""
+        total = sum(self.votes.values())
+        if not total:
+            return None, 0.0, 0.0
+        ranked = sorted(self.votes.items(), key=lambda item: -item[1])
+        leader, lead = ranked[0]
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        return leader, second, (lead - second) / total
+
+    def _decide(self):
+        leader, _, margin = self.standing()
+        confident = leader is not None and self.frames >= self.min_frames and margin >= self.margin
+        forced = self.frames >= self.max_frames
+        if confident or forced:
+            self.decision = {
+                "color_id": leader,
+                "margin": margin,
+                "frames": self.frames,
+                "forced": not confident,
+            }
+        return self.decision
+
+
+class ConsensusTracker:
+    """
+    Consensus for many parts at once, fed straight from IngestService results
+    ({"part_id", "color_ids", "confidence", ...}). Only the last `recent`
+    decisions are kept; a late frame for an older part starts a new vote.
+    """
+
+    def __init__(self, recent=DEFAULT_RECENT, **aggregator_args):
+        self.aggregator_args = aggregator_args
+        self.recent = recent
+        self.active = {}
+        self.decided = OrderedDict()    # part_id → decision, oldest first
+        self.frames_needed = Counter()
+        self.forced = 0
+
+    def update(self, result):
+        """Returns the decision dict when this result settles its part, else None."""
+        part_id = result["part_id"]
+        if part_id in self.decided:
+            return None
+        aggregator = self.active.setdefault(part_id, ConsensusAggregator(**self.aggregator_args))
+        decision = aggregator.add_frame(result["color_ids"], result["confidence"])
+        if decision is not None:
+            del self.active[part_id]
+            self.decided[part_id] = decision
+            if len(self.decided) > self.recent:
+                self.decided.popitem(last=False)
+            self.frames_needed[decision["frames"]] += 1
+            self.forced += decision["forced"]
+        return decision
+
+    def should_capture(self, part_id):
+        """True while the capture loop should keep imaging this part."""
+        return part_id not in self.decided
+
+    def stats(self):
+        total = sum(self.frames_needed.values())
+        mean = sum(f * n for f, n in self.frames_needed.items()) / total if total else 0.0
+        return {
+            "decided": total,
+            "active": len(self.active),
+            "forced": self.forced,
+            "mean_frames": mean,
+            "frames_histogram": dict(sorted(self.frames_needed.items())),
+        }
@@ -0,0 +1,241 @@
+# ------------------------------------------------------------
+# 🧱 Tool: deltae_matcher.py
+# Purpose: Perceptual ΔE matching engine for BrickBeast, alongside the HSV L1 matcher
+# Scope: Precomputes CIELAB anchors for every BrickLink colour and matches sample
+#        batches by ΔE76 or ΔE2000 against the whole anchor matrix
+# Features:
+#   - Lab anchors built once from palette rgb (or from HSV anchors via utils.py)
+#   - Batch ΔE76 / ΔE2000, chunked so peak memory stays bounded
+#   - No hue seam: reds at OpenCV hue 179 and 0 are neighbours in Lab
+#   - Optional ΔE76 candidate pre-filter so ΔE2000 only scores the k nearest anchors
+#   - uint8 HSV batches are deduplicated before conversion (frames repeat pixels)
+#   - make_matcher() selects "l1" (current HSV metric), "de76" or "de2000"
+#   - Empty anchor tables give color_id -1, infinite distance and zero confidence
+#   - Running this file benchmarks throughput and agreement between metrics
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+
+from batch_matcher import AnchorTable, MAX_L1_DRIFT, NO_COLOR_ID, as_hsv_array, match_indices
+from utils import hsv_to_lab, rgb_to_lab
+
+METRICS = ("l1", "de76", "de2000")
+DE_SCALE = 100.0        # ΔE at which confidence reaches 0
+DEFAULT_CHUNK = 4096
+
+
+class LabAnchorTable:
+    def __init__(self, lab, color_ids, names=None):
+        self.lab = np.ascontiguousarray(lab, dtype=np.float64).reshape(-1, 3)
+        self.color_ids = np.ascontiguousarray(color_ids, dtype=np.int64)
+        self.names = names
+        # Per-anchor terms ΔE2000 reuses for every sample
+        self._chroma = np.hypot(self.lab[:, 1], self.lab[:, 2])
+
+    def __len__(self):
+        return len(self.color_ids)
+
+
+def lab_table_from_palette(palette):
+    """bricklink_colours.json dict → Lab anchors from each entry's rgb."""
+    entries = list(palette.values())
+    rgb = np.array([e["rgb"] for e in entries], dtype=np.uint8).reshape(-1, 3)
+    return LabAnchorTable(rgb_to_lab(rgb), [e["colourID"] for e in entries],
+                          [e["colourName"] for e in entries])
+
+
+def lab_table_from_anchors(table, hue_scale="opencv"):
+    """AnchorTable (HSV anchors / drift centers) → Lab anchors."""
+    return LabAnchorTable(hsv_to_lab(table.anchors, hue_scale), table.color_ids)
+
+
+# ----------------------------
+# ΔE Formulas
+# ----------------------------
+
+def delta_e76(lab, anchors):
+    """(N, 3) x (K, 3) → (N, K) Euclidean Lab distance."""
+    diff = lab[:, None, :] - anchors[None, :, :]
+    return np.sqrt(np.einsum("nkc,nkc->nk", diff, diff))
+
+
+def delta_e2000(lab, anchors, anchor_chroma=None):
+    """(N, 3) x (K, 3) → (N, K) CIEDE2000 with kL = kC = kH = 1."""
+    chroma = np.hypot(anchors[:, 1], anchors[:, 2]) if anchor_chroma is None else anchor_chroma
+    return _ciede2000(lab[:, 0][:, None], lab[:, 1][:, None], lab[:, 2][:, None],
+                      anchors[:, 0][None, :], anchors[:, 1][None, :], anchors[:, 2][None, :],
+                      chroma[None, :])
+
+
+def _ciede2000(L1, a1, b1, L2, a2, b2, C2):
+    """CIEDE2000 over broadcastable operand arrays (C2 = hypot(a2, b2), precomputed)."""
+    C1 = np.hypot(a1, b1)
+    C_bar7 = ((C1 + C2) / 2) ** 7
+    G = 0.5 * (1 - np.sqrt(C_bar7 / (C_bar7 + 25.0 ** 7)))
+    a1p, a2p = (1 + G) * a1, (1 + G) * a2
+    C1p, C2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    chroma_product = C1p * C2p
+    dhp = h2p - h1p
+    dhp = np.where(dhp > 180, dhp - 360, np.where(dhp < -180, dhp + 360, dhp))
+    dhp = np.where(chroma_product == 0, 0, dhp)
+    dHp = 2 * np.sqrt(chroma_product) * np.sin(np.radians(dhp) / 2)
+
+    Lp_bar = (L1 + L2) / 2
+    Cp_bar = (C1p + C2p) / 2
+    h_sum = h1p + h2p
+    hp_bar = np.where(np.abs(h1p - h2p) > 180,
+                      np.where(h_sum < 360, (h_sum + 360) / 2, (h_sum - 360) / 2),
+                      h_sum / 2)
+    hp_bar = np.where(chroma_product == 0, h_sum, hp_bar)
+
+    T = (1 - 0.17 * np.cos(np.radians(hp_bar - 30)) + 0.24 * np.cos(np.radians(2 * hp_bar))
+         + 0.32 * np.cos(np.radians(3 * hp_bar + 6)) - 0.20 * np.cos(np.radians(4 * hp_bar - 63)))
+    d_theta = 30 * np.exp(-(((hp_bar - 275) / 25) ** 2))
+    Cp_bar7 = Cp_bar ** 7
+    R_C = 2 * np.sqrt(Cp_bar7 / (Cp_bar7 + 25.0 ** 7))
+    S_L = 1 + 0.015 * (Lp_bar - 50) ** 2 / np.sqrt(20 + (Lp_bar - 50) ** 2)
+    S_C = 1 + 0.045 * Cp_bar
+    S_H = 1 + 0.015 * Cp_bar * T
+    R_T = -np.sin(np.radians(2 * d_theta)) * R_C
+
+    dL, dC, dH = dLp / S_L, dCp / S_C, dHp / S_H
+    return np.sqrt(dL ** 2 + dC ** 2 + dH ** 2 + R_T * dC * dH)
+
+
+# ----------------------------
+# Matching
+# ----------------------------
+
+def _no_match(n):
+    """(color_ids, distance, confidence) for n samples against an empty table."""
+    return np.full(n, NO_COLOR_ID, dtype=np.int64), np.full(n, np.inf), np.zeros(n)
+
+
+def _candidate_de2000(block, table, candidates):
+    """ΔE2000 against only the `candidates` ΔE76-nearest anchors of each sample."""
+    coarse = delta_e76(block, table.lab)
+    nearest = np.argpartition(coarse, candidates - 1, axis=1)[:, :candidates]
+    picked = table.lab[nearest]
+    dist = _ciede2000(block[:, 0][:, None], block[:, 1][:, None], block[:, 2][:, None],
+                      picked[..., 0], picked[..., 1], picked[..., 2], table._chroma[nearest])
+    best = np.argmin(dist, axis=1)
+    rows = np.arange(len(block))
+    return nearest[rows, best], dist[rows, best]
+
+
+def match_lab(lab, table, metric="de2000", candidates=None, chunk=DEFAULT_CHUNK):
+    """
+    Matches (N, 3) Lab samples against a LabAnchorTable.
+
+    Args:
+        candidates (int): ΔE2000 only — score just the k ΔE76-nearest anchors
+            per sample instead of all of them (None = exhaustive)
+
+    Returns:
+        tuple: (color_ids (N,), delta_e (N,), confidence (N,))
+    """
+    if metric not in ("de76", "de2000"):
+        raise ValueError(f"Unknown ΔE metric: {metric}")
+    lab = np.asarray(lab, dtype=np.float64).reshape(-1, 3)
+    n = len(lab)
+    if not len(table):
+        return _no_match(n)
+    index = np.zeros(n, dtype=np.int64)
+    delta_e = np.zeros(n)
+    prune = metric == "de2000" and candidates is not None and candidates < len(table)
+
+    for start in range(0, n, chunk):
+        block = lab[start:start + chunk]
+        if prune:
+            index[start:start + chunk], delta_e[start:start + chunk] = \
+                _candidate_de2000(block, table, candidates)
+            continue
+        if metric == "de76":
+            dist = delta_e76(block, table.lab)
+        else:
+            dist = delta_e2000(block, table.lab, table._chroma)
+        best = np.argmin(dist, axis=1)
+        index[start:start + chunk] = best
+        delta_e[start:start + chunk] = dist[np.arange(len(block)), best]
+
+    confidence = np.maximum(0, 1 - delta_e / DE_SCALE)
+    return table.color_ids[index], delta_e, confidence
+
+
+def _unique_hsv(hsv):
+    """uint8 HSV → (unique rows, inverse); frames repeat most pixel values."""
+    keys = (hsv[:, 0].astype(np.int32) << 16) | (hsv[:, 1].astype(np.int32) << 8) | hsv[:, 2]
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    rows = np.stack([uniq >> 16, (uniq >> 8) & 0xFF, uniq & 0xFF], axis=1)
+    return rows.astype(np.float32), inverse
+
+
+def make_matcher(table, metric="l1", hue_scale="opencv", candidates=None):
+    """
+    Returns matcher(hsv) → (color_ids, distance, confidence) for the chosen metric.
+    "l1" is the existing HSV L1 / 765 matcher; "de76" / "de2000" convert HSV to
+    Lab first. table is an AnchorTable (ΔE anchors are derived from it) or a
+    LabAnchorTable (ΔE metrics only). candidates is passed to match_lab().
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric} (expected one of {METRICS})")
+
+    if metric == "l1":
+        if not isinstance(table, AnchorTable):
+            raise TypeError("The l1 metric needs an HSV AnchorTable")
+
+        def matcher(hsv):
+            index, magnitude = match_indices(hsv, table)
+            if not len(table):
+                return _no_match(len(index))
+            return table.color_ids[index], magnitude, np.maximum(0, 1 - magnitude / MAX_L1_DRIFT)
+        return matcher
+
+    lab_table = table if isinstance(table, LabAnchorTable) else lab_table_from_anchors(table, hue_scale)
+
+    def matcher(hsv):
+        hsv = as_hsv_array(hsv)
+        if hsv.dtype != np.uint8:
+            return match_lab(hsv_to_lab(hsv.astype(np.float32), hue_scale), lab_table, metric, candidates)
+        rows, inverse = _unique_hsv(hsv)
+        ids, delta_e, confidence = match_lab(hsv_to_lab(rows, hue_scale), lab_table, metric, candidates)
+        return ids[inverse], delta_e[inverse], confidence[inverse]
+    return matcher
+
+
+if __name__ == "__main__":
+    import time
+    from reference_loader import build_reference_grid, load_bricklink_colours
+    from batch_matcher import build_anchor_table
+
+    palette = load_bricklink_colours("bricklink_colours.json")
+    table = build_anchor_table(build_reference_grid(palette))
+    rng = np.random.default_rng(0)
+    centers = table.anchors[rng.integers(0, len(table), 200_000)]
+    hsv = centers + rng.normal(0, 6, centers.shape)
+    hsv[:, 0] %= 180
+    hsv = np.clip(np.rint(hsv), 0, 255).astype(np.uint8)
+    red = (hsv[:, 0] < 8) | (hsv[:, 0] > 172)
+
+    results = {}
+    runs = [("l1", None), ("de76", None), ("de2000", None), ("de2000", 16)]
+    for metric, candidates in runs:
+        matcher = make_matcher(table, metric, candidates=candidates)
+        start = time.perf_counter()
+        ids = matcher(hsv)[0]
+        elapsed = time.perf_counter() - start
+        label = metric if candidates is None else f"{metric}/k{candidates}"
+        results[label] = ids
+        print(f"{label:>10}: {len(hsv) / elapsed / 1e6:6.2f} M samples/s")
+
+    for label in ("de76", "de2000"):
+        agree = results[label] == results["l1"]
+        print(f"l1 vs {label}: {agree.mean():.1%} agreement, {agree[red].mean():.1%} near the red hue seam")
+    print(f"de2000/k16 vs exhaustive: {(results['de2000/k16'] == results['de2000']).mean():.3%} identical")
@@ -0,0 +1,308 @@
+# ------------------------------------------------------------
+# 🧱 Tool: drift_history.py
+# Purpose: Per-colour drift time series for BrickBeast's calibration review
+# Scope: Keeps recent drift vectors per color_id in fixed-size ring buffers and
+#        rolls them into minute / hour aggregates per source camera
+# Features:
+#   - Raw ring buffer per colour (timestamp, drift vector, source)
+#   - Minute and hour rollups per (colour, source): count, mean drift, p95 |drift|
+#   - Rollups are time-indexed rings: a slot is reused once its window expires,
+#     so memory is fixed per (colour, source) however long the sorter runs
+#   - p95 from a fixed log-spaced |drift| histogram, so buckets merge exactly
+#   - Retention is measured from the newest sample overall, so a camera that
+#     goes quiet still ages out
+#   - Vectorized record_batch(); record_results() takes IngestService results
+#   - Range queries: recent(), series(), summary(); summary() picks minute or
+#     hour rollups from the newest recorded timestamp, not the wall clock, so
+#     replayed and historical data summarise the same way as live data
+#   - Memory at the defaults: ~24 KB per colour (raw ring) plus ~117 KB per
+#     (colour, source) pair (minute + hour rollups, mostly |drift| histograms),
+#     e.g. ~100 MB for 200 colours x 4 cameras; shrink minute_slots / hour_slots
+#     to trade retention for memory
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import time
+
+import numpy as np
+
+DEFAULT_RING = 1024             # Raw drift vectors kept per colour
+DEFAULT_MINUTE_SLOTS = 180      # 3 hours of minute rollups
+DEFAULT_HOUR_SLOTS = 24 * 14    # 14 days of hour rollups
+RESOLUTIONS = {"minute": 60, "hour": 3600}
+# |drift| histogram edges (HSV units); the last bucket is open-ended
+MAGNITUDE_EDGES = np.concatenate([[0.0], np.geomspace(0.25, 512, 47)])
+
+
+class _DriftRing:
+    """Most recent drift vectors for one colour."""
+
+    def __init__(self, size):
+        self.time = np.full(size, np.nan)
+        self.drift = np.zeros((size, 3), dtype=np.float32)
+        self.source = np.zeros(size, dtype=np.int32)
+        self.written = 0
+
+    def extend(self, times, drift, sources):
+        size = len(self.time)
+        n = len(times)
+        if n > size:
+            times, drift, sources = times[-size:], drift[-size:], sources[-size:]
+            self.written += n - size
+            n = size
+        pos = (self.written + np.arange(n)) % size
+        self.time[pos] = times
+        self.drift[pos] = drift
+        self.source[pos] = sources
+        self.written += n
+
+    def select(self, start, end, source):
+        filled = min(self.written, len(self.time))
+        order = (self.written - filled + np.arange(filled)) % len(self.time)
+        times = self.time[order]
+        keep = (times >= start) & (times < end)
+        if source is not None:
+            keep &= self.source[order] == source
+        rows = order[keep]
+        rows = rows[np.argsort(self.time[rows], kind="stable")]
+        return self.time[rows], self.drift[rows], self.source[rows]
+
+
+class _Rollup:
+    """Time-indexed ring of aggregates for one (colour, source) at one resolution."""
+
+    def __init__(self, slots, width):
+        self.width = width
+        self.bucket = np.full(slots, -1, dtype=np.int64)     # Bucket index held by each slot
+        self.count = np.zeros(slots, dtype=np.int64)
+        self.total = np.zeros((slots, 3))
+        self.hist = np.zeros((slots, len(MAGNITUDE_EDGES)), dtype=np.uint32)
+        self.latest = -1
+
+    def add(self, times, drift, bins):
+        buckets = np.floor(times / self.width).astype(np.int64)
+        slots = len(self.bucket)
+        self.latest = max(self.latest, int(buckets.max()))
+        live = buckets > self.latest - slots
+        buckets, drift, bins = buckets[live], drift[live], bins[live]
+
+        pos = buckets % slots
+        held = self.bucket[pos]
+        # Drop samples whose slot already holds a newer bucket; reset slots moving forward
+        keep = held <= buckets
+        buckets, drift, bins, pos = buckets[keep], drift[keep], bins[keep], pos[keep]
+        stale = np.unique(pos[self.bucket[pos] < buckets])
+        self.count[stale] = 0
+        self.total[stale] = 0
+        self.hist[stale] = 0
+        self.bucket[pos] = buckets
+
+        np.add.at(self.count, pos, 1)
+        np.add.at(self.total, pos, drift)
+        np.add.at(self.hist, (pos, bins), 1)
+
+    def select(self, start, end, latest):
+        """Slots inside [start, end) that are still within retention of the newest bucket seen."""
+        first = int(np.floor(start / self.width)) if np.isfinite(start) else -np.inf
+        last = int(np.ceil(end / self.width)) if np.isfinite(end) else np.inf
+        live = (self.bucket >= max(first, latest - len(self.bucket) + 1)) & (self.bucket < last)
+        live &= self.bucket >= 0
+        return np.flatnonzero(live)
+
+
+def _p95(hist):
+    """95th percentile |drift| from histogram rows, interpolated within its bucket."""
+    hist = np.atleast_2d(hist).astype(np.float64)
+    total = hist.sum(axis=1)
+    cumulative = np.cumsum(hist, axis=1)
+    target = 0.95 * total
+    index = np.argmax(cumulative >= target[:, None], axis=1)
+    rows = np.arange(len(hist))
+    below = cumulative[rows, index] - hist[rows, index]
+    lower = MAGNITUDE_EDGES[index]
+    # The open-ended last bucket reports its lower edge
+    upper = np.append(MAGNITUDE_EDGES[1:], MAGNITUDE_EDGES[-1])[index]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        value = lower + (upper - lower) * (target - below) / hist[rows, index]
+    return np.where(total > 0, value, np.nan)
+
+
+class DriftHistory:
+    """
+    Usage:
+        history = DriftHistory()
+        history.record(5, drift=[1, -2, 0], source="cam_A")
+        history.series(5, start=time.time() - 3600, resolution="minute")
+
+    Each (colour, source) pair costs (minute_slots + hour_slots) x 232 bytes
+    (bucket, count, mean total and a 48-bucket uint32 histogram per slot), and
+    each colour ring_size x 24 bytes; nbytes() reports the live total.
+    """
+
+    def __init__(self, ring_size=DEFAULT_RING, minute_slots=DEFAULT_MINUTE_SLOTS,
+                 hour_slots=DEFAULT_HOUR_SLOTS):
+        self.ring_size = ring_size
+        self.slots = {"minute": minute_slots, "hour": hour_slots}
+        self.sources = []
+        self._source_index = {}
+        self._rings = {}        # color_id → _DriftRing
+        self._rollups = {}      # (color_id, source_id, resolution) → _Rollup
+        self._latest = {resolution: -1 for resolution in RESOLUTIONS}   # Newest bucket seen
+
+    def source_id(self, source):
+        sid = self._source_index.get(source)
+        if sid is None:
+            sid = self._source_index[source] = len(self.sources)
+            self.sources.append(source)
+        return sid
+
+    def colors(self):
+        return sorted(self._rings)
+
+    def nbytes(self):
+        rings = sum(r.time.nbytes + r.drift.nbytes + r.source.nbytes for r in self._rings.values())
+        rollups = sum(r.bucket.nbytes + r.count.nbytes + r.total.nbytes + r.hist.nbytes
+                      for r in self._rollups.values())
+        return rings + rollups
+
+    # ----------------------------
+    # Recording
+    # ----------------------------
+
+    def record(self, color_id, drift, source="unknown", timestamp=None):
+        self.record_batch([color_id], [drift], source, [time.time() if timestamp is None else timestamp])
+
+    def record_batch(self, color_ids, drift, sources="unknown", timestamps=None):
+        """
+        Args:
+            color_ids (array-like): (N,) color_id per drift vector; None / -1 rows are skipped
+            drift (array-like): (N, 3) drift vectors (sample - center)
+            sources (str | array-like): One source name for all rows, or (N,) names
+            timestamps (array-like): (N,) epoch seconds; defaults to now
+        """
+        ids = np.array([-1 if c is None else c for c in color_ids] if isinstance(color_ids, list)
+                       else color_ids, dtype=np.int64).reshape(-1)
+        drift = np.asarray(drift, dtype=np.float64).reshape(-1, 3)
+        n = len(ids)
+        times = (np.full(n, time.time()) if timestamps is None
+                 else np.asarray(timestamps, dtype=np.float64).reshape(-1))
+        if isinstance(sources, str):
+            sids = np.full(n, self.source_id(sources), dtype=np.int32)
+        else:
+            sids = np.array([self.source_id(s) for s in sources], dtype=np.int32)
+
+        valid = ids >= 0
+        ids, drift, times, sids = ids[valid], drift[valid], times[valid], sids[valid]
+        if not len(ids):
+            return
+        bins = np.searchsorted(MAGNITUDE_EDGES, np.linalg.norm(drift, axis=1), side="right") - 1
+
+        order = np.lexsort((times, ids))
+        ids, drift, times, sids, bins = ids[order], drift[order], times[order], sids[order], bins[order]
+        uniq, starts = np.unique(ids, return_index=True)
+        for cid, a, b in zip(uniq.tolist(), starts, np.append(starts[1:], len(ids))):
+            ring = self._rings.get(cid)
+            if ring is None:
+                ring = self._rings[cid] = _DriftRing(self.ring_size)
+            ring.extend(times[a:b], drift[a:b], sids[a:b])
+            for sid in np.unique(sids[a:b]).tolist():
+                rows = slice(a, b) if (sids[a:b] == sid).all() else np.flatnonzero(sids[a:b] == sid) + a
+                for resolution, width in RESOLUTIONS.items():
+                    key = (cid, sid, resolution)
+                    rollup = self._rollups.get(key)
+                    if rollup is None:
+                        rollup = self._rollups[key] = _Rollup(self.slots[resolution], width)
+                    rollup.add(times[rows], drift[rows], bins[rows])
+                    self._latest[resolution] = max(self._latest[resolution], rollup.latest)
+
+    def record_results(self, result):
+        """Records one IngestService result dict (source, timestamp, color_ids, drift)."""
+        n = len(result["color_ids"])
+        self.record_batch(result["color_ids"], result["drift"], result["source"],
+                          np.full(n, result["timestamp"]))
+
+    # ----------------------------
+    # Queries
+    # ----------------------------
+
+    def recent(self, color_id, start=-np.inf, end=np.inf, source=None):
+        """
+        Raw drift vectors still in the ring, oldest first.
+
+        Returns:
+            dict: {"timestamp": (k,), "drift": (k, 3), "source": [names]}
+        """
+        ring = self._rings.get(color_id)
+        sid = None if source is None else self._source_index.get(source, -1)
+        if ring is None:
+            return {"timestamp": np.zeros(0), "drift": np.zeros((0, 3)), "source": []}
+        times, drift, sources = ring.select(start, end, sid)
+        return {"timestamp": times, "drift": drift, "source": [self.sources[s] for s in sources.tolist()]}
+
+    def _merged(self, color_id, start, end, resolution, source):
+        """{bucket: (count, total (3,), hist)} over the selected sources."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution} (expected one of {list(RESOLUTIONS)})")
+        merged = {}
+        for (cid, sid, res), rollup in self._rollups.items():
+            if cid != color_id or res != resolution:
+                continue
+            if source is not None and self.sources[sid] != source:
+                continue
+            for slot in rollup.select(start, end, self._latest[resolution]).tolist():
+                bucket = int(rollup.bucket[slot])
+                entry = merged.get(bucket)
+                if entry is None:
+                    merged[bucket] = [rollup.count[slot], rollup.total[slot].copy(), rollup.hist[slot].copy()]
+                else:
+                    entry[0] += rollup.count[slot]
+                    entry[1] += rollup.total[slot]
+                    entry[2] += rollup.hist[slot]
+        return merged
+
+    def series(self, color_id, start=-np.inf, end=np.inf, resolution="minute", source=None):
+        """
+        Rolled-up drift for one colour, one row per minute / hour bucket.
+
+        Returns:
+            dict: {"start": (k,) epoch seconds, "count": (k,), "mean": (k, 3), "p95": (k,)}
+        """
+        merged = self._merged(color_id, start, end, resolution, source)
+        buckets = sorted(merged)
+        if not buckets:
+            return {"start": np.zeros(0), "count": np.zeros(0, dtype=np.int64),
+                    "mean": np.zeros((0, 3)), "p95": np.zeros(0)}
+        count = np.array([merged[b][0] for b in buckets], dtype=np.int64)
+        total = np.array([merged[b][1] for b in buckets])
+        hist = np.array([merged[b][2] for b in buckets])
+        return {
+            "start": np.array(buckets, dtype=np.float64) * RESOLUTIONS[resolution],
+            "count": count,
+            "mean": total / count[:, None],
+            "p95": _p95(hist),
+        }
+
+    def summary(self, color_id, start=-np.inf, end=np.inf, resolution=None):
+        """
+        Per-source totals over a time range, for calibration review. Uses minute
+        rollups when they still cover start, hour rollups otherwise; coverage
+        is measured back from the newest recorded timestamp.
+
+        Returns:
+            dict: {source: {"count": int, "mean": [dh, ds, dv], "p95": float}}
+        """
+        if resolution is None:
+            # Oldest minute still held: retention runs back from the newest bucket recorded
+            covered = (self._latest["minute"] - self.slots["minute"] + 1) * RESOLUTIONS["minute"]
+            resolution = "minute" if np.isfinite(start) and start >= covered else "hour"
+        report = {}
+        for source in self.sources:
+            merged = self._merged(color_id, start, end, resolution, source)
+            if not merged:
+                continue
+            count = sum(int(entry[0]) for entry in merged.values())
+            total = sum(entry[1] for entry in merged.values())
+            hist = sum(entry[2] for entry in merged.values())
+            report[source] = {"count": count, "mean": (total / count).tolist(), "p95": float(_p95(hist)[0])}
+        return report
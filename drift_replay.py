@@ -0,0 +1,291 @@
+# ------------------------------------------------------------
+# 🧱 Tool: drift_replay.py
+# Purpose: Offline drift tuning for BrickBeast from recorded sample streams
+# Scope: Replays a sample_recording.py file through ColorRegistry or ColorNode
+#        drift logic and sweeps parameter grids across worker processes
+# Features:
+#   - Replays at full speed through the real drift code (can_drift, apply_drift,
+#     recalibrate_dirty / ColorNode.add_sample)
+#   - Samples are matched in capture-sized batches with batch_matcher (one
+#     vectorized pass per batch against the centers at batch start, as
+#     IngestService does live); the registry recalibrates once per batch, and
+#     an optional DriftHistory gets one record_batch() per batch
+#   - Tunable: dampener, max_drift, tolerance_scale, calibrate threshold
+#   - Reports per-sample / per-part accuracy against recorded labels and drift
+#     stability (center travel, final drift from anchors)
+#   - sweep() runs every grid combination in a process pool; workers memory-map
+#     the recording and never write the live ColorReference.json
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import itertools
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_matcher import AnchorTable, match_indices
+from color_node import ColorNode
+from colorreferance import ColorRegistry
+from palette_cache import get_palette
+from palette_table import PaletteTable, gather
+from sample_recording import read_recording
+from utils import convert_hue
+
+ENGINES = {"registry": "degrees", "node": "opencv"}    # Hue scale each engine's centers use
+DEFAULT_PARAMS = {
+    "dampener": 0.2,
+    "max_drift": None,          # None keeps each reference's own max_drift
+    "tolerance_scale": 1.0,     # Multiplies every tolerance entry
+    "threshold": 0.01,          # calibrate / recalibrate_dirty threshold
+}
+NODE_TOLERANCE = {"hue": 12, "sat": 20, "val": 25}
+NODE_MAX_DRIFT = 6.0
+DEFAULT_BATCH = 256         # Samples matched per vectorized step; 1 replays sample by sample
+
+
+def _scaled(tolerance, scale):
+    return {key: value * scale for key, value in tolerance.items()}
+
+
+def _match_batches(hsv, ids, centers, batch_size, history, sources, timestamps):
+    """
+    Yields (rows, block, index) per batch: nearest center (L1) for every sample
+    of the batch against a snapshot of centers() taken at batch start. Drift
+    against the matched center goes to history.record_batch() when given.
+    """
+    for start in range(0, len(hsv), batch_size):
+        rows = slice(start, start + batch_size)
+        block = hsv[rows]
+        snapshot = centers()
+        index, _ = match_indices(block, AnchorTable(snapshot, ids))
+        if history is not None:
+            history.record_batch(ids[index], block - snapshot[index], sources[rows], timestamps[rows])
+        yield rows, block, index
+
+
+# ----------------------------
+# Engines
+# ----------------------------
+
+def _replay_registry(hsv, reference, params, tmpdir, batch_size, history, sources, timestamps):
+    if isinstance(reference, (str, os.PathLike)):
+        with open(reference, "r") as f:
+            reference = json.load(f)
+    entries = []
+    for entry in reference:
+        entry = dict(entry)
+        if params["max_drift"] is not None:
+            entry["max_drift"] = params["max_drift"]
+        entry["tolerance"] = _scaled(entry["tolerance"], params["tolerance_scale"])
+        entries.append(entry)
+    path = os.path.join(tmpdir, "ColorReference.json")
+    with open(path, "w") as f:
+        json.dump(entries, f)
+
+    # Private copy: journal / checkpoints stay in tmpdir, never touch the live file
+    registry = ColorRegistry(path, checkpoint_every=10 ** 9)
+    registry.calibrate(threshold=params["threshold"], dampener=params["dampener"])
+    refs = list(registry.registry.values())
+    ids = np.array([ref.color_id for ref in refs], dtype=np.int64)
+    anchors = gather(refs, "anchor")
+    centers = gather(refs, "drift_center")
+
+    predicted = np.empty(len(hsv), dtype=np.int64)
+    applied = 0
+    travel = 0.0
+    batches = _match_batches(hsv, ids, lambda: centers, batch_size, history, sources, timestamps)
+    for rows, block, index in batches:
+        predicted[rows] = index
+        accepted = 0
+        for sample, i in zip(block, index.tolist()):
+            ref = refs[i]
+            if ref.is_within_tolerance(sample) and ref.can_drift(sample, registry.registry):
+                registry.apply_drift(ref.color_id, sample, params["dampener"], recalibrate=False)
+                accepted += 1
+        if accepted:
+            registry.recalibrate_dirty(threshold=params["threshold"], dampener=params["dampener"])
+            moved = gather(refs, "drift_center")
+            travel += float(np.linalg.norm(moved - centers, axis=1).sum())
+            centers = moved
+            applied += accepted
+    return ids, anchors, centers, predicted, applied, travel
+
+
+def _replay_nodes(hsv, reference, params, tmpdir, batch_size, history, sources, timestamps):
+    palette = get_palette(reference)
+    max_drift = NODE_MAX_DRIFT if params["max_drift"] is None else params["max_drift"]
+    tolerance = _scaled(NODE_TOLERANCE, params["tolerance_scale"])
+    table = PaletteTable(capacity=len(palette))
+    nodes = [ColorNode(int(cid), name, rgb, hsv_anchor, type_, tolerance, max_drift, table=table)
+             for cid, name, rgb, hsv_anchor, type_ in zip(
+                 palette.color_ids.tolist(), palette.names, palette.rgb.tolist(),
+                 palette.hsv.tolist(), palette.types)]
+    ids = table.color_ids.copy()
+    anchors = table.anchor.copy()
+    centers = anchors.copy()
+
+    predicted = np.empty(len(hsv), dtype=np.int64)
+    applied = 0
+    travel = 0.0
+    batches = _match_batches(hsv, ids, centers.copy, batch_size, history, sources, timestamps)
+    for rows, block, index in batches:
+        predicted[rows] = index
+        for sample, i in zip(block, index.tolist()):
+            node = nodes[i]
+            node.add_sample(sample, params["dampener"])
+            step = float(np.linalg.norm(node.drift_center - centers[i]))
+            if step:
+                centers[i] = node.drift_center
+                travel += step
+                applied += 1
+    return ids, anchors, centers, predicted, applied, travel
+
+
+# ----------------------------
+# Replay
+# ----------------------------
+
+def replay_recording(recording, params=None, engine="registry", reference=None, limit=None,
+                     batch_size=DEFAULT_BATCH, history=None):
+    """
+    Pushes a recording through one engine with one parameter setting.
+
+    Args:
+        recording (str | Recording): Path from RecordingWriter, or an opened Recording
+        params (dict): Overrides for DEFAULT_PARAMS
+        engine (str): "registry" (ColorRegistry, ColorReference.json) or
+            "node" (ColorNode per bricklink_colours.json entry)
+        reference (str | list): Registry JSON path / entries, or palette path for "node"
+        limit (int): Replay only the first limit records
+        batch_size (int): Samples matched per batch against the centers at
+            batch start; 1 rematches after every drift
+        history (DriftHistory): Optional; receives every sample's drift from
+            its matched center, one record_batch() per batch
+
+    The registry engine measures center travel between batches, so
+    center_travel_per_1k is a net figure unless batch_size is 1.
+
+    Returns:
+        dict: Parameters plus accuracy and drift-stability measures
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine} (expected one of {list(ENGINES)})")
+    settings = dict(DEFAULT_PARAMS, **(params or {}))
+    unknown = set(settings) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown replay parameters: {sorted(unknown)}")
+    if reference is None:
+        reference = "ColorReference.json" if engine == "registry" else "bricklink_colours.json"
+    if isinstance(recording, (str, os.PathLike)):
+        recording = read_recording(recording)
+
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+
+    records = recording.records[:limit]
+    hsv = convert_hue(np.asarray(records["hsv"]), recording.hue_scale, ENGINES[engine])
+    hsv = hsv.astype(np.float64)
+    sources = timestamps = None
+    if history is not None:
+        sources = np.array(recording.sources, dtype=object)[np.asarray(records["source"])]
+        timestamps = np.asarray(records["timestamp"])
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        run = _replay_registry if engine == "registry" else _replay_nodes
+        ids, anchors, centers, predicted, applied, travel = run(
+            hsv, reference, settings, tmpdir, batch_size, history, sources, timestamps)
+    elapsed = time.perf_counter() - start
+
+    n = len(hsv)
+    predicted_ids = ids[predicted]
+    truth = recording.truth()[:n]
+    labelled = truth >= 0
+    drift = np.linalg.norm(centers - anchors, axis=1)
+
+    part_accuracy = None
+    if labelled.any():
+        # Majority vote per labelled part
+        parts = np.asarray(records["part"])[labelled]
+        votes = np.zeros((len(recording.parts), len(ids)), dtype=np.int64)
+        np.add.at(votes, (parts, predicted[labelled]), 1)
+        seen = np.unique(parts)
+        winners = ids[np.argmax(votes[seen], axis=1)]
+        expected = np.array([recording.labels[p] for p in seen.tolist()])
+        part_accuracy = float((winners == expected).mean())
+
+    return {
+        "engine": engine,
+        "params": settings,
+        "batch_size": batch_size,
+        "samples": n,
+        "sample_accuracy": float((predicted_ids[labelled] == truth[labelled]).mean()) if labelled.any() else None,
+        "part_accuracy": part_accuracy,
+        "drift_rate": applied / n if n else 0.0,
+        "center_travel_per_1k": travel / n * 1000 if n else 0.0,
+        "final_drift_mean": float(drift.mean()) if len(drift) else 0.0,
+        "final_drift_max": float(drift.max()) if len(drift) else 0.0,
+        "elapsed": elapsed,
+        "samples_per_second": n / elapsed if elapsed else 0.0,
+    }
+
+
+def _sweep_task(args):
+    path, params, engine, reference, limit, batch_size = args
+    return replay_recording(path, params, engine, reference, limit, batch_size)
+
+
+def parameter_grid(grid):
+    """{"dampener": [0.1, 0.2], ...} → list of parameter dicts (cartesian product)."""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def sweep(recording_path, grid, engine="registry", reference=None, workers=None, limit=None, mp_context=None,
+          batch_size=DEFAULT_BATCH):
+    """
+    Replays every combination in grid, one worker process per setting.
+
+    Returns:
+        list: replay_recording() results, best part (then sample) accuracy first,
+              ties broken by least center travel
+    """
+    tasks = [(recording_path, params, engine, reference, limit, batch_size) for params in parameter_grid(grid)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=mp_context) as pool:
+        results = list(pool.map(_sweep_task, tasks))
+    return sorted(results, key=lambda r: (-(r["part_accuracy"] or 0.0), -(r["sample_accuracy"] or 0.0),
+                                          r["center_travel_per_1k"]))
+
+
+if __name__ == "__main__":
+    from sample_recording import RecordingWriter
+
+    # Synthetic run: parts of each reference colour under a slowly warming camera
+    with open("ColorReference.json", "r") as f:
+        reference = json.load(f)
+    rng = np.random.default_rng(0)
+    path = os.path.join(tempfile.mkdtemp(), "synthetic.bbrec")
+    with RecordingWriter(path) as rec:
+        for part in range(300):
+            entry = reference[rng.integers(len(reference))]
+            center = convert_hue(np.array(entry["anchor_center"], dtype=float), "degrees", "opencv")
+            bias = np.array([0.0, -4.0, 6.0]) * part / 300
+            hsv = center + bias + rng.normal(0, 2.5, (40, 3))
+            hsv[:, 0] %= 180
+            rec.write(hsv, f"cam_{'AB'[part % 2]}", part_id=part, timestamp=1_700_000_000 + part)
+            rec.label(part, entry["color_id"])
+
+    grid = {"dampener": [0.05, 0.2, 0.5], "tolerance_scale": [0.5, 1.0, 2.0], "threshold": [0.01, 0.1]}
+    results = sweep(path, grid)
+    print(f"{len(results)} settings, best first:")
+    for r in results:
+        p = r["params"]
+        print(f"  dampener={p['dampener']:<5} tol x{p['tolerance_scale']:<4} threshold={p['threshold']:<5} "
+              f"part_acc={r['part_accuracy']:.3f} sample_acc={r['sample_accuracy']:.3f} "
+              f"drift_rate={r['drift_rate']:.3f} travel/1k={r['center_travel_per_1k']:.2f} "
+              f"{r['samples_per_second']:.0f} samples/s")
@@ -0,0 +1,138 @@
+# ------------------------------------------------------------
+# 🧱 Tool: frame_classifier.py
+# Purpose: Classifies whole camera frames against BrickBeast's reference anchors
+# Scope: Takes an HxWx3 uint8 frame plus optional part mask, returns per-pixel
+#        color_ids and a per-color histogram for the part
+# Features:
+#   - Accepts HSV (OpenCV 0–180 hue, matching bricklink_colours.json) or RGB frames
+#   - Uses the anchors from reference_loader.build_reference_grid via batch_matcher
+#   - Optional LutCube path for one-lookup-per-pixel classification
+#   - Processes the frame in row tiles so peak memory stays bounded
+#   - No per-pixel Python objects; histogram built with np.bincount
+#   - Rejects non-uint8 frames and non-bool masks; an empty anchor table yields
+#     an all -1 color map and an empty histogram
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+
+from batch_matcher import AnchorTable, MAX_L1_DRIFT, NO_COLOR_ID, build_anchor_table, match_indices
+from utils import rgb_to_hsv
+
+DEFAULT_TILE_ROWS = 64
+
+
+def classify_frame(frame, reference, mask=None, color_space="hsv", cube=None,
+                   tile_rows=DEFAULT_TILE_ROWS):
+    """
+    Classifies every (masked) pixel of a frame.
+
+    Args:
+        frame (np.ndarray): HxWx3 uint8 image
+        reference (dict | AnchorTable): Grid from build_reference_grid(), or prepacked anchors
+        mask (np.ndarray): Optional HxW bool part mask; unmasked pixels get color_id -1
+        color_space (str): "hsv" or "rgb"
+        cube (LutCube): Optional lookup cube; used instead of anchor matching when given
+        tile_rows (int): Rows classified per tile
+
+    Returns:
+        dict: {
+            "color_map": HxW int32 color_ids (-1 = masked out / no match),
+            "histogram": {color_id: {"pixels": int, "confidence": float}},
+            "pixels": int
+        }
+    """
+    frame = np.asarray(frame)
+    if frame.ndim != 3 or frame.shape[2] != 3:
+        raise ValueError(f"Expected an HxWx3 frame, got shape {frame.shape}")
+    if frame.dtype != np.uint8:
+        raise ValueError(f"Expected a uint8 frame, got {frame.dtype}")
+    if color_space not in ("hsv", "rgb"):
+        raise ValueError(f"Unknown color space: {color_space}")
+    if mask is not None:
+        mask = np.asarray(mask)
+        if mask.shape != frame.shape[:2]:
+            raise ValueError(f"Mask shape {mask.shape} does not match frame {frame.shape[:2]}")
+        if mask.dtype != np.bool_:
+            raise ValueError(f"Expected a bool mask, got {mask.dtype}")
+
+    table = reference if isinstance(reference, AnchorTable) else build_anchor_table(reference)
+    height, width = frame.shape[:2]
+    color_map = np.full((height, width), NO_COLOR_ID, dtype=np.int32)
+    total = int(mask.sum()) if mask is not None else height * width
+    if cube is None and len(table) == 0:
+        return {"color_map": color_map, "histogram": {}, "pixels": total}
+
+    # Histogram accumulates over anchor rows, then folds onto color_ids at the end
+    counts = np.zeros(len(table), dtype=np.int64)
+    conf_sums = np.zeros(len(table), dtype=np.float64)
+    cube_counts = {}
+
+    for top in range(0, height, tile_rows):
+        tile = frame[top:top + tile_rows]
+        tile_map = color_map[top:top + tile_rows]
+        if mask is not None:
+            tile_mask = mask[top:top + tile_rows]
+            pixels = tile[tile_mask]
+        else:
+            tile_mask = None
+            pixels = tile.reshape(-1, 3)
+        if not len(pixels):
+            continue
+        if color_space == "rgb":
+            pixels = rgb_to_hsv(pixels)
+
+        if cube is not None:
+            ids, confidence = cube.classify(pixels)
+            for cid, n, c in _fold(ids, confidence):
+                entry = cube_counts.setdefault(cid, [0, 0.0])
+                entry[0] += n
+                entry[1] += c
+        else:
+            index, magnitude = match_indices(pixels, table)
+            ids = table.color_ids[index]
+            confidence = np.maximum(0, 1 - magnitude / MAX_L1_DRIFT)
+            counts += np.bincount(index, minlength=len(table))
+            conf_sums += np.bincount(index, weights=confidence, minlength=len(table))
+
+        if tile_mask is not None:
+            tile_map[tile_mask] = ids
+        else:
+            tile_map[...] = ids.reshape(tile_map.shape)
+
+    if cube is not None:
+        folded = cube_counts
+    else:
+        folded = {}
+        for row in np.flatnonzero(counts):
+            entry = folded.setdefault(int(table.color_ids[row]), [0, 0.0])
+            entry[0] += int(counts[row])
+            entry[1] += float(conf_sums[row])
+
+    histogram = {
+        (None if cid == NO_COLOR_ID else cid): {
+            "pixels": n,
+            "confidence": conf_sum / n if n else 0.0
+        }
+        for cid, (n, conf_sum) in sorted(folded.items(), key=lambda item: -item[1][0])
+    }
+    return {"color_map": color_map, "histogram": histogram, "pixels": total}
+
+
+def _fold(ids, confidence):
+    """Yields (color_id, pixel_count, confidence_sum) for one tile of cube results."""
+    uniq, inverse = np.unique(ids, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(uniq))
+    if confidence is None:
+        sums = np.zeros(len(uniq))
+    else:
+        sums = np.bincount(inverse, weights=confidence, minlength=len(uniq))
+    return zip(uniq.tolist(), counts.tolist(), sums.tolist())
+
+
+def dominant_color(result):
+    """Returns the color_id with the most pixels in a classify_frame() result, or None."""
+    for cid in result["histogram"]:
+        return cid
+    return None
@@ -0,0 +1,482 @@
+# ------------------------------------------------------------
+# 🧱 Tool: grid_presistence.py
+# Purpose: Saves and reloads BrickBeast's reference grid as a compact binary snapshot
+# Scope: Columnar snapshot writer/reader plus JSON interop with save_reference_grid()
+# Features:
+#   - Single-file format: magic + JSON header + 64-byte aligned raw arrays
+#   - Node fields, sample history and drift history stored as flat columns + offsets
+#   - Arrays are memory-mapped on load; dict grids are rebuilt only on request
+#   - SampleStore-backed nodes are encoded straight from the store's arrays;
+#     dict grids are built/decoded column-wise with the cyclic GC paused
+#   - Anything that doesn't fit a column falls back to per-node JSON, so
+#     grid → snapshot → grid round-trips exactly (values, types and key order)
+#   - Converts to and from the stringified-key JSON grid format
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import gc
+import json
+import os
+from contextlib import contextmanager
+
+import numpy as np
+
+from sample_store import NodeDrift, NodeSamples, json_default
+
+MAGIC = b"BBGRID1\0"
+ALIGN = 64
+SAMPLE_FIELDS = ("h", "s", "v", "source", "timestamp")
+DRIFT_FIELDS = ("dh", "ds", "dv")
+NO_SOURCE = -1
+
+
+def _is_int(value):
+    return type(value) is int
+
+
+def _intern(table, index, value):
+    key = value if not isinstance(value, list) else tuple(value)
+    found = index.get(key)
+    if found is None:
+        found = index[key] = len(table)
+        table.append(value)
+    return found
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Rebuilding a grid allocates ~100k small dicts/lists, none of them cyclic;
+    left on, the cyclic collector rescans them over and over (2-3x the runtime).
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+# ----------------------------
+# Encoding
+# ----------------------------
+
+def _sample_columns(samples, sources, source_index, sample_layouts, layout_index):
+    """
+    One pass over a list of sample dicts. Returns (hsv, source, timestamp,
+    layout) lists, or None if any sample doesn't fit the columns.
+    """
+    hsv, source, ts, layout = [], [], [], []
+    for sample in samples:
+        if not isinstance(sample, dict):
+            return None
+        fields = tuple(sample)
+        if fields[:3] != ("h", "s", "v") or any(key not in SAMPLE_FIELDS for key in fields[3:]):
+            return None
+        h, s, v = sample["h"], sample["s"], sample["v"]
+        if not (_is_int(h) and _is_int(s) and _is_int(v)):
+            return None
+        src = sample.get("source")
+        if "source" in sample and not isinstance(src, str):
+            return None
+        stamp = sample.get("timestamp", np.nan)
+        if "timestamp" in sample and not isinstance(stamp, float):
+            return None
+        hsv.append((h, s, v))
+        source.append(NO_SOURCE if src is None else _intern(sources, source_index, src))
+        ts.append(stamp)
+        layout.append(_intern(sample_layouts, layout_index, fields))
+    return hsv, source, ts, layout
+
+
+def _int_anchor(anchor):
+    return (type(anchor) is dict and tuple(anchor)[:3] == ("h", "s", "v")
+            and type(anchor["h"]) is int and type(anchor["s"]) is int and type(anchor["v"]) is int)
+
+
+def _columnar_drift(drift):
+    return all(
+        isinstance(d, dict) and tuple(d) == DRIFT_FIELDS and all(_is_int(d[k]) for k in DRIFT_FIELDS)
+        for d in drift
+    )
+
+
+def _store_view(samples):
+    """True for a SampleStore NodeSamples view with integer hsv (vectorized path)."""
+    return isinstance(samples, NodeSamples) and samples.store.hsv.dtype.kind in "iu"
+
+
+class _Columns:
+    """
+    Per-sample (or per-drift) columns: plain-list nodes extend Python lists,
+    store-backed nodes add whole arrays; build() orders everything by node.
+    """
+
+    def __init__(self, count, width=3):
+        self.width = width
+        self.pos = []
+        self.lists = [[] for _ in range(count)]
+        self.parts = []
+
+    def extend(self, i, *columns):
+        self.pos.extend([i] * len(columns[0]))
+        for target, values in zip(self.lists, columns):
+            target.extend(values)
+
+    def add(self, pos, *columns):
+        self.parts.append((pos, columns))
+
+    def build(self, dtypes):
+        parts = [(np.array(self.pos, dtype=np.int64), self.lists)] + self.parts
+        out = []
+        for i, dtype in enumerate(dtypes):
+            pieces = [np.asarray(columns[i], dtype=dtype) for _, columns in parts]
+            if i == 0:
+                pieces = [piece.reshape(-1, self.width) for piece in pieces]
+            out.append(np.concatenate(pieces))
+        if self.parts:
+            # Keeps each node's rows in order: a node's rows all come from one part
+            order = np.argsort(np.concatenate([pos for pos, _ in parts]), kind="stable")
+            out = [column[order] for column in out]
+        return out
+
+
+def _store_samples(store, nodes, sources, source_index, sample_layouts, layout_index):
+    """
+    Sample columns for every grid node viewing store, straight from its arrays.
+
+    Args:
+        nodes (list): [(grid position, store node id), ...]
+
+    Returns:
+        tuple: (grid position per row, hsv, source, timestamp, layout, row ids)
+    """
+    pos_of_nid = np.full(len(store.node_keys), -1, dtype=np.int64)
+    positions, nids = zip(*nodes)
+    pos_of_nid[list(nids)] = positions
+    row_pos = pos_of_nid[store.node[:store.size]]
+    rows = np.flatnonzero(row_pos >= 0)
+
+    remap = np.array([_intern(sources, source_index, name) for name in store.sources] or [0], dtype=np.int64)
+    ts = store.timestamp[rows]
+    plain = _intern(sample_layouts, layout_index, ("h", "s", "v", "source"))
+    stamped = _intern(sample_layouts, layout_index, ("h", "s", "v", "source", "timestamp"))
+    layout = np.where(np.isnan(ts), plain, stamped)
+    return row_pos[rows], store.hsv[rows], remap[store.source[rows]], ts, layout, rows
+
+
+def encode_grid(grid):
+    """
+    Splits a grid into flat arrays and a small JSON header. SampleStore-backed
+    nodes are encoded straight from the store's columns.
+
+    Returns:
+        tuple: (arrays {name: np.ndarray}, header dict)
+    """
+    n = len(grid)
+    keys = list(grid)
+    int_keys = all(len(k) == 3 and all(_is_int(x) for x in k) for k in keys)
+    if not all(isinstance(k, tuple) and len(k) == 3 for k in keys):
+        raise ValueError("Grid keys must be (h, s, v) tuples")
+
+    arrays = {
+        "keys": np.array(keys, dtype=np.int64 if int_keys else np.float64).reshape(n, 3),
+        "layout": np.zeros(n, dtype=np.int32),
+        "color_id": np.zeros(n, dtype=np.int64),
+        "color_kind": np.full(n, 2, dtype=np.uint8),      # 0 int, 1 None, 2 absent / JSON
+        "sample_density": np.zeros(n, dtype=np.int64),
+        "pole_locked": np.zeros(n, dtype=bool),
+        "anchor": np.zeros((n, 3), dtype=np.int64),
+        "anchor_kind": np.full(n, 2, dtype=np.uint8),     # 0 columns, 1 None, 2 absent / JSON, 3 + source
+        "anchor_source": np.full(n, NO_SOURCE, dtype=np.int32),
+    }
+    sample_counts = np.zeros(n, dtype=np.int64)
+    drift_counts = np.zeros(n, dtype=np.int64)
+    samples = _Columns(4)
+    drifts = _Columns(1)
+    sample_views = {}   # id(store) → (store, [(position, nid)])
+    drift_views = {}
+    drift_anchor = np.zeros((n, 3), dtype=np.int64)
+
+    layouts, layout_index = [], {}
+    sources, source_index = [], {}
+    sample_layouts, sample_layout_index = [], {}
+    rest = [None] * n
+
+    for i, key in enumerate(keys):
+        node = grid[key]
+        arrays["layout"][i] = _intern(layouts, layout_index, tuple(node))
+        extra = {}
+
+        for field, value in node.items():
+            if field == "color_id" and (value is None or _is_int(value)):
+                arrays["color_kind"][i] = 1 if value is None else 0
+                arrays["color_id"][i] = value or 0
+            elif field == "sample_density" and _is_int(value):
+                arrays["sample_density"][i] = value
+            elif field == "pole_locked" and isinstance(value, bool):
+                arrays["pole_locked"][i] = value
+            elif field == "anchor" and value is None:
+                arrays["anchor_kind"][i] = 1
+            elif field == "anchor" and _int_anchor(value):
+                arrays["anchor"][i] = (value["h"], value["s"], value["v"])
+                if len(value) == 3:
+                    arrays["anchor_kind"][i] = 0
+                elif len(value) == 4 and tuple(value)[3] == "source" and isinstance(value["source"], str):
+                    # load_area_array anchors are the first sample dict, source included
+                    arrays["anchor_kind"][i] = 3
+                    arrays["anchor_source"][i] = _intern(sources, source_index, value["source"])
+                else:
+                    arrays["anchor_kind"][i] = 0
+                    extra["@anchor"] = {k: v for k, v in value.items() if k not in ("h", "s", "v")}
+            elif field == "samples" and _store_view(value):
+                sample_views.setdefault(id(value.store), (value.store, []))[1].append((i, value.nid))
+                sample_counts[i] = len(value)
+            elif field == "samples" and isinstance(value, list):
+                columns = _sample_columns(value, sources, source_index, sample_layouts, sample_layout_index)
+                if columns is None:
+                    extra[field] = value
+                else:
+                    samples.extend(i, *columns)
+                    sample_counts[i] = len(value)
+            elif field == "samples" and hasattr(value, "hsv"):
+                extra[field] = list(value)
+            elif (field == "drift" and isinstance(value, NodeDrift) and _store_view(value.samples)
+                  and _int_anchor(value.node.get("anchor"))):
+                # Derived drift: |sample - anchor|, computed for all such nodes at once below
+                anchor = value.node["anchor"]
+                drift_anchor[i] = (anchor["h"], anchor["s"], anchor["v"])
+                drift_views.setdefault(id(value.samples.store), (value.samples.store, []))[1].append(
+                    (i, value.samples.nid))
+                drift_counts[i] = len(value)
+            elif field == "drift" and isinstance(value, NodeDrift):
+                rows = value.array().astype(np.int64).reshape(-1, 3)
+                drifts.extend(i, rows.tolist())
+                drift_counts[i] = len(rows)
+            elif field == "drift" and isinstance(value, list) and _columnar_drift(value):
+                drifts.extend(i, [(d["dh"], d["ds"], d["dv"]) for d in value])
+                drift_counts[i] = len(value)
+            else:
+                extra[field] = value
+
+        if extra:
+            rest[i] = extra
+
+    for store, nodes in sample_views.values():
+        pos, hsv, source, ts, layout, _ = _store_samples(store, nodes, sources, source_index,
+                                                         sample_layouts, sample_layout_index)
+        samples.add(pos, hsv, source, ts, layout)
+    for store, nodes in drift_views.values():
+        pos, hsv, *_ = _store_samples(store, nodes, sources, source_index, sample_layouts, sample_layout_index)
+        drifts.add(pos, np.abs(hsv.astype(np.int64) - drift_anchor[pos]))
+
+    arrays["sample_offsets"] = np.concatenate([[0], np.cumsum(sample_counts)])
+    arrays["drift_offsets"] = np.concatenate([[0], np.cumsum(drift_counts)])
+    (arrays["sample_hsv"], arrays["sample_source"], arrays["sample_timestamp"],
+     arrays["sample_layout"]) = samples.build((np.int64, np.int32, np.float64, np.uint8))
+    arrays["drift"], = drifts.build((np.int64,))
+
+    if len(sample_layouts) > 255:
+        raise ValueError("Too many distinct sample layouts")
+
+    header = {
+        "version": 1,
+        "nodes": n,
+        "layouts": layouts,
+        "sources": sources,
+        "sample_layouts": sample_layouts,
+        "rest": rest,
+    }
+    return arrays, header
+
+
+# ----------------------------
+# File format
+# ----------------------------
+
+def save_grid_snapshot(filepath, grid):
+    """Writes grid to filepath atomically (temp file + rename)."""
+    with _gc_paused():
+        arrays, header = encode_grid(grid)
+
+    # Header offsets depend on header length, so settle the layout first
+    descriptors = {name: {"dtype": a.dtype.str, "shape": list(a.shape), "offset": 0}
+                   for name, a in arrays.items()}
+    header["arrays"] = descriptors
+    for _ in range(3):
+        blob = json.dumps(header, default=json_default).encode("utf-8")
+        offset = _align(len(MAGIC) + 8 + len(blob))
+        for name, a in arrays.items():
+            descriptors[name]["offset"] = offset
+            offset = _align(offset + a.nbytes)
+        settled = json.dumps(header, default=json_default).encode("utf-8")
+        if len(settled) == len(blob):
+            break
+    blob = settled
+
+    tmp = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(blob)).tobytes())
+        f.write(blob)
+        for name, a in arrays.items():
+            f.write(b"\0" * (descriptors[name]["offset"] - f.tell()))
+            f.write(np.ascontiguousarray(a).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filepath)
+
+
+def _align(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+class GridSnapshot:
+    """Opened snapshot: memory-mapped column arrays plus the JSON header."""
+
+    def __init__(self, header, arrays):
+        self.header = header
+        self.arrays = arrays
+
+    def __len__(self):
+        return self.header["nodes"]
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def node_samples(self, i):
+        offsets = self.arrays["sample_offsets"]
+        return slice(int(offsets[i]), int(offsets[i + 1]))
+
+    def to_grid(self):
+        """Rebuilds the exact dict grid that was saved."""
+        with _gc_paused():
+            return self._build_grid()
+
+    def _build_grid(self):
+        a = self.arrays
+        h = self.header
+        layouts, rest = h["layouts"], h["rest"]
+        n = len(self)
+
+        # Whole columns first; the node loop below only assembles dicts
+        names = h["sources"]
+        s_off, d_off = a["sample_offsets"].tolist(), a["drift_offsets"].tolist()
+        sample_records = _sample_records(a, h["sources"], h["sample_layouts"])
+        drift_records = [{"dh": dh, "ds": ds, "dv": dv} for dh, ds, dv in a["drift"].tolist()]
+        columns = {
+            "color_id": [None if kind == 1 else cid
+                         for cid, kind in zip(a["color_id"].tolist(), a["color_kind"].tolist())],
+            "sample_density": a["sample_density"].tolist(),
+            "pole_locked": a["pole_locked"].tolist(),
+            "anchor": [
+                None if kind == 1 else
+                {"h": hh, "s": ss, "v": vv, "source": names[src]} if kind == 3 else
+                {"h": hh, "s": ss, "v": vv}
+                for (hh, ss, vv), kind, src in zip(a["anchor"].tolist(), a["anchor_kind"].tolist(),
+                                                   a["anchor_source"].tolist())
+            ],
+            "samples": [sample_records[s_off[i]:s_off[i + 1]] for i in range(n)],
+            "drift": [drift_records[d_off[i]:d_off[i + 1]] for i in range(n)],
+        }
+        layout_columns = [[(field, columns.get(field)) for field in fields] for fields in layouts]
+
+        grid = {}
+        for i, (key, layout, extra) in enumerate(zip(map(tuple, a["keys"].tolist()), a["layout"].tolist(), rest)):
+            if extra is None:
+                grid[key] = {field: column[i] for field, column in layout_columns[layout]}
+                continue
+            node = {}
+            for field, column in layout_columns[layout]:
+                node[field] = extra[field] if field in extra else column[i]
+            if "@anchor" in extra and isinstance(node.get("anchor"), dict):
+                node["anchor"].update(extra["@anchor"])
+            grid[key] = node
+        return grid
+
+
+def _sample_records(a, sources, sample_layouts):
+    n = len(a["sample_layout"])
+    names = sources + [None]                # NO_SOURCE (-1) → None
+    values = {
+        "h": a["sample_hsv"][:, 0].tolist(),
+        "s": a["sample_hsv"][:, 1].tolist(),
+        "v": a["sample_hsv"][:, 2].tolist(),
+        "source": [names[src] for src in a["sample_source"].tolist()],
+        "timestamp": a["sample_timestamp"].tolist(),
+    }
+    layout = np.asarray(a["sample_layout"])
+    if len(sample_layouts) == 1:
+        fields = sample_layouts[0]
+        return [dict(zip(fields, row)) for row in zip(*(values[field] for field in fields))]
+
+    # One pass per layout, then scatter back into sample order
+    records = [None] * n
+    for lay, fields in enumerate(sample_layouts):
+        rows = np.flatnonzero(layout == lay).tolist()
+        columns = [values[field] for field in fields]
+        for row in rows:
+            records[row] = dict(zip(fields, [column[row] for column in columns]))
+    return records
+
+
+def load_grid_snapshot(filepath, mmap=True):
+    """
+    Opens a snapshot. With mmap=True the column arrays are read-only views
+    onto the file; nothing is copied until used.
+    """
+    with open(filepath, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a grid snapshot: {filepath}")
+        length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(length).decode("utf-8"))
+        arrays = {}
+        for name, desc in header["arrays"].items():
+            dtype, shape = np.dtype(desc["dtype"]), tuple(desc["shape"])
+            if not int(np.prod(shape)):
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            elif mmap:
+                arrays[name] = np.memmap(filepath, dtype=dtype, mode="r", offset=desc["offset"], shape=shape)
+            else:
+                f.seek(desc["offset"])
+                arrays[name] = np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+    return GridSnapshot(header, arrays)
+
+
+def load_grid(filepath):
+    """Snapshot file → dict grid keyed by (h, s, v)."""
+    return load_grid_snapshot(filepath, mmap=False).to_grid()
+
+
+# ----------------------------
+# JSON Interop
+# ----------------------------
+
+def _parse_key(text):
+    parts = text.split(",")
+    return tuple(int(p) if p.lstrip("-").isdigit() else float(p) for p in parts)
+
+
+def load_grid_json(filepath):
+    """Reads a grid written by reference_loader.save_reference_grid()."""
+    with open(filepath, "r") as f:
+        raw = json.load(f)
+    return {_parse_key(key): node for key, node in raw.items()}
+
+
+def save_grid_json(filepath, grid):
+    serializable_grid = {
+        f"{h},{s},{v}": data for (h, s, v), data in grid.items()
+    }
+    with open(filepath, "w") as f:
+        json.dump(serializable_grid, f, indent=2, default=json_default)
+
+
+def json_to_snapshot(json_path, snapshot_path):
+    save_grid_snapshot(snapshot_path, load_grid_json(json_path))
+
+
+def snapshot_to_json(snapshot_path, json_path):
+    save_grid_json(json_path, load_grid(snapshot_path))
@@ -1,8 +1,14 @@
-class LegoColorNode:
-    def __init__(self, name, number_id, hsv_anchor):
+from palette_table import TableColumn, TableRowView
+
+class LegoColorNode(TableRowView):
+    __slots__ = ("_table", "_row", "name", "number_id", "samples", "area_size", "confidence")
+
+    hsv_anchor = TableColumn("anchor")
+
+    def __init__(self, name, number_id, hsv_anchor, table=None):
         self.name = name
         self.number_id = number_id
-        self.hsv_anchor = hsv_anchor
+        self._bind(table, number_id, anchor=hsv_anchor)
         self.samples = []
         self.area_size = 1.0
         self.confidence = None
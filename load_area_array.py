@@ -7,23 +7,52 @@
 #   - Logs HSV drift relative to anchor
 #   - Updates sample density and node history
 #   - Computes confidence score based on drift magnitude
+#   - Optional SampleStore backing: nodes hold views, not per-sample dicts
+#   - VoxelAreaArray: quantized dense voxel grid with scatter-add batch ingest;
+#     out-of-range samples are counted in .rejected instead of clipped into edge voxels
+#   - Latency and sample counts recorded through metrics.py when enabled
 # Created by: Craig Wilson / Copilot
-# Last Updated: 2025-09-04
+# Last Updated: 2026-10-17
 # ------------------------------------------------------------
 
-def load_area_array(samples, grid, drift_threshold=(10, 10, 10)):
+import numpy as np
+
+import metrics
+from batch_matcher import NO_COLOR_ID, as_hsv_array, match_batch
+from sample_store import NodeDrift
+
+DEFAULT_BINS = (4, 4, 4)    # HSV units per voxel along each axis
+
+
+def _new_node(key, store=None):
+    node = {
+        "color_id": None,
+        "sample_density": 0,
+        "pole_locked": False,
+        "samples": [],
+        "anchor": None,
+        "drift": []
+    }
+    if store is not None:
+        node["samples"] = store.view(key)
+        node["drift"] = NodeDrift(node["samples"], node)
+    return node
+
+
+@metrics.timed("load_area_array")
+def load_area_array(samples, grid, drift_threshold=(10, 10, 10), store=None):
+    """
+    store (SampleStore): optional; new nodes then log samples into the store
+    and derive their drift records instead of keeping dict lists.
+    """
+    metrics.inc("samples", len(samples), stage="load_area_array")
     results = []
 
     for sample in samples:
         h, s, v = sample["h"], sample["s"], sample["v"]
-        node = grid.setdefault((h, s, v), {
-            "color_id": None,
-            "sample_density": 0,
-            "pole_locked": False,
-            "samples": [],
-            "anchor": None,
-            "drift": []
-        })
+        node = grid.get((h, s, v))
+        if node is None:
+            node = grid[(h, s, v)] = _new_node((h, s, v), store)
 
         # Anchor if needed
         if node["anchor"] is None:
@@ -36,7 +65,8 @@ def load_area_array(samples, grid, drift_threshold=(10, 10, 10)):
             "ds": abs(sample["s"] - anchor["s"]),
             "dv": abs(sample["v"] - anchor["v"])
         }
-        node["drift"].append(drift)
+        if not isinstance(node["drift"], NodeDrift):    # Store-backed drift is derived from samples
+            node["drift"].append(drift)
 
         # Update density and samples
         node["sample_density"] += 1
@@ -54,3 +84,122 @@ def load_area_array(samples, grid, drift_threshold=(10, 10, 10)):
         })
 
     return results
+
+
+# ----------------------------
+# Voxelized Area Array
+# ----------------------------
+
+class VoxelAreaArray:
+    """
+    Dense, preallocated replacement for the one-dict-per-HSV-triple grid.
+    Each voxel covers bins[axis] HSV units and keeps count, first-hit anchor,
+    summed |drift| and max |drift|: 53 bytes per voxel. bins=(1, 1, 1)
+    reproduces load_area_array exactly but costs 53 B x 16.7M voxels ~ 0.9 GB;
+    the default (4, 4, 4) is 53 B x 262K voxels ~ 14 MB. ingest() also
+    allocates an 8-byte bincount temporary per voxel while it runs.
+    """
+
+    def __init__(self, bins=DEFAULT_BINS, value_range=256):
+        self.bins = np.array(bins, dtype=np.int64)
+        self.value_range = value_range
+        self.shape = tuple(int(-(-value_range // b)) for b in bins)
+        size = int(np.prod(self.shape))
+
+        self.count = np.zeros(size, dtype=np.int64)
+        self.anchored = np.zeros(size, dtype=bool)
+        self.anchor = np.zeros((size, 3), dtype=np.int16)
+        self.drift_sum = np.zeros((size, 3), dtype=np.int64)
+        self.drift_max = np.zeros((size, 3), dtype=np.int16)
+        self.color_id = np.full(size, NO_COLOR_ID, dtype=np.int64)
+        self.rejected = 0           # Samples outside 0..value_range-1, never counted in a voxel
+
+    def voxel_index(self, hsv):
+        """Flat voxel index per sample; -1 where any channel is outside 0..value_range-1."""
+        hsv = np.asarray(hsv, dtype=np.int64).reshape(-1, 3)
+        valid = np.all((hsv >= 0) & (hsv < self.value_range), axis=1)
+        index = np.full(len(hsv), -1, dtype=np.int64)
+        index[valid] = np.ravel_multi_index((hsv[valid] // self.bins).T, self.shape)
+        return index
+
+    def voxel_center(self, index):
+        cells = np.stack(np.unravel_index(index, self.shape), axis=-1)
+        return cells * self.bins + self.bins // 2
+
+    def ingest(self, hsv):
+        """
+        Scatter-adds one batch of HSV samples. Out-of-range samples are skipped
+        and counted in self.rejected; they come back with index -1, zero drift
+        and zero confidence.
+
+        Returns:
+            tuple: (voxel index (N,), |drift| (N, 3), confidence (N,))
+        """
+        hsv = as_hsv_array(hsv).astype(np.int64)
+        all_index = self.voxel_index(hsv)
+        valid = all_index >= 0
+        self.rejected += int(len(valid) - np.count_nonzero(valid))
+        all_drift = np.zeros((len(hsv), 3), dtype=np.int64)
+        all_confidence = np.zeros(len(hsv))
+        hsv, index = hsv[valid], all_index[valid]
+
+        # Anchor unanchored voxels on their first hit in this batch
+        voxels, first = np.unique(index, return_index=True)
+        fresh = ~self.anchored[voxels]
+        self.anchor[voxels[fresh]] = hsv[first[fresh]]
+        self.anchored[voxels[fresh]] = True
+
+        drift = np.abs(hsv - self.anchor[index])
+        # Scatter updates (bincount is the fast path for np.add.at on flat indices)
+        size = len(self.count)
+        self.count += np.bincount(index, minlength=size)
+        for axis in range(3):
+            self.drift_sum[:, axis] += np.bincount(index, weights=drift[:, axis], minlength=size).astype(np.int64)
+            np.maximum.at(self.drift_max[:, axis], index, drift[:, axis].astype(np.int16))
+
+        all_drift[valid] = drift
+        all_confidence[valid] = np.maximum(0, 255 - drift.sum(axis=1)) / 255
+        return all_index, all_drift, all_confidence
+
+    def label_from_anchors(self, table):
+        """Assigns color_ids to anchored voxels from their nearest reference anchor."""
+        voxels = np.flatnonzero(self.anchored)
+        if len(voxels) and len(table):
+            self.color_id[voxels] = match_batch(self.anchor[voxels], table)[0]
+
+    def mean_drift(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.drift_sum / self.count[:, None]
+
+    def occupied(self):
+        return np.flatnonzero(self.count)
+
+    def records(self, index, drift, confidence):
+        """Builds load_area_array-style result dicts for one ingest() batch."""
+        valid = index >= 0
+        centers = self.voxel_center(np.where(valid, index, 0)).tolist()
+        color_ids = np.where(valid, self.color_id[index], NO_COLOR_ID).tolist()
+        return [
+            {
+                "center": tuple(center) if ok else None,
+                "color_id": None if cid == NO_COLOR_ID else cid,
+                "confidence": round(c, 3),
+                "drift": {"dh": dh, "ds": ds, "dv": dv}
+            }
+            for ok, center, cid, c, (dh, ds, dv) in zip(valid.tolist(), centers, color_ids,
+                                                        confidence.tolist(), drift.tolist())
+        ]
+
+
+def load_area_array_voxels(samples, voxels):
+    """
+    Voxel-backed load_area_array(): same result records, one vectorized pass.
+
+    Args:
+        samples (list | np.ndarray): Sample dicts or an (N, 3) HSV array
+        voxels (VoxelAreaArray): Area array to update in place
+
+    Returns:
+        list: [{"center", "color_id", "confidence", "drift"}, ...]
+    """
+    return voxels.records(*voxels.ingest(samples))
@@ -1,35 +1,68 @@
-import json
+# ------------------------------------------------------------
+# 🧱 Tool: load_bricklink_colours.py
+# Purpose: Builds LegoColorNode objects from the BrickLink palette
+# Scope: One node per bricklink_colours.json entry, hsv used as the initial anchor
+# Features:
+#   - Importing does no I/O: palette / color_nodes load on first attribute access
+#   - Palette read through the compiled palette cache (palette_cache.py)
+#   - LegoColorNode is a __slots__ view; load_color_nodes() shares one PaletteTable
+#     (a palette with a repeated colourID raises instead of sharing a row)
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
 
-class LegoColorNode:
-    def __init__(self, colourID, colourName, hex_code, rgb, hsv, type_):
+from palette_cache import DEFAULT_PALETTE, get_palette
+from palette_table import PaletteTable, TableColumn, TableRowView
+
+class LegoColorNode(TableRowView):
+    __slots__ = ("_table", "_row", "colourID", "colourName", "hex_code", "type", "samples")
+
+    rgb = TableColumn("rgb")
+    hsv_anchor = TableColumn("anchor")
+
+    def __init__(self, colourID, colourName, hex_code, rgb, hsv, type_, table=None):
         self.colourID = colourID
         self.colourName = colourName
         self.hex_code = hex_code
-        self.rgb = rgb
-        self.hsv_anchor = hsv  # Use these as initial anchors
         self.type = type_
         self.samples = []
+        self._bind(table, colourID, anchor=hsv, rgb=rgb)  # Use these as initial anchors
 
     def __repr__(self):
         return f"{self.colourName} (ID: {self.colourID})"
 
-# Load JSON
-with open('bricklink_colours.json', 'r') as f:
-    palette = json.load(f)
-
-# Initialize color nodes
-color_nodes = []
-for color_data in palette.values():
-    node = LegoColorNode(
-        colourID=color_data['colourID'],
-        colourName=color_data['colourName'],
-        hex_code=color_data['hex'],
-        rgb=color_data['rgb'],
-        hsv=color_data['hsv'],
-        type_=color_data['type']
-    )
-    color_nodes.append(node)
-
-# Example: Print the first few nodes
-for node in color_nodes[:5]:
-    print(node)
\ No newline at end of file
+def load_color_nodes(filepath=DEFAULT_PALETTE):
+    # Initialize color nodes, all backed by one table
+    palette = get_palette(filepath)
+    table = PaletteTable(capacity=len(palette))
+    color_nodes = []
+    for colour_id, name, hex_code, rgb, hsv, type_ in zip(
+            palette.color_ids.tolist(), palette.names, palette.hex_codes,
+            palette.rgb, palette.hsv, palette.types):
+        node = LegoColorNode(
+            colourID=colour_id,
+            colourName=name,
+            hex_code=hex_code,
+            rgb=rgb,
+            hsv=hsv,
+            type_=type_,
+            table=table
+        )
+        color_nodes.append(node)
+    return color_nodes
+
+def __getattr__(name):
+    # Module-level palette / color_nodes used to be built at import; now lazily, once
+    if name == "palette":
+        value = get_palette().to_dict()
+    elif name == "color_nodes":
+        value = load_color_nodes()
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+if __name__ == "__main__":
+    # Example: Print the first few nodes
+    for node in load_color_nodes()[:5]:
+        print(node)
\ No newline at end of file
@@ -0,0 +1,248 @@
+# ------------------------------------------------------------
+# 🧱 Tool: lut_cube.py
+# Purpose: Precomputes BrickBeast's HSV → color_id answer for every 8-bit HSV input
+# Scope: Builds, caches, and memory-maps dense 256³ lookup cubes from palette anchors
+# Features:
+#   - Builds a uint16 color_id cube (+ optional uint8 confidence cube)
+#   - Sources: bricklink_colours.json, a grid, an AnchorTable, or ColorRegistry drift centers
+#   - Cube files are named by a content hash of their anchors, so a palette or
+#     drift-center change always resolves to a fresh cube
+#   - Files are written temp-then-rename and opened read-only with np.memmap,
+#     so worker processes share one copy through the page cache
+#   - Classification is a single fancy-index lookup
+#   - Meta JSON (hash, version, shape, dtype) is checked before memory-mapping;
+#     only the newest DEFAULT_KEEP cubes stay in the cache directory
+#   - The confidence cube is only built and written when requested; the meta
+#     records whether it exists so a later with_confidence load rebuilds
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from batch_matcher import (
+    AnchorTable, MAX_L1_DRIFT, NO_COLOR_ID,
+    anchor_table_from_registry, build_anchor_table
+)
+from reference_loader import build_reference_grid, load_bricklink_colours
+
+CUBE_VERSION = "l1-v1"      # Bump when the distance metric or layout changes
+CUBE_SIDE = 256
+NO_COLOR = 0xFFFF           # uint16 sentinel for color_id None
+S_BLOCK = 32                # Saturation rows per build block (bounds build memory)
+DEFAULT_KEEP = 4            # Cubes kept in cache_dir (each pair is ~48 MB)
+CUBE_SHAPE = (CUBE_SIDE,) * 3
+CUBE_DTYPES = {"ids": np.dtype(np.uint16), "conf": np.dtype(np.uint8)}
+
+
+def resolve_anchor_table(source):
+    """Turns any supported palette source into an AnchorTable."""
+    if isinstance(source, AnchorTable):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        return build_anchor_table(build_reference_grid(load_bricklink_colours(source)))
+    if hasattr(source, "registry"):
+        return anchor_table_from_registry(source)
+    return build_anchor_table(source)
+
+
+def source_hash(table):
+    digest = hashlib.sha256(CUBE_VERSION.encode())
+    digest.update(np.ascontiguousarray(table.anchors, dtype="<f8").tobytes())
+    digest.update(np.ascontiguousarray(table.color_ids, dtype="<i8").tobytes())
+    return digest.hexdigest()
+
+
+def _cube_paths(cache_dir, digest):
+    stem = os.path.join(cache_dir, f"hsv_cube.{digest[:16]}")
+    return stem + ".ids.npy", stem + ".conf.npy", stem + ".json"
+
+
+def _write_meta(meta_path, digest, table, with_confidence):
+    tmp = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({
+            "source_hash": digest,
+            "version": CUBE_VERSION,
+            "anchors": len(table),
+            "confidence": bool(with_confidence),
+            "shape": list(CUBE_SHAPE),
+            "dtypes": {name: dtype.str for name, dtype in CUBE_DTYPES.items()}
+        }, f, indent=2)
+    os.replace(tmp, meta_path)
+
+
+def _open_cube(ids_path, conf_path, meta_path, digest, with_confidence):
+    """Memory-maps a cached cube, or returns None if its meta or arrays don't check out."""
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        if (meta.get("source_hash") != digest or meta.get("version") != CUBE_VERSION
+                or tuple(meta.get("shape", ())) != CUBE_SHAPE
+                or meta.get("dtypes") != {name: dtype.str for name, dtype in CUBE_DTYPES.items()}
+                or (with_confidence and not meta.get("confidence"))):
+            return None
+        ids = np.load(ids_path, mmap_mode="r")
+        conf = np.load(conf_path, mmap_mode="r") if with_confidence else None
+    except (OSError, ValueError):
+        return None
+    if ids.shape != CUBE_SHAPE or ids.dtype != CUBE_DTYPES["ids"]:
+        return None
+    if conf is not None and (conf.shape != CUBE_SHAPE or conf.dtype != CUBE_DTYPES["conf"]):
+        return None
+    return ids, conf
+
+
+def prune_lut_cache(cache_dir="lut_cache", keep=DEFAULT_KEEP):
+    """
+    Deletes all but the keep most recently used cubes (meta mtime is refreshed
+    on every load). Returns the number of cubes removed.
+    """
+    stems = {}
+    for name in os.listdir(cache_dir):
+        if name.startswith("hsv_cube.") and not name.endswith(".tmp"):
+            stem = os.path.join(cache_dir, ".".join(name.split(".")[:2]))
+            try:
+                mtime = os.stat(os.path.join(cache_dir, name)).st_mtime_ns
+            except OSError:
+                continue
+            stems[stem] = max(stems.get(stem, 0), mtime)
+    stale = sorted(stems, key=stems.get, reverse=True)[max(keep, 1):]
+    for stem in stale:
+        for suffix in (".ids.npy", ".conf.npy", ".json"):
+            try:
+                os.remove(stem + suffix)
+            except FileNotFoundError:
+                pass
+    return len(stale)
+
+
+def _write_atomic_npy(path, array):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def build_cube(table, with_confidence=True):
+    """
+    Computes the dense cubes in memory.
+
+    Returns:
+        tuple: (ids uint16 [256, 256, 256], confidence uint8 [256, 256, 256] or None)
+    """
+    if len(table) > NO_COLOR:
+        raise ValueError(f"Too many anchors for a uint16 cube: {len(table)}")
+
+    ids = np.full((CUBE_SIDE,) * 3, NO_COLOR, dtype=np.uint16)
+    conf = np.zeros((CUBE_SIDE,) * 3, dtype=np.uint8) if with_confidence else None
+    if len(table) == 0:
+        return ids, conf
+
+    dtype = np.int16 if table.integral else np.float64
+    anchors = table.anchors.astype(dtype)
+    cid = table.color_ids
+    if np.any((cid < 0) & (cid != NO_COLOR_ID)) or np.any(cid >= NO_COLOR):
+        raise ValueError("color_id out of range for a uint16 cube")
+    cid16 = np.where(cid == NO_COLOR_ID, NO_COLOR, cid).astype(np.uint16)
+
+    axis = np.arange(CUBE_SIDE, dtype=dtype)
+    dh = np.abs(axis[:, None] - anchors[None, :, 0])            # (256, N)
+    dv = np.abs(axis[:, None] - anchors[None, :, 2])            # (256, N)
+
+    for s0 in range(0, CUBE_SIDE, S_BLOCK):
+        ds = np.abs(axis[s0:s0 + S_BLOCK, None] - anchors[None, :, 1])
+        # Saturation + value distance for this block: (S_BLOCK * 256, N)
+        sv = (ds[:, None, :] + dv[None, :, :]).reshape(-1, len(table))
+        for h in range(CUBE_SIDE):
+            dist = sv + dh[h]
+            best = np.argmin(dist, axis=1)
+            ids[h, s0:s0 + S_BLOCK] = cid16[best].reshape(-1, CUBE_SIDE)
+            if conf is None:
+                continue
+            magnitude = dist[np.arange(len(best)), best].astype(np.float64)
+            confidence = np.maximum(0, 1 - magnitude / MAX_L1_DRIFT)
+            conf[h, s0:s0 + S_BLOCK] = np.round(confidence * 255).reshape(-1, CUBE_SIDE)
+
+    return ids, conf
+
+
+class LutCube:
+    """Read-only memory-mapped lookup cube."""
+
+    def __init__(self, ids, confidence, digest):
+        self.ids = ids
+        self.confidence = confidence
+        self.source_hash = digest
+
+    def classify(self, hsv):
+        """
+        Looks up an (..., 3) HSV array.
+
+        Returns:
+            tuple: (color_ids int64 with -1 for None, confidence float or None)
+        """
+        hsv = np.asarray(hsv)
+        if hsv.dtype != np.uint8:
+            hsv = np.clip(np.rint(hsv), 0, CUBE_SIDE - 1).astype(np.intp)
+        h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+        raw = self.ids[h, s, v]
+        color_ids = np.where(raw == NO_COLOR, NO_COLOR_ID, raw.astype(np.int64))
+        if self.confidence is None:
+            return color_ids, None
+        return color_ids, self.confidence[h, s, v] / 255.0
+
+
+def load_lut_cube(source, cache_dir="lut_cache", with_confidence=True, rebuild=False, keep=DEFAULT_KEEP):
+    """
+    Opens the cube for a palette source, building it first if the cached
+    cube is missing or was built from different anchors.
+
+    Args:
+        source: bricklink_colours.json path, grid dict, AnchorTable, or ColorRegistry
+        cache_dir (str): Directory holding hash-named cube files
+        with_confidence (bool): Also build (if missing) and map the uint8 confidence cube
+        rebuild (bool): Force a rebuild even if a matching cube exists
+        keep (int): Cubes left in cache_dir afterwards (older drift states are evicted)
+
+    Returns:
+        LutCube
+    """
+    table = resolve_anchor_table(source)
+    digest = source_hash(table)
+    ids_path, conf_path, meta_path = _cube_paths(cache_dir, digest)
+
+    opened = None if rebuild else _open_cube(ids_path, conf_path, meta_path, digest, with_confidence)
+    if opened is None:
+        os.makedirs(cache_dir, exist_ok=True)
+        ids, conf = build_cube(table, with_confidence)
+        if conf is not None:
+            _write_atomic_npy(conf_path, conf)
+        else:
+            try:
+                os.remove(conf_path)        # Never leave a stale cube the meta doesn't vouch for
+            except FileNotFoundError:
+                pass
+        _write_atomic_npy(ids_path, ids)
+        # Meta last: a cube only validates once both arrays are complete
+        _write_meta(meta_path, digest, table, with_confidence)
+        opened = _open_cube(ids_path, conf_path, meta_path, digest, with_confidence)
+        if opened is None:
+            raise RuntimeError(f"Freshly built cube failed validation: {ids_path}")
+    else:
+        os.utime(meta_path)     # Mark as recently used for prune_lut_cache()
+
+    prune_lut_cache(cache_dir, keep)
+    ids, conf = opened
+    return LutCube(ids, conf, digest)
+
+
+if __name__ == "__main__":
+    cube = load_lut_cube("bricklink_colours.json", rebuild=True)
+    print(f"Cube {cube.source_hash[:16]} ready: {cube.ids.shape}, {cube.ids.nbytes / 2**20:.0f} MB")
@@ -0,0 +1,217 @@
+# ------------------------------------------------------------
+# 🧱 Tool: metrics.py
+# Purpose: Switchable hot-path instrumentation for BrickBeast's matching pipeline
+# Scope: Per-stage latency histograms and event counters, read back as an
+#        in-process snapshot or a local Prometheus-style text endpoint
+# Features:
+#   - Off by default; enable() / disable() at runtime, or BRICKBEAST_METRICS=1
+#   - @timed(stage) decorator and stage() context manager for latency histograms
+#   - inc(name, value, **labels) counters (samples, batches, drift rejections,
+#     near-pole hits, ...)
+#   - Disabled cost is one flag check per call; nothing is allocated or locked
+#   - snapshot() returns plain dicts with approximate p50 / p95 / p99 per stage
+#   - serve_metrics() exposes /metrics on localhost for Prometheus scraping
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "brickbeast"
+DEFAULT_PORT = 9464
+# Latency bucket upper bounds in seconds: 1 µs … 10 s
+BUCKETS = tuple(m * 10.0 ** e for e in range(-6, 1) for m in (1, 2.5, 5)) + (10.0,)
+
+_enabled = os.environ.get("BRICKBEAST_METRICS", "") not in ("", "0")
+_lock = threading.Lock()
+_histograms = {}    # stage → [bucket counts..., +Inf count], sum
+_counters = {}      # (name, ((label, value), ...)) → float
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+# ----------------------------
+# Recording
+# ----------------------------
+
+def observe(stage, seconds):
+    """Adds one latency observation to a stage histogram."""
+    if not _enabled:
+        return
+    with _lock:
+        entry = _histograms.get(stage)
+        if entry is None:
+            entry = _histograms[stage] = [[0] * (len(BUCKETS) + 1), 0.0]
+        entry[0][bisect_left(BUCKETS, seconds)] += 1
+        entry[1] += seconds
+
+
+def inc(name, value=1, **labels):
+    """Adds value to a counter; labels become Prometheus labels."""
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def timed(stage):
+    """Decorator: records the wrapped call's latency under stage when enabled."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(stage, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def stage(name):
+    """Context-manager form of timed() for sections inside a function."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+# ----------------------------
+# Reading
+# ----------------------------
+
+def _quantile(counts, total, q):
+    # Upper bound of the bucket holding the q-th observation
+    target = q * total
+    seen = 0
+    for bound, count in zip(BUCKETS + (float("inf"),), counts):
+        seen += count
+        if seen >= target:
+            return bound
+    return float("inf")
+
+
+def snapshot():
+    """
+    Returns:
+        dict: {
+            "enabled": bool,
+            "stages": {stage: {"count", "sum", "mean", "p50", "p95", "p99", "buckets"}},
+            "counters": {name: {label_string: value}}
+        }
+    """
+    with _lock:
+        histograms = {name: (list(counts), total) for name, (counts, total) in _histograms.items()}
+        counters = dict(_counters)
+
+    stages = {}
+    for name, (counts, total) in sorted(histograms.items()):
+        n = sum(counts)
+        stages[name] = {
+            "count": n,
+            "sum": total,
+            "mean": total / n if n else 0.0,
+            "p50": _quantile(counts, n, 0.50),
+            "p95": _quantile(counts, n, 0.95),
+            "p99": _quantile(counts, n, 0.99),
+            "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], counts)),
+        }
+
+    grouped = {}
+    for (name, labels), value in sorted(counters.items()):
+        grouped.setdefault(name, {})[_label_text(labels)] = value
+    return {"enabled": _enabled, "stages": stages, "counters": grouped}
+
+
+def _label_text(labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels)
+
+
+def render_prometheus():
+    """Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        histograms = {name: (list(counts), total) for name, (counts, total) in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    metric = f"{PREFIX}_stage_seconds"
+    lines.append(f"# HELP {metric} Latency per pipeline stage")
+    lines.append(f"# TYPE {metric} histogram")
+    for name, (counts, total) in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), counts):
+            cumulative += count
+            le = bound if bound == "+Inf" else repr(bound)
+            lines.append(f'{metric}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{stage="{name}"}} {total!r}')
+        lines.append(f'{metric}_count{{stage="{name}"}} {cumulative}')
+
+    typed = set()
+    for (name, labels), value in sorted(counters.items()):
+        metric = f"{PREFIX}_{name}_total"
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        label_text = _label_text(labels)
+        lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_metrics(port=DEFAULT_PORT, host="127.0.0.1"):
+    """
+    Serves /metrics from a daemon thread. Binds to localhost by default.
+
+    Returns:
+        ThreadingHTTPServer: call .shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="brickbeast-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,318 @@
+# ------------------------------------------------------------
+# 🧱 Tool: palette_cache.py
+# Purpose: Single, cached loader for BrickBeast's BrickLink palette
+# Scope: Compiles bricklink_colours.json into a binary palette (arrays plus a
+#        string table), validates it against the source, and loads it lazily
+# Features:
+#   - color_id / rgb / hsv as contiguous arrays; names, hex codes and types in
+#     one deduplicated UTF-8 string table
+#   - Cache is valid while the source's size + mtime match; on a mismatch the
+#     source is hashed, and only a content change triggers a recompile
+#   - Files are written temp-then-rename; an unwritable cache dir falls back to
+#     compiling in memory
+#   - Truncated or corrupt cache files (bad header, arrays past the end of the
+#     file, string refs out of range) read as a miss and are recompiled
+#   - Cache files are keyed on a hash of the source's absolute path, so two
+#     palettes with the same file name never share one
+#   - Nothing is read at import; get_palette() loads on first use and memoizes
+#   - to_dict() reproduces the JSON layout for existing consumers
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+MAGIC = b"BBPAL1\0\0"
+PALETTE_CACHE_VERSION = 1
+DEFAULT_PALETTE = "bricklink_colours.json"
+DEFAULT_CACHE_DIR = "palette_cache"
+FIELDS = ("colourID", "colourName", "hex", "rgb", "hsv", "type")
+STRING_FIELDS = ("colourName", "hex", "type")
+
+_loaded = {}    # abspath → (source stat, CompiledPalette)
+
+
+class CompiledPalette:
+    """Palette columns; row i is the i-th entry of the source JSON."""
+
+    def __init__(self, color_ids, rgb, hsv, string_refs, string_offsets, string_blob, extras=None, source=None):
+        self.color_ids = color_ids          # (n,) int32
+        self.rgb = rgb                      # (n, 3) int32
+        self.hsv = hsv                      # (n, 3) int32
+        self.string_refs = string_refs      # (n, 3) uint32 into the string table: name, hex, type
+        self.string_offsets = string_offsets
+        self.string_blob = string_blob
+        self.extras = extras or {}          # {row: {field: value}} for non-standard keys
+        self.source = source or {}
+        self._strings = None
+        self._rows = None
+
+    def __len__(self):
+        return len(self.color_ids)
+
+    @property
+    def strings(self):
+        if self._strings is None:
+            blob, offsets = bytes(self.string_blob), self.string_offsets.tolist()
+            self._strings = [blob[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+        return self._strings
+
+    def _column(self, i):
+        strings = self.strings
+        return [strings[j] for j in self.string_refs[:, i].tolist()]
+
+    @property
+    def names(self):
+        return self._column(0)
+
+    @property
+    def hex_codes(self):
+        return self._column(1)
+
+    @property
+    def types(self):
+        return self._column(2)
+
+    def row(self, color_id):
+        if self._rows is None:
+            self._rows = {cid: i for i, cid in enumerate(self.color_ids.tolist())}
+        return self._rows[color_id]
+
+    def entry(self, color_id):
+        """One palette entry in bricklink_colours.json form."""
+        return self._entry(self.row(color_id))
+
+    def _entry(self, i):
+        strings = self.strings
+        name, hex_code, type_ = self.string_refs[i].tolist()
+        entry = {
+            "colourID": int(self.color_ids[i]),
+            "colourName": strings[name],
+            "hex": strings[hex_code],
+            "rgb": self.rgb[i].tolist(),
+            "hsv": self.hsv[i].tolist(),
+            "type": strings[type_],
+        }
+        entry.update(self.extras.get(i, {}))
+        return entry
+
+    def to_dict(self):
+        """Fresh {str(colourID): entry} dict, same layout as json.load(bricklink_colours.json)."""
+        return {str(entry["colourID"]): entry for entry in map(self._entry, range(len(self)))}
+
+
+# ----------------------------
+# Compile
+# ----------------------------
+
+def _source_stat(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _hash_file(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def compile_palette(json_path=DEFAULT_PALETTE):
+    """Parses the palette JSON into a CompiledPalette (no cache involved)."""
+    with open(json_path, "rb") as f:
+        raw = f.read()
+    data = json.loads(raw)
+
+    table, strings = {}, []
+
+    def intern(text):
+        if text not in table:
+            table[text] = len(strings)
+            strings.append(text)
+        return table[text]
+
+    n = len(data)
+    color_ids = np.empty(n, dtype=np.int32)
+    rgb = np.empty((n, 3), dtype=np.int32)
+    hsv = np.empty((n, 3), dtype=np.int32)
+    refs = np.empty((n, 3), dtype=np.uint32)
+    extras = {}
+    for i, entry in enumerate(data.values()):
+        color_ids[i] = entry["colourID"]
+        rgb[i] = entry["rgb"]
+        hsv[i] = entry["hsv"]
+        refs[i] = [intern(entry[field]) for field in STRING_FIELDS]
+        extra = {k: v for k, v in entry.items() if k not in FIELDS}
+        if extra:
+            extras[i] = extra
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    source = dict(_source_stat(json_path), sha256=hashlib.sha256(raw).hexdigest())
+    return CompiledPalette(color_ids, rgb, hsv, refs, offsets, blob, extras, source)
+
+
+# ----------------------------
+# Cache File
+# ----------------------------
+
+_ARRAY_NAMES = ("color_ids", "rgb", "hsv", "string_refs", "string_offsets", "string_blob")
+
+
+def _arrays(palette):
+    return {
+        "color_ids": palette.color_ids,
+        "rgb": palette.rgb,
+        "hsv": palette.hsv,
+        "string_refs": palette.string_refs,
+        "string_offsets": palette.string_offsets,
+        "string_blob": palette.string_blob,
+    }
+
+
+def save_palette_cache(palette, path):
+    """Writes MAGIC, uint32 header length, JSON header, then the raw arrays; atomic."""
+    arrays = _arrays(palette)
+    layout, offset = {}, 0
+    for name, a in arrays.items():
+        layout[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset += a.nbytes
+    header = json.dumps({
+        "version": PALETTE_CACHE_VERSION,
+        "source": palette.source,
+        "extras": {str(i): extra for i, extra in palette.extras.items()},
+        "arrays": layout,
+    }).encode("utf-8")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint32(len(header)).tobytes())
+        f.write(header)
+        for a in arrays.values():
+            f.write(np.ascontiguousarray(a).tobytes())
+    os.replace(tmp, path)
+
+
+def read_palette_cache(path):
+    """
+    Reads a cache file in one read(); returns None if it is missing, foreign,
+    stale-versioned, truncated or otherwise corrupt.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    try:
+        return _parse_palette_cache(data)
+    except (ValueError, KeyError, TypeError, AttributeError):    # json.JSONDecodeError is a ValueError
+        return None
+
+
+def _parse_palette_cache(data):
+    start = len(MAGIC) + 4
+    if len(data) < start or data[:len(MAGIC)] != MAGIC:
+        return None
+    length = int(np.frombuffer(data, dtype=np.uint32, count=1, offset=len(MAGIC))[0])
+    if start + length > len(data):
+        return None
+    header = json.loads(data[start:start + length].decode("utf-8"))
+    if header.get("version") != PALETTE_CACHE_VERSION:
+        return None
+
+    base = start + length
+    arrays = {}
+    for name in _ARRAY_NAMES:
+        desc = header["arrays"][name]
+        dtype, shape = np.dtype(desc["dtype"]), tuple(int(d) for d in desc["shape"])
+        offset = base + int(desc["offset"])
+        count = int(np.prod(shape))
+        if min(shape, default=0) < 0 or offset < base or offset + count * dtype.itemsize > len(data):
+            return None
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+    n = len(arrays["color_ids"])
+    offsets = arrays["string_offsets"]
+    if (arrays["rgb"].shape != (n, 3) or arrays["hsv"].shape != (n, 3) or arrays["string_refs"].shape != (n, 3)
+            or not len(offsets) or offsets[-1] > len(arrays["string_blob"])
+            or np.any(np.diff(offsets.astype(np.int64)) < 0)
+            or (n and int(arrays["string_refs"].max()) >= len(offsets) - 1)):
+        return None
+    extras = {int(i): extra for i, extra in header.get("extras", {}).items()}
+    return CompiledPalette(extras=extras, source=dict(header["source"]), **arrays)
+
+
+def cache_path(json_path, cache_dir=DEFAULT_CACHE_DIR):
+    """Cache file for json_path: its name plus a hash of its absolute path."""
+    digest = hashlib.sha256(os.path.abspath(json_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.basename(json_path)}.{digest}.bbpal")
+
+
+
+
+# ----------------------------
+# Loader
+# ----------------------------
+
+def load_palette(json_path=DEFAULT_PALETTE, cache_dir=DEFAULT_CACHE_DIR, rebuild=False):
+    """
+    Returns a CompiledPalette for json_path, from the cache when it still
+    matches the source, recompiling (and rewriting the cache) otherwise.
+    """
+    path = cache_path(json_path, cache_dir)
+    stat = _source_stat(json_path)
+    cached = None if rebuild else read_palette_cache(path)
+
+    if cached is not None:
+        if all(cached.source.get(k) == v for k, v in stat.items()):
+            return cached
+        if cached.source.get("sha256") == _hash_file(json_path):
+            # Touched but unchanged: refresh the recorded stat, skip the JSON parse
+            cached.source.update(stat)
+            _try_save(cached, path)
+            return cached
+
+    palette = compile_palette(json_path)
+    _try_save(palette, path)
+    return palette
+
+
+def _try_save(palette, path):
+    try:
+        save_palette_cache(palette, path)
+    except OSError:
+        pass    # Read-only deployments still work, they just compile every start
+
+
+def get_palette(json_path=DEFAULT_PALETTE, cache_dir=DEFAULT_CACHE_DIR):
+    """Process-wide memoized load_palette(); re-validates with one os.stat per call."""
+    key = os.path.abspath(json_path)
+    stat = _source_stat(json_path)
+    hit = _loaded.get(key)
+    if hit is not None and hit[0] == stat:
+        return hit[1]
+    palette = load_palette(json_path, cache_dir)
+    _loaded[key] = (stat, palette)
+    return palette
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    with open(DEFAULT_PALETTE, "r") as f:
+        json.load(f)
+    parsed = time.perf_counter() - start
+
+    load_palette(rebuild=True)
+    start = time.perf_counter()
+    palette = load_palette()
+    cached = time.perf_counter() - start
+    print(f"{len(palette)} colours: json.load {parsed * 1e3:.2f} ms, cached load {cached * 1e3:.2f} ms")
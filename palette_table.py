@@ -0,0 +1,299 @@
+# ------------------------------------------------------------
+# 🧱 Tool: palette_table.py
+# Purpose: One compact, array-backed colour table for BrickBeast
+# Scope: Struct-of-arrays storage behind ColorNode, ColorReference and both
+#        LegoColorNode classes; those classes are now __slots__ views onto a row
+# Features:
+#   - Columns: color_id, rgb, anchor, reset, drift center, last drift vector,
+#     tolerance box, max_drift, lock flag; one row per color_id
+#   - Rows are added in place (amortised growth). Adding a color_id that
+#     already has a row raises unless replace=True (journal replay), which
+#     overwrites it, so registry order == row order; None ids never share a row
+#   - Views built without a table get an unindexed row in the shared
+#     STANDALONE_TABLE, recycled when the view is garbage collected
+#   - TableColumn descriptors read a copy of the view's row (so a value held
+#     by the caller never aliases table storage) and assign straight into it;
+#     ToleranceView is a live {"hue", "sat", "val"} mapping that keeps its view alive
+#   - gather() pulls one column for a list of views with a single fancy index
+#   - Bulk queries on whole arrays: within_tolerance, drift_magnitude,
+#     anchor_table (batch_matcher.AnchorTable)
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+from collections.abc import Mapping, MutableMapping
+
+import numpy as np
+
+from batch_matcher import TOLERANCE_KEYS, AnchorTable
+
+DEFAULT_CAPACITY = 16
+COLUMNS = {
+    # name: (per-row shape, dtype)
+    "color_ids": ((), np.int64),
+    "rgb": ((3,), np.float64),
+    "anchor": ((3,), np.float64),
+    "reset": ((3,), np.float64),
+    "drift_center": ((3,), np.float64),
+    "last_drift_vector": ((3,), np.float64),
+    "tolerance": ((3,), np.float64),
+    "max_drift": ((), np.float64),
+    "locked": ((), bool),
+}
+
+
+def _plain(value):
+    """Python number for JSON: ints stay ints (tolerances are written as 12, not 12.0)."""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def tolerance_dict(values):
+    """Plain {"hue", "sat", "val"} dict (as stored in JSON) from a tolerance row."""
+    return {key: _plain(value) for key, value in zip(TOLERANCE_KEYS, values)}
+
+
+def _tolerance_row(tolerance):
+    if isinstance(tolerance, Mapping):
+        return [tolerance[key] for key in TOLERANCE_KEYS]
+    return tolerance
+
+
+class PaletteTable:
+    """
+    Usage:
+        table = PaletteTable()
+        row = table.add(5, anchor=[0, 255, 128], tolerance={"hue": 12, "sat": 20, "val": 25})
+        table.drift_center          # (n, 3) view of every drift center
+        table.within_tolerance(hsv) # (N, n) box test for a batch of samples
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        capacity = max(1, int(capacity))
+        self._columns = {name: np.zeros((capacity,) + shape, dtype=dtype)
+                         for name, (shape, dtype) in COLUMNS.items()}
+        self._count = 0
+        self._rows = {}     # color_id → row
+        self._free = []     # Released unindexed rows, reused by add()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, color_id):
+        return color_id in self._rows
+
+    def column(self, name):
+        """Live (n, ...) view of one column; re-read after add(), which may reallocate."""
+        return self._columns[name][:self._count]
+
+    color_ids = property(lambda self: self.column("color_ids"))
+    rgb = property(lambda self: self.column("rgb"))
+    anchor = property(lambda self: self.column("anchor"))
+    reset = property(lambda self: self.column("reset"))
+    drift_center = property(lambda self: self.column("drift_center"))
+    last_drift_vector = property(lambda self: self.column("last_drift_vector"))
+    tolerance = property(lambda self: self.column("tolerance"))
+    max_drift = property(lambda self: self.column("max_drift"))
+    locked = property(lambda self: self.column("locked"))
+
+    def row(self, color_id):
+        return self._rows[color_id]
+
+    def rows(self, color_ids):
+        return np.array([self._rows[cid] for cid in color_ids], dtype=np.int64)
+
+    def _grow(self):
+        capacity = 2 * len(self._columns["color_ids"])
+        for name, old in self._columns.items():
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._count] = old[:self._count]
+            self._columns[name] = new
+
+    def add(self, color_id, anchor, drift_center=None, reset=None, rgb=None, tolerance=None,
+            max_drift=0.0, locked=False, last_drift_vector=None, replace=False, indexed=True):
+        """
+        Adds a colour. drift_center and reset default to the anchor.
+
+        Args:
+            replace (bool): Overwrite the row already holding color_id instead
+                of raising (journal replay)
+            indexed (bool): False gives a row that row(color_id) never finds,
+                e.g. for standalone views; release() recycles it
+
+        Returns:
+            int: Row index
+
+        Raises:
+            ValueError: color_id already has a row and replace is False
+        """
+        indexed = indexed and color_id is not None
+        row = self._rows.get(color_id) if indexed else None
+        if row is not None and not replace:
+            raise ValueError(f"color_id {color_id!r} already has row {row}; pass replace=True to overwrite")
+        if row is None:
+            row = self._new_row()
+            if indexed:
+                self._rows[color_id] = row
+        c = self._columns
+        c["color_ids"][row] = -1 if color_id is None else color_id
+        c["anchor"][row] = anchor
+        c["drift_center"][row] = anchor if drift_center is None else drift_center
+        c["reset"][row] = anchor if reset is None else reset
+        c["rgb"][row] = 0 if rgb is None else rgb
+        c["tolerance"][row] = 0 if tolerance is None else _tolerance_row(tolerance)
+        c["max_drift"][row] = max_drift
+        c["locked"][row] = locked
+        c["last_drift_vector"][row] = 0 if last_drift_vector is None else last_drift_vector
+        return row
+
+    def _new_row(self):
+        if self._free:
+            return self._free.pop()
+        if self._count == len(self._columns["color_ids"]):
+            self._grow()
+        self._count += 1
+        return self._count - 1
+
+    def release(self, row):
+        """Hands an unindexed row back for reuse by a later add()."""
+        self._free.append(row)
+
+    # ----------------------------
+    # Bulk Queries
+    # ----------------------------
+
+    def row_within_tolerance(self, row, sample_hsv):
+        """ColorReference.is_within_tolerance for one row."""
+        sample = np.asarray(sample_hsv, dtype=float)
+        c = self._columns
+        return bool((np.abs(sample - c["drift_center"][row]) <= c["tolerance"][row]).all())
+
+    def within_tolerance(self, hsv):
+        """(N, n) bool: sample i lies inside row j's tolerance box around its drift center."""
+        hsv = np.asarray(hsv, dtype=float).reshape(-1, 3)
+        return np.all(np.abs(hsv[:, None, :] - self.drift_center[None]) <= self.tolerance[None], axis=2)
+
+    def drift_magnitude(self):
+        """(n,) distance of every drift center from its anchor."""
+        return np.linalg.norm(self.drift_center - self.anchor, axis=1)
+
+    def anchor_table(self, rows=None):
+        """Snapshot of drift centers + tolerances as a batch_matcher.AnchorTable."""
+        rows = slice(None) if rows is None else rows
+        color_ids = self.color_ids[rows].copy()
+        return AnchorTable(self.drift_center[rows].copy(), color_ids, color_ids,
+                           tolerance=self.tolerance[rows].copy())
+
+
+# ----------------------------
+# Views
+# ----------------------------
+
+STANDALONE_TABLE = PaletteTable()   # Rows of views constructed without a table
+
+
+class TableRowView:
+    """
+    Base for __slots__ views onto one PaletteTable row (subclasses declare the
+    _table and _row slots). Without a table the view takes an unindexed row of
+    STANDALONE_TABLE, so lone views never clobber each other.
+    """
+
+    __slots__ = ()
+
+    def _bind(self, table, color_id, **columns):
+        if table is None:
+            table = STANDALONE_TABLE
+            columns["indexed"] = False
+        row = table.add(color_id, **columns)
+        self._table, self._row = table, row
+
+    def __del__(self):
+        if getattr(self, "_table", None) is STANDALONE_TABLE:
+            STANDALONE_TABLE.release(self._row)
+
+
+class TableColumn:
+    """
+    Descriptor exposing one table column of a view's row. Vectors come back as
+    copies: rows move on _grow() and standalone rows are recycled, so a live
+    row view could go stale or start tracking another view. Assign to write.
+    """
+
+    def __init__(self, column, cast=None):
+        self.column = column
+        self.cast = cast
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        value = view._table._columns[self.column][view._row]
+        if isinstance(value, np.ndarray):
+            return value.copy()
+        return value if self.cast is None else self.cast(value)
+
+    def __set__(self, view, value):
+        view._table._columns[self.column][view._row] = value
+
+
+class ToleranceView(MutableMapping):
+    """
+    {"hue", "sat", "val"} mapping over a view's row of the tolerance column.
+    Holds the view itself, not its row, so the row is not recycled under it.
+    """
+
+    __slots__ = ("_view",)
+
+    def __init__(self, view):
+        self._view = view
+
+    def __getitem__(self, key):
+        try:
+            i = TOLERANCE_KEYS.index(key)
+        except ValueError:
+            raise KeyError(key) from None
+        view = self._view
+        return _plain(view._table._columns["tolerance"][view._row, i])
+
+    def __setitem__(self, key, value):
+        if key not in TOLERANCE_KEYS:
+            raise KeyError(key)
+        view = self._view
+        view._table._columns["tolerance"][view._row, TOLERANCE_KEYS.index(key)] = value
+
+    def __delitem__(self, key):
+        raise TypeError("tolerance keys are fixed")
+
+    def __iter__(self):
+        return iter(TOLERANCE_KEYS)
+
+    def __len__(self):
+        return len(TOLERANCE_KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class ToleranceColumn:
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        return ToleranceView(view)
+
+    def __set__(self, view, value):
+        view._table._columns["tolerance"][view._row] = _tolerance_row(value)
+
+
+def gather(views, column):
+    """
+    One column for a sequence of views, as an array in view order. Views on a
+    shared table cost a single fancy index; mixed tables fall back to stacking.
+    """
+    views = list(views)
+    shape, dtype = COLUMNS[column]
+    if not views:
+        return np.zeros((0,) + shape, dtype=dtype)
+    table = views[0]._table
+    if all(view._table is table for view in views):
+        return table._columns[column][[view._row for view in views]]
+    return np.array([view._table._columns[column][view._row] for view in views], dtype=dtype)
@@ -0,0 +1,157 @@
+# ------------------------------------------------------------
+# 🧱 Tool: parallel_matcher.py
+# Purpose: Spreads BrickBeast batch matching across worker processes
+# Scope: Publishes anchor/drift-center arrays through multiprocessing.shared_memory
+#        and fans sample shards out to a process pool
+# Features:
+#   - Anchors and color_ids live in one shared block; workers map it, never copy it
+#   - Workers never touch bricklink_colours.json or ColorReference.json
+#   - Workers return only int32 anchor indices; drift/confidence are rebuilt
+#     in the parent with cheap O(N) array math
+#   - Shards are gathered in submission order
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from batch_matcher import AnchorTable, MAX_L1_DRIFT, NO_COLOR_ID, anchor_table_from_registry, match_indices
+
+DEFAULT_SHARD = 65536   # Samples per worker task
+
+
+class SharedAnchorTable:
+    """
+    One shared-memory block: [anchors float64 (n, 3) | color_ids int64 (n,)].
+    The creating process owns (and unlinks) the block.
+    """
+
+    def __init__(self, table):
+        if hasattr(table, "registry"):
+            table = anchor_table_from_registry(table)
+        self.n = len(table)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, self.n * 32))
+        self.table = _table_view(self.shm.buf, self.n)
+        self.table.anchors[:] = table.anchors
+        self.table.color_ids[:] = table.color_ids
+        self.table.integral = table.integral
+
+    @property
+    def descriptor(self):
+        return self.shm.name, self.n
+
+    def close(self):
+        self.table = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _table_view(buf, n):
+    anchors = np.ndarray((n, 3), dtype=np.float64, buffer=buf)
+    color_ids = np.ndarray((n,), dtype=np.int64, buffer=buf, offset=n * 24)
+    return AnchorTable(anchors, color_ids)
+
+
+# ----------------------------
+# Worker Side
+# ----------------------------
+
+_worker_shm = None
+_worker_table = None
+
+
+def _attach(name, n):
+    global _worker_shm, _worker_table
+    # Pool workers share the parent's resource tracker, so the owner's unlink stays authoritative
+    _worker_shm = shared_memory.SharedMemory(name=name)
+    _worker_table = _table_view(_worker_shm.buf, n)
+
+
+def _match_shard(hsv):
+    index, _ = match_indices(hsv, _worker_table)
+    return index.astype(np.int32)
+
+
+# ----------------------------
+# Parent Side
+# ----------------------------
+
+class ParallelMatcher:
+    """
+    Usage:
+        with ParallelMatcher(registry_or_table, workers=4) as matcher:
+            color_ids, drift, confidence = matcher.match_batch(hsv)
+    """
+
+    def __init__(self, table, workers=None, shard=DEFAULT_SHARD, mp_context=None):
+        self.shared = SharedAnchorTable(table)
+        self.shard = shard
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp_context,
+            initializer=_attach,
+            initargs=self.shared.descriptor,
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.shared.close()
+
+    def match_indices(self, hsv):
+        hsv = np.ascontiguousarray(hsv).reshape(-1, 3)
+        shards = [hsv[i:i + self.shard] for i in range(0, len(hsv), self.shard)]
+        if not shards:
+            return np.zeros(0, dtype=np.int32)
+        return np.concatenate(list(self.pool.map(_match_shard, shards)))
+
+    def match_batch(self, hsv):
+        """Same contract and results as batch_matcher.match_batch()."""
+        hsv = np.asarray(hsv).reshape(-1, 3)
+        table = self.shared.table
+        n = len(hsv)
+        if not len(table):
+            return (np.full(n, NO_COLOR_ID, dtype=np.int64),
+                    np.zeros((n, 3), dtype=np.int64),
+                    np.zeros(n))
+
+        index = self.match_indices(hsv)
+        if table.integral and np.issubdtype(hsv.dtype, np.integer):
+            drift = hsv.astype(np.int64) - table.anchors[index].astype(np.int64)
+        else:
+            drift = hsv - table.anchors[index]
+        magnitude = np.abs(drift).sum(axis=1)
+        confidence = np.maximum(0, 1 - magnitude / MAX_L1_DRIFT)
+        return table.color_ids[index], drift, confidence
+
+
+if __name__ == "__main__":
+    import time
+    from batch_matcher import match_batch
+    from lut_cube import resolve_anchor_table
+
+    table = resolve_anchor_table("bricklink_colours.json")
+    hsv = np.random.default_rng(0).integers(0, 256, (2_000_000, 3), dtype=np.uint8)
+
+    start = time.perf_counter()
+    expected = match_batch(hsv, table)
+    serial = time.perf_counter() - start
+
+    with ParallelMatcher(table) as matcher:
+        matcher.match_batch(hsv[:1000])  # Warm the pool
+        start = time.perf_counter()
+        result = matcher.match_batch(hsv)
+        parallel = time.perf_counter() - start
+
+    same = all(np.array_equal(a, b) for a, b in zip(expected, result))
+    print(f"{matcher.workers} workers: serial {serial:.2f}s, parallel {parallel:.2f}s, identical={same}")
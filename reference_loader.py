@@ -7,14 +7,30 @@
 #   - Builds anchored grid nodes with pole locking
 #   - Saves grid to bricklink_reference_grid.json
 #   - Saves metadata to bricklink_metadata.json
+#   - Optional SampleStore backing for node samples / drift
+#   - Palette comes from the compiled palette cache (palette_cache.py), not a JSON parse
+#   - Optionally upserts BrickLink metadata into a ColorMetadataStore
 # Created by: Craig Wilson / Copilot
-# Last Updated: 2025-09-04
+# Last Updated: 2026-10-17
 # ------------------------------------------------------------
 import json
 
-def initialize_reference_grid(colour_json_path, output_grid_path, output_metadata_path):
-    with open(colour_json_path, "r") as f:
-        colour_data = json.load(f)
+from palette_cache import get_palette
+from sample_store import NodeDrift, json_default
+
+
+def _attach_store(grid, store):
+    # Swap a node's sample / drift lists for views into the store
+    if store is None:
+        return grid
+    for key, node in grid.items():
+        node["samples"] = store.view(key)
+        node["drift"] = NodeDrift(node["samples"], node)
+    return grid
+
+def initialize_reference_grid(colour_json_path, output_grid_path, output_metadata_path, store=None,
+                              metadata_store=None):
+    colour_data = load_bricklink_colours(colour_json_path)
 
     grid = {}
     metadata = {}
@@ -53,17 +69,21 @@ def initialize_reference_grid(colour_json_path, output_grid_path, output_metadat
     with open(output_grid_path, "w") as f:
         json.dump(serializable_grid, f, indent=2)
 
+    _attach_store(grid, store)
+
     # Save metadata
     with open(output_metadata_path, "w") as f:
         json.dump(metadata, f, indent=2)
+    if metadata_store is not None:
+        metadata_store.upsert_many(metadata.items())
 
     return grid, metadata
 
 def load_bricklink_colours(filepath):
-    with open(filepath, "r") as f:
-        return json.load(f)
+    # Fresh dict per call, same layout as json.load(); backed by the compiled cache
+    return get_palette(filepath).to_dict()
 
-def build_reference_grid(colour_data):
+def build_reference_grid(colour_data, store=None):
     grid = {}
     for cid_str, entry in colour_data.items():
         cid = int(cid_str)
@@ -84,7 +104,7 @@ def build_reference_grid(colour_data):
             },
             "drift": []
         }
-    return grid
+    return _attach_store(grid, store)
 
 def save_reference_grid(filepath, grid):
     # Convert tuple keys to string for JSON compatibility
@@ -92,4 +112,4 @@ def save_reference_grid(filepath, grid):
         f"{h},{s},{v}": data for (h, s, v), data in grid.items()
     }
     with open(filepath, "w") as f:
-        json.dump(serializable_grid, f, indent=2)
+        json.dump(serializable_grid, f, indent=2, default=json_default)
@@ -0,0 +1,292 @@
+# ------------------------------------------------------------
+# 🧱 Tool: sample_ingest.py
+# Purpose: Asyncio multi-camera ingest service for BrickBeast's matcher
+# Scope: Camera sources → bounded per-source queues → batching stage → batch
+#        matcher → per-part results stream
+# Features:
+#   - One bounded queue per camera; producers block when full (backpressure)
+#   - Batching stage coalesces captures from all cameras into one (N, 3) array
+#   - Per-camera colour correction (camera_correction.py) applied before matching
+#   - Matching runs off the event loop via run_in_executor (batch_matcher.match_batch)
+#   - Per-part results stream out in arrival order through an async iterator
+#   - Per-source queue depth and latency (mean / p95 / max) exposed by stats()
+#   - CameraSource wraps a blocking read() callable (frame grab + segmentation),
+#     run in an executor; FakeCameraSource replays recorded captures for testing
+#   - A source that raises ends its stream cleanly; run() re-raises the error
+#     once that source's earlier captures have been yielded
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from batch_matcher import match_batch
+
+DEFAULT_QUEUE_SIZE = 32         # Captures buffered per camera before backpressure
+DEFAULT_BATCH_SAMPLES = 16384   # Samples per matcher call
+DEFAULT_BATCH_TIMEOUT = 0.005   # Seconds to wait for a batch to fill
+LATENCY_WINDOW = 1024           # Recent latencies kept per source
+_DONE = object()
+
+
+def make_capture(source, part_id, hsv, timestamp=None):
+    """One camera capture of a part: masked HSV pixels as an (N, 3) array."""
+    return {
+        "source": source,
+        "part_id": part_id,
+        "hsv": np.array(hsv, dtype=np.uint8).reshape(-1, 3),    # Own copy: corrected in place
+        "timestamp": time.time() if timestamp is None else timestamp,
+    }
+
+
+# ----------------------------
+# Camera Sources
+# ----------------------------
+
+class CameraSource:
+    """
+    A camera feeding the ingest service. read() is a blocking callable that
+    returns (part_id, hsv) for the next part, or None once the camera is done;
+    it runs in executor so a slow grab never stalls the event loop.
+    Subclasses may override captures() instead (see FakeCameraSource).
+    """
+
+    def __init__(self, name, read=None, executor=None):
+        self.name = name
+        self.read = read
+        self.executor = executor
+
+    async def captures(self):
+        if self.read is None:
+            raise TypeError(f"CameraSource {self.name!r} has no read() callable")
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(self.executor, self.read)
+            if item is None:
+                return
+            part_id, hsv = item
+            yield make_capture(self.name, part_id, hsv)
+
+
+class FakeCameraSource(CameraSource):
+    """
+    Replays recorded captures. recording is a list of capture dicts, or a path
+    to a JSON-lines file of {"part_id": ..., "hsv": [[h, s, v], ...]} records.
+    """
+
+    def __init__(self, name, recording, interval=0.0, repeat=1):
+        super().__init__(name)
+        self.recording = recording
+        self.interval = interval
+        self.repeat = repeat
+
+    def _records(self):
+        if isinstance(self.recording, str):
+            with open(self.recording, "r") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        return self.recording
+
+    async def captures(self):
+        records = self._records()
+        for _ in range(self.repeat):
+            for record in records:
+                yield make_capture(self.name, record.get("part_id"), record["hsv"])
+                await asyncio.sleep(self.interval)
+
+
+# ----------------------------
+# Ingest Service
+# ----------------------------
+
+class SourceStats:
+    def __init__(self, queue):
+        self.queue = queue
+        self.captures = 0
+        self.samples = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self):
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "captures": self.captures,
+            "samples": self.samples,
+            "latency_mean": float(latencies.mean()),
+            "latency_p95": float(np.percentile(latencies, 95)),
+            "latency_max": float(latencies.max()),
+        }
+
+
+class IngestService:
+    """
+    Usage:
+        service = IngestService(table)
+        service.add_source(FakeCameraSource("cam_A", recording))
+        async for result in service.run():
+            ...
+    """
+
+    def __init__(self, table, queue_size=DEFAULT_QUEUE_SIZE, batch_samples=DEFAULT_BATCH_SAMPLES,
+                 batch_timeout=DEFAULT_BATCH_TIMEOUT, executor=None, corrections=None):
+        self.table = table
+        self.queue_size = queue_size
+        self.batch_samples = batch_samples
+        self.batch_timeout = batch_timeout
+        self.executor = executor
+        self.corrections = corrections     # Optional CorrectionRegistry keyed by source
+        self.sources = {}
+        self._stats = {}
+        self._ready = None
+        self._errors = {}       # source name → exception raised by its captures()
+        self._failed = []
+
+    def add_source(self, source):
+        if source.name in self.sources:
+            raise ValueError(f"Duplicate camera source: {source.name}")
+        self.sources[source.name] = source
+
+    def stats(self):
+        return {name: stats.snapshot() for name, stats in self._stats.items()}
+
+    async def _produce(self, source, queue):
+        try:
+            async for capture in source.captures():
+                capture["enqueued"] = time.perf_counter()
+                await queue.put(capture)       # Blocks while the camera's queue is full
+                self._ready.set()
+        except Exception as error:
+            self._errors[source.name] = error  # Re-raised by run() when _DONE is drained
+        # Reached on success and on error, so run() never waits on a dead source.
+        # Cancellation skips it: run() is shutting down and nobody drains the queue.
+        await queue.put(_DONE)
+        self._ready.set()
+
+    def _drain(self, queues, limit):
+        """Round-robin pull from every source queue until the batch is full."""
+        batch, samples, finished = [], 0, []
+        progress = True
+        while progress and samples < limit:
+            progress = False
+            for name, queue in queues.items():
+                if queue.empty():
+                    continue
+                item = queue.get_nowait()
+                if item is _DONE:
+                    finished.append(name)
+                    continue
+                batch.append(item)
+                samples += len(item["hsv"])
+                progress = True
+                if samples >= limit:
+                    break
+        return batch, finished
+
+    def _finish(self, queues, finished):
+        for name in finished:
+            del queues[name]
+            if name in self._errors:
+                self._failed.append(self._errors[name])
+
+    def _raise_failed(self):
+        if self._failed:
+            raise self._failed[0]
+
+    def _match(self, batch):
+        if self.corrections is not None:
+            for capture in batch:
+                self.corrections.correct(capture["hsv"], capture["source"])
+        hsv = np.concatenate([capture["hsv"] for capture in batch])
+        return match_batch(hsv, self.table)
+
+    async def run(self):
+        """
+        Starts every source and yields one result dict per captured part. If a
+        source's captures() raises, that exception is raised from here after
+        the parts it delivered first; the other sources are then cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        queues = {name: asyncio.Queue(maxsize=self.queue_size) for name in self.sources}
+        self._stats = {name: SourceStats(queue) for name, queue in queues.items()}
+        self._errors, self._failed = {}, []
+        producers = [asyncio.create_task(self._produce(self.sources[name], queue))
+                     for name, queue in queues.items()]
+
+        try:
+            while queues:
+                self._ready.clear()
+                batch, finished = self._drain(queues, self.batch_samples)
+                self._finish(queues, finished)
+
+                if not batch:
+                    self._raise_failed()
+                    if queues:
+                        await self._ready.wait()
+                    continue
+
+                # Give a partial batch a moment to fill before matching
+                if sum(len(c["hsv"]) for c in batch) < self.batch_samples and self.batch_timeout:
+                    await asyncio.sleep(self.batch_timeout)
+                    more, finished = self._drain(queues, self.batch_samples)
+                    batch += more
+                    self._finish(queues, finished)
+
+                color_ids, drift, confidence = await loop.run_in_executor(self.executor, self._match, batch)
+                for result in self._split(batch, color_ids, drift, confidence):
+                    yield result
+                self._raise_failed()
+        finally:
+            for task in producers:
+                task.cancel()
+            await asyncio.gather(*producers, return_exceptions=True)
+
+    def _split(self, batch, color_ids, drift, confidence):
+        done = time.perf_counter()
+        start = 0
+        for capture in batch:
+            end = start + len(capture["hsv"])
+            stats = self._stats[capture["source"]]
+            latency = done - capture["enqueued"]
+            stats.captures += 1
+            stats.samples += end - start
+            stats.latencies.append(latency)
+            yield {
+                "source": capture["source"],
+                "part_id": capture["part_id"],
+                "timestamp": capture["timestamp"],
+                "color_ids": color_ids[start:end],
+                "drift": drift[start:end],
+                "confidence": confidence[start:end],
+                "latency": latency,
+            }
+            start = end
+
+
+async def ingest_all(table, sources, **kwargs):
+    """Convenience wrapper: runs sources to completion and returns (results, stats)."""
+    service = IngestService(table, **kwargs)
+    for source in sources:
+        service.add_source(source)
+    results = [result async for result in service.run()]
+    return results, service.stats()
+
+
+if __name__ == "__main__":
+    from reference_loader import build_reference_grid, load_bricklink_colours
+    from batch_matcher import build_anchor_table
+
+    table = build_anchor_table(build_reference_grid(load_bricklink_colours("bricklink_colours.json")))
+    rng = np.random.default_rng(0)
+    recording = [{"part_id": i, "hsv": rng.normal([21, 79, 238], 4, (2000, 3)).clip(0, 255)}
+                 for i in range(50)]
+    sources = [FakeCameraSource(f"cam_{c}", recording) for c in "ABC"]
+    results, stats = asyncio.run(ingest_all(table, sources))
+    print(f"{len(results)} parts ingested")
+    for name, snapshot in stats.items():
+        print(f"  {name}: {snapshot}")
@@ -0,0 +1,172 @@
+# ------------------------------------------------------------
+# 🧱 Tool: sample_recording.py
+# Purpose: Compact binary recordings of BrickBeast sample streams
+# Scope: Writes and reads (HSV, source, part id, timestamp) records so live
+#        captures can be replayed offline (drift_replay.py)
+# Features:
+#   - Fixed 15-byte packed records; source and part ids index string/ID tables
+#   - Append-only: records stream to disk, tables + labels go in a footer on close
+#   - Files without a footer (crashed writer) still open; names fall back to ids
+#   - Reader memory-maps the records, so workers share one copy via the page cache
+#   - Optional ground-truth labels {part_id: color_id} for accuracy scoring
+#   - captures() regroups records into sample_ingest-style capture dicts
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import json
+import os
+import time
+
+import numpy as np
+
+MAGIC = b"BBREC1\0\0"
+END_MAGIC = b"BBRECEND"
+RECORDING_VERSION = 1
+RECORD_DTYPE = np.dtype([
+    ("hsv", np.uint8, (3,)),
+    ("source", "<u2"),
+    ("part", "<u4"),
+    ("timestamp", "<f8"),
+])
+
+
+class RecordingWriter:
+    """
+    Usage:
+        with RecordingWriter("run.bbrec") as rec:
+            rec.write(hsv, "cam_A", part_id=17)
+            rec.label(17, 5)
+    """
+
+    def __init__(self, path, hue_scale="opencv"):
+        self.path = path
+        self.hue_scale = hue_scale
+        self.sources = []
+        self.parts = []
+        self.labels = {}
+        self.count = 0
+        self._source_index = {}
+        self._part_index = {}
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+
+    def _intern(self, table, index, value):
+        i = index.get(value)
+        if i is None:
+            i = index[value] = len(table)
+            table.append(value)
+        return i
+
+    def write(self, hsv, source, part_id=None, timestamp=None):
+        """Appends one capture: an (N, 3) HSV array from one source / part."""
+        hsv = np.asarray(hsv).reshape(-1, 3)
+        records = np.empty(len(hsv), dtype=RECORD_DTYPE)
+        records["hsv"] = np.clip(np.rint(hsv), 0, 255) if hsv.dtype != np.uint8 else hsv
+        records["source"] = self._intern(self.sources, self._source_index, source)
+        records["part"] = self._intern(self.parts, self._part_index, part_id)
+        records["timestamp"] = time.time() if timestamp is None else timestamp
+        self._file.write(records.tobytes())
+        self.count += len(records)
+
+    def write_capture(self, capture):
+        """Appends a sample_ingest.make_capture() dict."""
+        self.write(capture["hsv"], capture["source"], capture.get("part_id"), capture.get("timestamp"))
+
+    def label(self, part_id, color_id):
+        """Records the true color_id of a part for accuracy scoring."""
+        self._intern(self.parts, self._part_index, part_id)
+        self.labels[self._part_index[part_id]] = color_id
+
+    def close(self):
+        if self._file.closed:
+            return
+        footer = json.dumps({
+            "version": RECORDING_VERSION,
+            "count": self.count,
+            "hue_scale": self.hue_scale,
+            "sources": self.sources,
+            "parts": self.parts,
+            "labels": {str(i): cid for i, cid in self.labels.items()},
+        }).encode("utf-8")
+        self._file.write(footer)
+        self._file.write(np.uint64(len(footer)).tobytes())
+        self._file.write(END_MAGIC)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    def __init__(self, records, sources, parts, labels, hue_scale="opencv", complete=True):
+        self.records = records
+        self.sources = sources
+        self.parts = parts
+        self.labels = labels        # {part index: color_id}
+        self.hue_scale = hue_scale
+        self.complete = complete    # False when the footer was missing (writer crashed)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def hsv(self):
+        return self.records["hsv"]
+
+    def truth(self):
+        """(N,) true color_id per record, -1 where the part has no label."""
+        lookup = np.full(len(self.parts), -1, dtype=np.int64)
+        for part, cid in self.labels.items():
+            lookup[part] = cid
+        return lookup[self.records["part"]]
+
+    def captures(self):
+        """Yields capture dicts ({"source", "part_id", "hsv", "timestamp"}) per run of records."""
+        key = self.records["source"].astype(np.int64) << 32 | self.records["part"]
+        breaks = np.flatnonzero(np.diff(key)) + 1
+        for start, end in zip(np.r_[0, breaks], np.r_[breaks, len(key)]):
+            first = self.records[start]
+            yield {
+                "source": self.sources[first["source"]],
+                "part_id": self.parts[first["part"]],
+                "hsv": np.array(self.records["hsv"][start:end]),
+                "timestamp": float(first["timestamp"]),
+            }
+
+
+def read_recording(path, mmap=True):
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a sample recording: {path}")
+        footer = None
+        if size >= len(MAGIC) + 16:
+            f.seek(size - len(END_MAGIC) - 8)
+            length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            if f.read(len(END_MAGIC)) == END_MAGIC:
+                f.seek(size - len(END_MAGIC) - 8 - length)
+                footer = json.loads(f.read(length).decode("utf-8"))
+
+    if footer is not None:
+        count = footer["count"]
+    else:
+        # Crashed writer: keep every whole record, name tables by id
+        count = (size - len(MAGIC)) // RECORD_DTYPE.itemsize
+
+    if not count:
+        records = np.zeros(0, dtype=RECORD_DTYPE)
+    elif mmap:
+        records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=len(MAGIC), shape=(count,))
+    else:
+        records = np.fromfile(path, dtype=RECORD_DTYPE, count=count, offset=len(MAGIC))
+
+    if footer is not None:
+        return Recording(records, footer["sources"], footer["parts"],
+                         {int(i): cid for i, cid in footer["labels"].items()}, footer["hue_scale"])
+    sources = [f"source_{i}" for i in range(int(records["source"].max()) + 1)] if count else []
+    parts = list(range(int(records["part"].max()) + 1)) if count else []
+    return Recording(records, sources, parts, {}, complete=False)
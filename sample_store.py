@@ -0,0 +1,287 @@
+# ------------------------------------------------------------
+# 🧱 Tool: sample_store.py
+# Purpose: Compact columnar sample log for BrickBeast's grid nodes
+# Scope: Stores every ingested sample once in growable NumPy columns; grid nodes
+#        hold lightweight views instead of lists of dicts
+# Features:
+#   - Struct-of-arrays: h, s, v, source id, timestamp, node index (~17 bytes/sample)
+#   - Amortized doubling growth, batch extend from (N, 3) arrays
+#   - NodeSamples / NodeDrift views behave like the old "samples" / "drift" lists
+#   - Vectorized per-node summaries (counts, mean HSV, mean drift) via np.bincount
+#   - Per-node row index kept on append, so a node's rows cost O(node samples)
+#   - Integer hsv columns reject out-of-range / fractional values instead of truncating
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import time
+
+import numpy as np
+
+INITIAL_CAPACITY = 1024
+NODE_ROWS_CAPACITY = 8
+NO_TIMESTAMP = np.nan
+
+
+class SampleStore:
+    def __init__(self, capacity=INITIAL_CAPACITY, hsv_dtype=np.uint8):
+        """
+        hsv_dtype: uint8 suits OpenCV-scale grid samples; pass np.float32 (or
+        uint16) for degree hues or fractional values, which uint8 rejects.
+        """
+        self.size = 0
+        self.hsv = np.zeros((capacity, 3), dtype=hsv_dtype)
+        kind = np.dtype(hsv_dtype)
+        self._hsv_limits = (np.iinfo(kind).min, np.iinfo(kind).max) if kind.kind in "iu" else None
+        self.source = np.zeros(capacity, dtype=np.uint16)
+        self.timestamp = np.full(capacity, NO_TIMESTAMP, dtype=np.float64)
+        self.node = np.zeros(capacity, dtype=np.int32)
+
+        self.sources = []           # String table for source ids
+        self._source_ids = {}
+        self.node_keys = []         # Node index → grid key
+        self._node_ids = {}
+        self.node_counts = np.zeros(16, dtype=np.int64)
+        self._node_rows = []        # Node index → row buffer, first node_counts[nid] entries valid
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return self.hsv.nbytes + self.source.nbytes + self.timestamp.nbytes + self.node.nbytes
+
+    # ----------------------------
+    # Tables
+    # ----------------------------
+
+    def source_id(self, source):
+        sid = self._source_ids.get(source)
+        if sid is None:
+            sid = len(self.sources)
+            self.sources.append(source)
+            self._source_ids[source] = sid
+        return sid
+
+    def node_id(self, key):
+        nid = self._node_ids.get(key)
+        if nid is None:
+            nid = len(self.node_keys)
+            self.node_keys.append(key)
+            self._node_ids[key] = nid
+            self._node_rows.append(np.empty(NODE_ROWS_CAPACITY, dtype=np.int64))
+            if nid >= len(self.node_counts):
+                self.node_counts = np.concatenate([self.node_counts, np.zeros_like(self.node_counts)])
+        return nid
+
+    # ----------------------------
+    # Appends
+    # ----------------------------
+
+    def _check_hsv(self, hsv):
+        if self._hsv_limits is None or not hsv.size:
+            return hsv
+        lo, hi = self._hsv_limits
+        if hsv.min() < lo or hsv.max() > hi or (hsv.dtype.kind == "f" and np.any(hsv != np.round(hsv))):
+            raise ValueError(f"HSV values don't fit a {self.hsv.dtype} store (range {lo}..{hi}, integers); "
+                             "create it with hsv_dtype=np.float32")
+        return hsv
+
+    def _add_node_rows(self, nid, rows):
+        count = int(self.node_counts[nid])
+        buf = self._node_rows[nid]
+        if count + len(rows) > len(buf):
+            grown = np.empty(max(2 * len(buf), count + len(rows)), dtype=np.int64)
+            grown[:count] = buf[:count]
+            buf = self._node_rows[nid] = grown
+        buf[count:count + len(rows)] = rows
+        self.node_counts[nid] = count + len(rows)
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        capacity = len(self.node)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("hsv", "source", "timestamp", "node"):
+            old = getattr(self, name)
+            grown = np.full((capacity,) + old.shape[1:], NO_TIMESTAMP if name == "timestamp" else 0,
+                            dtype=old.dtype)
+            grown[:self.size] = old[:self.size]
+            setattr(self, name, grown)
+
+    def append(self, sample, node_key):
+        """Appends one {"h", "s", "v", "source", "timestamp"?} dict to a node."""
+        h, s, v = hsv = (sample["h"], sample["s"], sample["v"])
+        if self._hsv_limits is not None:
+            lo, hi = self._hsv_limits
+            if not (lo <= h <= hi and lo <= s <= hi and lo <= v <= hi and h % 1 == s % 1 == v % 1 == 0):
+                self._check_hsv(np.array(hsv))      # Raises with the full message
+        self._reserve(1)
+        i = self.size
+        nid = self.node_id(node_key)
+        self.hsv[i] = hsv
+        self.source[i] = self.source_id(sample.get("source", "unknown"))
+        self.timestamp[i] = sample.get("timestamp", NO_TIMESTAMP)
+        self.node[i] = nid
+        count = self.node_counts.item(nid)
+        buf = self._node_rows[nid]
+        if count < len(buf):
+            buf[count] = i
+            self.node_counts[nid] = count + 1
+        else:
+            self._add_node_rows(nid, (i,))
+        self.size += 1
+        return i
+
+    def extend(self, hsv, node_ids, source="unknown", timestamp=None):
+        """
+        Appends a batch. node_ids come from node_id(); source may be a single
+        name or an array of source ids; timestamp defaults to now.
+        """
+        hsv = self._check_hsv(np.asarray(hsv).reshape(-1, 3))
+        n = len(hsv)
+        self._reserve(n)
+        rows = slice(self.size, self.size + n)
+        self.hsv[rows] = hsv
+        self.source[rows] = self.source_id(source) if isinstance(source, str) else source
+        self.timestamp[rows] = time.time() if timestamp is None else timestamp
+        self.node[rows] = node_ids
+        ids = np.broadcast_to(np.asarray(node_ids, dtype=np.int64), (n,))
+        # Group the new rows by node (stable, so each node's rows stay in order)
+        order = np.argsort(ids, kind="stable")
+        nids, starts = np.unique(ids[order], return_index=True)
+        for nid, chunk in zip(nids.tolist(), np.split(order + self.size, starts[1:])):
+            self._add_node_rows(nid, chunk)
+        self.size += n
+
+    # ----------------------------
+    # Queries
+    # ----------------------------
+
+    def rows_for(self, nid):
+        """Store rows of one node, in append order (read-only view)."""
+        rows = self._node_rows[nid][:self.node_counts[nid]]
+        rows.flags.writeable = False
+        return rows
+
+    def record(self, row):
+        h, s, v = self.hsv[row].tolist()
+        sample = {"h": h, "s": s, "v": v, "source": self.sources[self.source[row]]}
+        ts = self.timestamp[row]
+        if not np.isnan(ts):
+            sample["timestamp"] = float(ts)
+        return sample
+
+    def view(self, node_key):
+        return NodeSamples(self, self.node_id(node_key))
+
+    def node_summary(self):
+        """
+        Per-node counts and mean HSV in one vectorized pass.
+
+        Returns:
+            tuple: (counts (nodes,), mean_hsv (nodes, 3))
+        """
+        nodes = len(self.node_keys)
+        idx = self.node[:self.size]
+        counts = np.bincount(idx, minlength=nodes)
+        sums = np.stack([
+            np.bincount(idx, weights=self.hsv[:self.size, axis], minlength=nodes) for axis in range(3)
+        ], axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = sums / counts[:, None]
+        return counts, mean
+
+    def abs_drift(self, anchors):
+        """|sample - anchor| for every stored sample; anchors is (nodes, 3) by node index."""
+        anchors = np.asarray(anchors, dtype=np.int32)
+        return np.abs(self.hsv[:self.size].astype(np.int32) - anchors[self.node[:self.size]])
+
+
+class NodeSamples:
+    """List-like view of one node's samples inside a SampleStore."""
+
+    __slots__ = ("store", "nid")
+
+    def __init__(self, store, nid):
+        self.store = store
+        self.nid = nid
+
+    def __len__(self):
+        return int(self.store.node_counts[self.nid])
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def append(self, sample):
+        self.store.append(sample, self.store.node_keys[self.nid])
+
+    def extend(self, samples):
+        for sample in samples:
+            self.append(sample)
+
+    def rows(self):
+        return self.store.rows_for(self.nid)
+
+    def hsv(self):
+        return self.store.hsv[self.rows()]
+
+    def __iter__(self):
+        for row in self.rows().tolist():
+            yield self.store.record(row)
+
+    def __getitem__(self, index):
+        rows = self.rows()[index]
+        if np.ndim(rows):
+            return [self.store.record(row) for row in rows.tolist()]
+        return self.store.record(int(rows))
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return f"NodeSamples(node={self.store.node_keys[self.nid]!r}, n={len(self)})"
+
+
+class NodeDrift:
+    """
+    Read-only, list-like view of a node's {"dh", "ds", "dv"} drift records,
+    derived from its samples and anchor instead of stored per sample.
+    """
+
+    __slots__ = ("samples", "node")
+
+    def __init__(self, samples, node):
+        self.samples = samples
+        self.node = node
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def array(self):
+        anchor = self.node.get("anchor")
+        if anchor is None:
+            return np.zeros((0, 3), dtype=np.int32)
+        ref = np.array([anchor["h"], anchor["s"], anchor["v"]], dtype=np.int32)
+        return np.abs(self.samples.hsv().astype(np.int32) - ref)
+
+    def __iter__(self):
+        for dh, ds, dv in self.array().tolist():
+            yield {"dh": dh, "ds": ds, "dv": dv}
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+
+def json_default(obj):
+    """json.dump hook so grids holding store views serialize like plain lists."""
+    if isinstance(obj, (NodeSamples, NodeDrift)):
+        return list(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,227 @@
+# ------------------------------------------------------------
+# 🧱 Tool: shared_registry.py
+# Purpose: Hot-swaps calibrated drift centers to matcher processes without restarts
+# Scope: Versioned, memory-mapped registry region with one writer and many
+#        lock-free readers
+# Features:
+#   - Fixed-capacity file region: color_ids, drift centers, tolerances, max_drift, lock flags
+#   - Writer publishes a whole generation under a seqlock (odd = write in progress)
+#   - Readers poll one 8-byte sequence number between batches; unchanged → no work
+#   - Readers never lock: they copy, re-check the sequence, and retry on a torn read
+#   - Readers hand out a batch_matcher AnchorTable for the current generation
+#   - New regions are fully written (magic last) under a temp name, then linked
+#     into place without replacing a region another publisher already created;
+#     opening checks the magic/version and that the file covers its capacity
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import fcntl
+import mmap
+import os
+import time
+
+import numpy as np
+
+from batch_matcher import AnchorTable
+from palette_table import gather
+
+MAGIC = b"BBSREG1\0"         # Ends in the layout version
+HEADER_BYTES = 64           # magic | capacity | seq | generation | count | padding
+DEFAULT_CAPACITY = 1024
+
+
+def _region_size(capacity):
+    # color_ids (8) + drift_center (24) + tolerance (24) + max_drift (8) + locked (1)
+    return HEADER_BYTES + capacity * 65
+
+
+class _Region:
+    """numpy views over the mapped file."""
+
+    def __init__(self, mm, capacity):
+        self.mm = mm
+        self.header = np.ndarray((8,), dtype=np.uint64, buffer=mm)
+        offset = HEADER_BYTES
+        self.color_ids = np.ndarray((capacity,), dtype=np.int64, buffer=mm, offset=offset)
+        offset += capacity * 8
+        self.drift_center = np.ndarray((capacity, 3), dtype=np.float64, buffer=mm, offset=offset)
+        offset += capacity * 24
+        self.tolerance = np.ndarray((capacity, 3), dtype=np.float64, buffer=mm, offset=offset)
+        offset += capacity * 24
+        self.max_drift = np.ndarray((capacity,), dtype=np.float64, buffer=mm, offset=offset)
+        offset += capacity * 8
+        self.locked = np.ndarray((capacity,), dtype=np.bool_, buffer=mm, offset=offset)
+
+    # header[0] holds the magic bytes
+    @property
+    def capacity(self):
+        return int(self.header[1])
+
+    @property
+    def seq(self):
+        return int(self.header[2])
+
+    @property
+    def generation(self):
+        return int(self.header[3])
+
+    @property
+    def count(self):
+        return int(self.header[4])
+
+
+def _open_region(path, writable):
+    fd = os.open(path, os.O_RDWR if writable else os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        if size < HEADER_BYTES:
+            raise ValueError(f"Shared registry region is truncated: {path}")
+        mm = mmap.mmap(fd, size, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+    if mm[:len(MAGIC)] != MAGIC:
+        mm.close()
+        raise ValueError(f"Not a shared registry region (or another layout version): {path}")
+    capacity = int(np.frombuffer(mm, dtype=np.uint64, count=1, offset=8)[0])
+    if size < _region_size(capacity):
+        mm.close()
+        raise ValueError(f"Shared registry region is truncated: {path}")
+    return _Region(mm, capacity)
+
+
+def _create_region(path, capacity):
+    """
+    Writes a zeroed region under a temp name, magic last, then links it into
+    place. A region that appeared meanwhile (another publisher) is kept.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.truncate(_region_size(capacity))
+            f.seek(len(MAGIC))
+            f.write(np.array([capacity], dtype=np.uint64).tobytes())
+            f.seek(0)
+            f.write(MAGIC)
+            f.flush()
+            os.fsync(f.fileno())
+        os.link(tmp, path)
+    except FileExistsError:
+        pass
+    finally:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+
+
+# ----------------------------
+# Writer
+# ----------------------------
+
+class RegistryPublisher:
+    """
+    Single-writer side. Concurrent publishers are serialized with flock on the
+    region file, but readers never take that lock.
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        if not os.path.exists(path):
+            _create_region(path, capacity)
+        self.region = _open_region(path, writable=True)
+
+    def publish(self, color_ids, drift_centers, tolerances, max_drift, locked):
+        """Writes one full generation. Returns the new generation number."""
+        color_ids = np.asarray(color_ids, dtype=np.int64)
+        n = len(color_ids)
+        r = self.region
+        if n > r.capacity:
+            raise ValueError(f"{n} entries exceed region capacity {r.capacity}")
+
+        with open(self.path, "rb") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                seq = r.seq
+                r.header[2] = seq + 1                       # Odd: readers will retry
+                r.color_ids[:n] = color_ids
+                r.drift_center[:n] = drift_centers
+                r.tolerance[:n] = tolerances
+                r.max_drift[:n] = max_drift
+                r.locked[:n] = locked
+                r.header[4] = n
+                r.header[3] = r.generation + 1
+                r.header[2] = seq + 2                       # Even: generation is stable
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return r.generation
+
+    def publish_registry(self, registry):
+        """Publishes a ColorRegistry's current drift centers, tolerances and lock flags."""
+        refs = list(registry.registry.values())
+        return self.publish(
+            [ref.color_id for ref in refs],
+            gather(refs, "drift_center"),
+            gather(refs, "tolerance"),
+            gather(refs, "max_drift"),
+            gather(refs, "locked"),
+        )
+
+    def close(self):
+        self.region.mm.close()
+
+
+# ----------------------------
+# Reader
+# ----------------------------
+
+class RegistryReader:
+    """
+    Lock-free reader. Call refresh() between batches; it costs one 8-byte read
+    when nothing changed and returns True when a new generation was adopted.
+    """
+
+    def __init__(self, path, max_retries=1000):
+        self.region = _open_region(path, writable=False)
+        self.max_retries = max_retries
+        self.seq = None
+        self.generation = 0
+        self.color_ids = np.zeros(0, dtype=np.int64)
+        self.drift_center = np.zeros((0, 3))
+        self.tolerance = np.zeros((0, 3))
+        self.max_drift = np.zeros(0)
+        self.locked = np.zeros(0, dtype=bool)
+        self.table = AnchorTable(self.drift_center, self.color_ids, tolerance=self.tolerance)
+        self.refresh()
+
+    def refresh(self):
+        r = self.region
+        for attempt in range(self.max_retries):
+            before = r.seq
+            if before == self.seq:
+                return False
+            if before & 1:
+                time.sleep(0 if attempt < 10 else 0.0001)
+                continue
+
+            n = r.count
+            snapshot = (
+                r.color_ids[:n].copy(),
+                r.drift_center[:n].copy(),
+                r.tolerance[:n].copy(),
+                r.max_drift[:n].copy(),
+                r.locked[:n].copy(),
+                r.generation,
+            )
+            if r.seq != before:
+                continue                                    # Torn read; writer got in
+
+            (self.color_ids, self.drift_center, self.tolerance,
+             self.max_drift, self.locked, self.generation) = snapshot
+            self.seq = before
+            self.table = AnchorTable(self.drift_center, self.color_ids, tolerance=self.tolerance)
+            return True
+        raise TimeoutError("Shared registry writer did not finish a publish in time")
+
+    def close(self):
+        self.region.mm.close()
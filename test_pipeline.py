@@ -3,10 +3,10 @@
 # Purpose: Validate intake-to-output flow using one sample source
 # Scope: Apply correction (if available), structure sample, anchor, log drift
 # Created by: Craig Wilson / Copilot
-# Last Updated: 2025-09-04
+# Last Updated: 2026-10-17
 # ------------------------------------------------------------
 
-from reference_loader import initialize_reference_grid
+from reference_loader import build_reference_grid, load_bricklink_colours
 from colornode_boot import boot_brickbeast
 from arraynodelogic import ingest_sample
 
@@ -19,7 +19,7 @@ raw_sample = {
 }
 
 # Step 1: Load reference grid
-reference_grid = initialize_reference_grid("bricklink_colours.json")
+reference_grid = build_reference_grid(load_bricklink_colours("bricklink_colours.json"))
 
 # Step 2: Boot grid (if needed)
 boot_brickbeast(reference_grid)
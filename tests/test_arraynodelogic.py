@@ -0,0 +1,79 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_arraynodelogic.py
+# Purpose: Regression tests for grid node ingestion
+# Scope: Near-pole hit logging is independent of metrics, bounded and
+#        radius-configurable; the cached anchor table follows grid edits
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import arraynodelogic
+import metrics
+from arraynodelogic import NEAR_POLE_KEEP, ingest_batch, ingest_sample, invalidate_anchor_table, set_pole_zone
+
+
+def _grid():
+    grid = {(90, 200, 200): {"color_id": 5, "anchor": {"h": 90, "s": 200, "v": 200}}}
+    set_pole_zone(grid, 0, 0, 255)
+    return grid
+
+
+def _samples(n):
+    return [{"h": 0, "s": i % 10, "v": 250, "source": "cam_A"} for i in range(n)]
+
+
+def _set_metrics(enabled):
+    if enabled:
+        metrics.enable()
+    else:
+        metrics.disable()
+
+
+def _ingest(samples, grid, enabled, **kwargs):
+    was_enabled = metrics.enabled()
+    _set_metrics(enabled)
+    try:
+        ingest_batch(samples, grid, **kwargs)
+    finally:
+        _set_metrics(was_enabled)
+
+
+def test_near_pole_hits_do_not_depend_on_metrics():
+    logged = []
+    for enabled in (False, True):
+        grid = _grid()
+        _ingest(_samples(5), grid, enabled)
+        logged.append(grid[(0, 0, 255)])
+    assert logged[0] == logged[1]
+    assert logged[0]["near_pole_count"] == 5
+
+
+def test_near_pole_hits_are_counted_and_bounded():
+    grid = _grid()
+    samples = _samples(NEAR_POLE_KEEP * 3)
+    _ingest(samples, grid, True)
+    _ingest(samples, grid, True, pole_radius=4)     # v alone is 5 away: no hits
+
+    pole = grid[(0, 0, 255)]
+    assert pole["near_pole_count"] == NEAR_POLE_KEEP * 3
+    assert pole["near_pole_hits"] == samples[-NEAR_POLE_KEEP:]
+
+
+def test_ingest_sample_reuses_the_grid_anchor_table(monkeypatch):
+    builds = []
+    build = arraynodelogic.build_anchor_table
+    monkeypatch.setattr(arraynodelogic, "build_anchor_table", lambda grid: builds.append(1) or build(grid))
+    grid = _grid()
+    invalidate_anchor_table()
+
+    sample = {"h": 90, "s": 200, "v": 200, "source": "cam_A"}
+    assert ingest_sample(sample, grid)["color_id"] == 5
+    assert ingest_sample(sample, grid)["color_id"] == 5
+    assert len(builds) == 1
+
+    grid[(30, 200, 200)] = {"color_id": 7, "anchor": {"h": 30, "s": 200, "v": 200}}   # New node: size changes
+    assert ingest_sample({"h": 31, "s": 200, "v": 200}, grid)["color_id"] == 7
+    grid[(30, 200, 200)]["color_id"] = 8                                               # In-place edit
+    invalidate_anchor_table(grid)
+    assert ingest_sample({"h": 31, "s": 200, "v": 200}, grid)["color_id"] == 8
+    assert len(builds) == 3
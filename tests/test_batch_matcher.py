@@ -0,0 +1,69 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_batch_matcher.py
+# Purpose: Regression tests for the vectorized batch matcher
+# Scope: match_batch drift / confidence on camera-style uint8 input; match_topk pruning
+#        is exact against a full ranking
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+
+from batch_matcher import AnchorTable, match_batch, match_topk
+
+
+def test_uint8_drift_does_not_wrap():
+    table = AnchorTable(np.array([[10, 10, 10]]), [7])
+    color_ids, drift, confidence = match_batch(np.array([[5, 5, 5]], dtype=np.uint8), table)
+    assert color_ids.tolist() == [7]
+    assert drift.tolist() == [[-5, -5, -5]]
+    assert confidence[0] == 1 - 15 / 765
+
+
+def test_float_anchor_drift_is_signed():
+    table = AnchorTable(np.array([[10.5, 10, 10]]), [7])
+    _, drift, _ = match_batch(np.array([[5, 5, 5]], dtype=np.uint8), table)
+    assert np.allclose(drift, [[-5.5, -5, -5]])
+
+
+def _naive_topk(hsv, table, k):
+    """Reference: full distance matrix over every anchor, stable sort."""
+    diff = np.abs(hsv[:, None, :].astype(float) - table.anchors[None])
+    dist = diff.sum(axis=2)
+    order = np.argsort(dist, axis=1, kind="stable")
+    ranked = np.take_along_axis(dist, order, axis=1)
+    in_box = np.all(diff <= table.tolerance[None], axis=2).any(axis=1)
+    return table.color_ids[order[:, :k]].tolist(), ranked[:, :k].tolist(), ranked[:, 1] - ranked[:, 0], in_box
+
+
+def test_match_topk_hue_window_matches_full_ranking():
+    rng = np.random.default_rng(3)
+    anchors = rng.integers(0, 180, (40, 3))
+    anchors[20:] = anchors[:20]             # Duplicate anchors exercise tie-breaking
+    table = AnchorTable(anchors, np.arange(100, 140), tolerance=rng.integers(0, 30, (40, 3)))
+    spread = rng.integers(0, 180, (300, 3))
+    near = anchors[rng.integers(0, 40, 200)] + rng.integers(-4, 5, (200, 3))   # Camera-style: close to an anchor
+    hsv = np.clip(np.vstack([spread, near]), 0, 255).astype(np.uint8)
+
+    for k in (1, 3):
+        result = match_topk(hsv, table, k=k, chunk=64)
+        ids, dists, margin, in_box = _naive_topk(hsv, table, k)
+        assert result["color_ids"].tolist() == ids
+        assert result["distance"].tolist() == dists
+        assert result["margin"].tolist() == margin.tolist()
+        assert result["in_tolerance"].tolist() == in_box.tolist()
+        assert result["color_ids"][:, 0].tolist() == match_batch(hsv, table)[0].tolist()
+    settled = match_topk(hsv, table, k=1, chunk=64)["candidates"] < len(table)
+    assert settled.any()                    # The hue window alone answered some samples
+
+
+def test_match_topk_ranks_anchors_outside_the_only_holding_box():
+    # The sample sits in anchor 1's wide box only, but anchor 2 is closer
+    table = AnchorTable(np.array([[10, 100, 100], [30, 100, 100]]), [1, 2],
+                        tolerance=np.array([[25] * 3, [5] * 3]))
+    result = match_topk(np.array([[24, 100, 100]], dtype=np.uint8), table, k=2)
+    assert result["color_ids"].tolist() == [[2, 1]]
+    assert result["distance"].tolist() == [[6, 14]]
+    assert result["margin"].tolist() == [8]
+    assert result["in_tolerance"].tolist() == [True]
+    assert match_topk(np.array([[24, 100, 100]], dtype=np.uint8), table, k=1)["margin"].tolist() == [8]
@@ -0,0 +1,82 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_camera_correction.py
+# Purpose: Regression tests for per-camera colour correction
+# Scope: Identity corrections, affine fit/apply, hue wrap on both paths,
+#        channel-table cache invalidation
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+
+from camera_correction import HUE_PERIOD, CameraCorrection, CorrectionRegistry
+
+GRID = 9
+
+
+def _pixels(space, n=2000, seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 256, (n, 3), dtype=np.uint8)
+    if space == "hsv":
+        pixels[:, 0] %= HUE_PERIOD
+    return pixels
+
+
+def _identity_lut(space):
+    axis = np.arange(GRID) * (255 / (GRID - 1))
+    hue = np.arange(GRID) * (HUE_PERIOD / GRID) if space == "hsv" else axis
+    return np.stack(np.meshgrid(hue, axis, axis, indexing="ij"), axis=-1)
+
+
+def test_identity_corrections_leave_input_unchanged():
+    for space in ("rgb", "hsv"):
+        pixels = _pixels(space)
+        for correction in (CameraCorrection(space=space), CameraCorrection(lut=_identity_lut(space), space=space)):
+            np.testing.assert_array_equal(correction.apply(pixels), pixels)
+
+
+def test_fit_recovers_affine_and_apply_matches_it():
+    matrix = np.array([[0.9, 0.05, 0.0], [0.02, 1.1, -0.03], [0.0, 0.04, 0.95]])
+    offset = np.array([4.0, -6.0, 2.5])
+    reference = _pixels("rgb", n=200, seed=1).astype(np.float64)
+    measured = (reference - offset) @ np.linalg.inv(matrix).T      # What the camera saw
+
+    correction = CameraCorrection.fit(measured, reference)
+    np.testing.assert_allclose(correction.matrix, matrix, atol=1e-9)
+    np.testing.assert_allclose(correction.offset, offset, atol=1e-7)
+
+    pixels = _pixels("rgb", seed=2)
+    expected = np.clip(np.rint(pixels @ matrix.T + offset), 0, 255)
+    assert np.abs(correction.apply(pixels).astype(int) - expected).max() <= 1
+
+
+def test_hsv_hue_wraps_on_affine_and_lut_paths():
+    pixels = np.array([[178, 200, 100], [2, 200, 100], [90, 200, 100]], dtype=np.uint8)
+    shifted = CameraCorrection(offset=[5, 0, 0], space="hsv")
+    assert shifted.apply(pixels)[:, 0].tolist() == [3, 7, 95]
+
+    # LUT cells just either side of the seam hold hues 178 and 0; blending must go across the seam
+    lut = _identity_lut("hsv")
+    lut[GRID - 1, ..., 0] = 178
+    lut[0, ..., 0] = 0
+    seam = np.array([[179, 200, 100]], dtype=np.uint8)
+    hue = int(CameraCorrection(lut=lut, space="hsv").apply(seam)[0, 0])
+    assert hue == 0                                                 # 178 + 0.95 * 2, wrapped
+
+
+def test_channel_tables_follow_matrix_edits():
+    correction = CameraCorrection()
+    pixels = np.array([[100, 50, 20]], dtype=np.uint8)
+    assert correction.apply(pixels).tolist() == [[100, 50, 20]]
+    correction.matrix[0, 0] = 0.5                                   # In-place edit
+    assert correction.apply(pixels).tolist() == [[50, 50, 20]]
+    correction.offset = np.array([0.0, 10.0, 0.0])                  # Reassignment
+    assert correction.apply(pixels).tolist() == [[50, 60, 20]]
+
+
+def test_registry_round_trip(tmp_path):
+    registry = CorrectionRegistry({"cam_A": CameraCorrection(offset=[5, 0, 0], space="hsv")})
+    path = str(tmp_path / "corrections.json")
+    registry.save(path)
+    loaded = CorrectionRegistry.load(path)
+    assert loaded.correct_sample({"h": 178, "s": 10, "v": 10, "source": "cam_A"})["h"] == 3
+    assert loaded.correct_sample({"h": 178, "s": 10, "v": 10, "source": "cam_B"})["h"] == 178
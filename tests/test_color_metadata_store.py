@@ -0,0 +1,47 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_color_metadata_store.py
+# Purpose: Regression tests for the SQLite colour metadata store
+# Scope: Parsed-dict cache isolation, external-write invalidation, delete rollback
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import sqlite3
+
+import pytest
+
+from color_metadata_store import ColorMetadataStore
+
+RED = {"BrickLink": {"name": "Red", "type": "Solid"}, "Store": {"tags": ["a"]}}
+
+
+def test_cached_get_returns_independent_copies(tmp_path):
+    with ColorMetadataStore(str(tmp_path / "m.db")) as store:
+        store.update(5, RED)
+        first = store.get(5)
+        first["Store"]["tags"].append("mutated")
+        assert store.get(5) == RED
+        assert store.get_many([5]) == {5: RED}
+
+
+def test_external_commits_invalidate_cache(tmp_path):
+    path = str(tmp_path / "m.db")
+    with ColorMetadataStore(path, check_interval=3600) as reader, ColorMetadataStore(path) as writer:
+        writer.update(5, RED)
+        assert reader.get(5) == RED
+        writer.update(5, {"Store": {"tags": ["b"]}})
+        assert reader.get(5)["Store"] == {"tags": ["a"]}        # Within check_interval: cached
+        assert reader.get_many([5])[5]["Store"] == {"tags": ["b"]}  # Batches always re-check
+
+
+def test_failed_delete_rolls_back(tmp_path):
+    path = str(tmp_path / "m.db")
+    with ColorMetadataStore(path) as store:
+        store.update(5, RED)
+        store._conn.execute("CREATE TRIGGER no_delete BEFORE DELETE ON color_names "
+                            "BEGIN SELECT RAISE(ABORT, 'locked'); END")
+        with pytest.raises(sqlite3.IntegrityError):
+            store.delete(5)
+        assert store.get(5) == RED
+        store.update(6, RED)        # No transaction left open
+        assert store.find_by_name("red") == [5, 6]
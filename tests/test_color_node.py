@@ -0,0 +1,54 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_color_node.py
+# Purpose: Regression tests for ColorNode confidence statistics
+# Scope: confidence_avg is the windowed mean distance at ingest; RMS is separate
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+
+from color_node import ColorNode
+
+TOLERANCE = {"hue": 12, "sat": 20, "val": 25}
+
+
+def _node(**kwargs):
+    return ColorNode(5, "Red", [255, 0, 0], [0, 255, 128], "Solid", TOLERANCE, 6.0, **kwargs)
+
+
+def _feed(node, samples):
+    """Adds samples, returning each one's distance to drift_center at ingest."""
+    distances = []
+    for sample in samples:
+        distances.append(np.linalg.norm(sample - node.drift_center))
+        node.add_sample(sample)
+    return np.array(distances)
+
+
+def test_confidence_avg_is_mean_distance():
+    node = _node()
+    samples = np.random.default_rng(0).normal([0, 255, 128], 4, (50, 3))
+    distances = _feed(node, samples)
+    rms = np.sqrt((np.linalg.norm(samples - node.drift_center, axis=1) ** 2).mean())
+    assert np.isclose(node.confidence_avg, 1 / (1 + distances.mean()))
+    assert np.isclose(node.confidence_rms, 1 / (1 + rms))
+    record = node.to_dict()
+    assert record["confidence_avg"] == node.confidence_avg
+    assert record["confidence_rms"] == node.confidence_rms
+
+
+def test_ring_window_keeps_latest_samples():
+    node = _node(sample_buffer=8)
+    samples = np.random.default_rng(1).normal([0, 255, 128], 4, (8 * 3 + 5, 3))
+    distances = _feed(node, samples)
+    np.testing.assert_array_equal(node.samples, samples[-8:])
+    assert np.isclose(node.mean_distance(), distances[-8:].mean())
+    assert node.to_dict()["samples"] == samples[-8:].tolist()
+
+
+def test_confidence_without_sample_buffer():
+    node = _node(sample_buffer=0)
+    node.add_sample([1, 250, 130])
+    assert len(node.samples) == 0
+    assert np.isclose(node.confidence_avg, 1 / (1 + node.distance_mean))
@@ -0,0 +1,96 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_colorreferance.py
+# Purpose: Regression tests for ColorRegistry calibration and persistence
+# Scope: Incremental recalibration matches a full calibrate(); journal replay,
+#        checkpoint compaction and torn-entry recovery
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import json
+import os
+
+import numpy as np
+
+from colorreferance import ColorRegistry
+
+TOLERANCE = {"hue": 12, "sat": 20, "val": 25}
+
+
+def _write_registry(path, count=25, seed=1, spacing=None):
+    rng = np.random.default_rng(seed)
+    records = []
+    for color_id in range(count):
+        if spacing is None:
+            center = rng.uniform([0, 150, 100], [180, 200, 150]).tolist()
+        else:
+            center = [float(color_id * spacing), 200.0, 150.0]   # Far apart: calibrate() never moves them
+        records.append({"color_id": color_id, "color_name": f"c{color_id}", "reset_center": center,
+                        "anchor_center": center, "drift_center": center, "max_drift": 6.0,
+                        "tolerance": TOLERANCE})
+    with open(path, "w") as f:
+        json.dump(records, f)
+    return str(path)
+
+
+def test_recalibrate_dirty_matches_full_calibrate(tmp_path):
+    path = _write_registry(tmp_path / "ColorReference.json")
+    incremental, full = ColorRegistry(path), ColorRegistry(path)
+    assert full.last_calibration["passes"] < 10         # Starts from a converged registry
+
+    rng = np.random.default_rng(0)
+    for _ in range(6):
+        color_id = int(rng.integers(25))
+        sample = full.registry[color_id].drift_center + rng.uniform(-20, 20, 3)
+        incremental.apply_drift(color_id, sample)
+        full.apply_drift(color_id, sample, recalibrate=False)
+        assert full.calibrate()["passes"] < 10
+        np.testing.assert_array_equal(incremental.anchor_table().anchors, full.anchor_table().anchors)
+
+
+def _centers(registry):
+    return registry.anchor_table().anchors
+
+
+def test_save_journals_centers_moved_through_views(tmp_path):
+    path = _write_registry(tmp_path / "ColorReference.json", count=5, spacing=30)
+    registry = ColorRegistry(path)
+    registry.registry[1].apply_drift([35, 205, 152])            # View method, no mark_dirty()
+    registry.registry[3].drift_center = [92.0, 198.0, 149.0]    # Plain assignment
+    assert registry.save() == 2
+    assert registry.save() == 0
+
+    with open(path + ".journal") as f:
+        assert [json.loads(line)["color_id"] for line in f] == [1, 3]
+    np.testing.assert_array_equal(_centers(ColorRegistry(path)), _centers(registry))
+
+
+def test_checkpoint_compacts_journal(tmp_path):
+    path = _write_registry(tmp_path / "ColorReference.json", count=5, spacing=30)
+    registry = ColorRegistry(path, checkpoint_every=3)
+    for color_id in (0, 2):
+        registry.registry[color_id].apply_drift([color_id * 30 + 4, 200, 150])
+        registry.save()
+    assert os.path.getsize(path + ".journal") > 0
+
+    registry.registry[4].apply_drift([124, 200, 150])
+    assert registry.save() == 1                                 # Third entry triggers the checkpoint
+    assert os.path.getsize(path + ".journal") == 0
+    with open(path) as f:
+        assert [record["drift_center"] for record in json.load(f)] == _centers(registry).tolist()
+    np.testing.assert_array_equal(_centers(ColorRegistry(path)), _centers(registry))
+
+
+def test_torn_journal_entry_is_cut_off(tmp_path):
+    path = _write_registry(tmp_path / "ColorReference.json", count=5, spacing=30)
+    registry = ColorRegistry(path)
+    registry.registry[2].drift_center = [61.0, 200.0, 150.0]
+    registry.save()
+    size = os.path.getsize(path + ".journal")
+    with open(path + ".journal", "a") as f:
+        f.write('{"color_id": 4, "drift_ce')                   # Crash mid-append
+
+    replayed = ColorRegistry(path)
+    assert os.path.getsize(path + ".journal") == size
+    assert replayed.registry[2].drift_center.tolist() == [61.0, 200.0, 150.0]
+    assert replayed.registry[4].drift_center.tolist() == [120.0, 200.0, 150.0]
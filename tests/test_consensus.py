@@ -0,0 +1,22 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_consensus.py
+# Purpose: Regression tests for multi-part consensus tracking
+# Scope: Bounded decided history; stats() counters survive eviction
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+from consensus import ConsensusTracker
+
+
+def test_decided_history_is_bounded_but_stats_keep_counting():
+    tracker = ConsensusTracker(recent=3, max_frames=1, margin=2.0)   # Every part forced on frame 1
+    for part_id in range(10):
+        assert tracker.update({"part_id": part_id, "color_ids": [5, 5], "confidence": [1.0, 1.0]})
+
+    assert list(tracker.decided) == [7, 8, 9]
+    assert not tracker.should_capture(9)
+    stats = tracker.stats()
+    assert stats["decided"] == 10
+    assert stats["forced"] == 10
+    assert stats["frames_histogram"] == {1: 10}
@@ -0,0 +1,78 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_deltae_matcher.py
+# Purpose: Regression tests for the perceptual ΔE matching engine
+# Scope: CIEDE2000 against the Sharma, Wu & Dalal (2005) reference pairs,
+#        the l1 path against match_batch, empty anchor tables
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+
+from batch_matcher import AnchorTable, match_batch
+from deltae_matcher import LabAnchorTable, delta_e2000, make_matcher, match_lab
+from lut_cube import resolve_anchor_table
+
+# (L1, a1, b1, L2, a2, b2, ΔE00) from Sharma, Wu & Dalal, "The CIEDE2000 Color-Difference Formula"
+SHARMA_PAIRS = np.array([
+    [50.0000, 2.6772, -79.7751, 50.0000, 0.0000, -82.7485, 2.0425],
+    [50.0000, 3.1571, -77.2803, 50.0000, 0.0000, -82.7485, 2.8615],
+    [50.0000, 2.8361, -74.0200, 50.0000, 0.0000, -82.7485, 3.4412],
+    [50.0000, -1.3802, -84.2814, 50.0000, 0.0000, -82.7485, 1.0000],
+    [50.0000, -1.1848, -84.8006, 50.0000, 0.0000, -82.7485, 1.0000],
+    [50.0000, -0.9009, -85.5211, 50.0000, 0.0000, -82.7485, 1.0000],
+    [50.0000, 0.0000, 0.0000, 50.0000, -1.0000, 2.0000, 2.3669],
+    [50.0000, -1.0000, 2.0000, 50.0000, 0.0000, 0.0000, 2.3669],
+    [50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0009, 7.1792],
+    [50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0010, 7.1792],
+    [50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0011, 7.2195],
+    [50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0012, 7.2195],
+    [50.0000, -0.0010, 2.4900, 50.0000, 0.0009, -2.4900, 4.8045],
+    [50.0000, -0.0010, 2.4900, 50.0000, 0.0010, -2.4900, 4.8045],
+    [50.0000, -0.0010, 2.4900, 50.0000, 0.0011, -2.4900, 4.7461],
+    [50.0000, 2.5000, 0.0000, 50.0000, 0.0000, -2.5000, 4.3065],
+    [50.0000, 2.5000, 0.0000, 73.0000, 25.0000, -18.0000, 27.1492],
+    [50.0000, 2.5000, 0.0000, 61.0000, -5.0000, 29.0000, 22.8977],
+    [50.0000, 2.5000, 0.0000, 56.0000, -27.0000, -3.0000, 31.9030],
+    [50.0000, 2.5000, 0.0000, 58.0000, 24.0000, 15.0000, 19.4535],
+    [50.0000, 2.5000, 0.0000, 50.0000, 3.1736, 0.5854, 1.0000],
+    [50.0000, 2.5000, 0.0000, 50.0000, 3.2972, 0.0000, 1.0000],
+    [50.0000, 2.5000, 0.0000, 50.0000, 1.8634, 0.5757, 1.0000],
+    [50.0000, 2.5000, 0.0000, 50.0000, 3.2592, 0.3350, 1.0000],
+    [60.2574, -34.0099, 36.2677, 60.4626, -34.1751, 39.4387, 1.2644],
+    [63.0109, -31.0961, -5.8663, 62.8187, -29.7946, -4.0864, 1.2630],
+    [61.2901, 3.7196, -5.3901, 61.4292, 2.2480, -4.9620, 1.8731],
+    [35.0831, -44.1164, 3.7933, 35.0232, -40.0716, 1.5901, 1.8645],
+    [22.7233, 20.0904, -46.6940, 23.0331, 14.9730, -42.5619, 2.0373],
+    [36.4612, 47.8580, 18.3852, 36.2715, 50.5065, 21.2231, 1.4146],
+    [90.8027, -2.0831, 1.4410, 91.1528, -1.6435, 0.0447, 1.4441],
+    [90.9257, -0.5406, -0.9208, 88.6381, -0.8985, -0.7239, 1.5381],
+    [6.7747, -0.2908, -2.4247, 5.8714, -0.0985, -2.2286, 0.6377],
+    [2.0776, 0.0795, -1.1350, 0.9033, -0.0636, -0.5514, 0.9082],
+])
+
+
+def test_de2000_matches_sharma_reference_pairs():
+    first, second, expected = SHARMA_PAIRS[:, :3], SHARMA_PAIRS[:, 3:6], SHARMA_PAIRS[:, 6]
+    np.testing.assert_allclose(np.diag(delta_e2000(first, second)), expected, atol=5e-5)
+    np.testing.assert_allclose(np.diag(delta_e2000(second, first)), expected, atol=5e-5)   # Symmetric
+
+
+def test_l1_matcher_matches_match_batch():
+    table = resolve_anchor_table("bricklink_colours.json")
+    hsv = np.random.default_rng(0).integers(0, 256, (5000, 3), dtype=np.uint8)
+    color_ids, magnitude, confidence = make_matcher(table, "l1")(hsv)
+    expected_ids, drift, expected_confidence = match_batch(hsv, table)
+    np.testing.assert_array_equal(color_ids, expected_ids)
+    np.testing.assert_array_equal(magnitude, np.abs(drift).sum(axis=1))
+    np.testing.assert_array_equal(confidence, expected_confidence)
+
+
+def test_empty_tables_return_no_match():
+    hsv = np.full((4, 3), 100, dtype=np.uint8)
+    for metric in ("l1", "de76", "de2000"):
+        color_ids, distance, confidence = make_matcher(AnchorTable(np.empty((0, 3)), []), metric)(hsv)
+        assert color_ids.tolist() == [-1] * 4
+        assert np.isinf(distance).all() and not confidence.any()
+    color_ids, _, _ = match_lab(np.zeros((2, 3)), LabAnchorTable(np.empty((0, 3)), []), candidates=4)
+    assert color_ids.tolist() == [-1, -1]
@@ -0,0 +1,52 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_drift_history.py
+# Purpose: Regression tests for the per-colour drift time series
+# Scope: summary() resolution follows the recorded data, rollup series,
+#        documented memory per (colour, source)
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+
+from drift_history import DriftHistory
+
+T0 = 3600.0 * 1000      # Hour-aligned epoch, far from the wall clock
+
+
+def test_summary_uses_minutes_for_recent_historical_data():
+    history = DriftHistory()
+    history.record_batch([5, 5], [[1, 0, 0], [3, 0, 0]], "cam_A", [T0 + 10, T0 + 1000])
+    # Minute rollups cover start: only the second sample is in range
+    assert history.summary(5, start=T0 + 500)["cam_A"]["count"] == 1
+    assert history.summary(5, start=T0 + 500, resolution="hour")["cam_A"]["count"] == 2
+
+
+def test_summary_falls_back_to_hours_past_minute_retention():
+    history = DriftHistory(minute_slots=60)
+    history.record_batch([5, 5], [[1, 0, 0], [3, 0, 0]], "cam_A", [T0 + 10, T0 + 3 * 3600])
+    report = history.summary(5, start=T0)
+    assert report["cam_A"]["count"] == 2
+    assert report["cam_A"]["mean"] == [2.0, 0.0, 0.0]
+
+
+def test_series_rolls_up_per_minute_and_source():
+    history = DriftHistory()
+    history.record_batch([5, 5, 5, 7], [[1, 0, 0], [3, 0, 0], [0, 2, 0], [9, 9, 9]],
+                         ["cam_A", "cam_A", "cam_B", "cam_A"], [T0 + 1, T0 + 2, T0 + 61, T0 + 1])
+    series = history.series(5)
+    assert series["start"].tolist() == [T0, T0 + 60]
+    assert series["count"].tolist() == [2, 1]
+    np.testing.assert_array_equal(series["mean"], [[2, 0, 0], [0, 2, 0]])
+    assert history.series(5, source="cam_B")["count"].tolist() == [1]
+    assert history.recent(5)["source"] == ["cam_A", "cam_A", "cam_B"]
+
+
+def test_memory_per_color_and_source_matches_docs():
+    history = DriftHistory()
+    history.record(5, [1, 0, 0], "cam_A", T0)
+    one = history.nbytes()
+    history.record(5, [1, 0, 0], "cam_B", T0)
+    per_pair = history.nbytes() - one
+    assert per_pair == (history.slots["minute"] + history.slots["hour"]) * 232
+    assert one - per_pair == history.ring_size * 24
@@ -0,0 +1,49 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_frame_classifier.py
+# Purpose: Regression tests for whole-frame classification
+# Scope: Empty anchor tables, frame/mask validation, histogram folding
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+import pytest
+
+from batch_matcher import AnchorTable
+from frame_classifier import classify_frame, dominant_color
+
+TABLE = AnchorTable(np.array([[10, 100, 100], [120, 200, 50]]), [5, 9])
+
+
+def test_empty_table_returns_no_match():
+    frame = np.full((4, 5, 3), 100, dtype=np.uint8)
+    result = classify_frame(frame, AnchorTable(np.empty((0, 3)), []))
+    assert (result["color_map"] == -1).all()
+    assert result["histogram"] == {}
+    assert result["pixels"] == 20
+    assert dominant_color(result) is None
+
+
+def test_frame_and_mask_are_validated():
+    frame = np.zeros((4, 5, 3), dtype=np.uint8)
+    with pytest.raises(ValueError, match="uint8"):
+        classify_frame(frame.astype(np.float32), TABLE)
+    with pytest.raises(ValueError, match="HxWx3"):
+        classify_frame(frame[..., :2], TABLE)
+    with pytest.raises(ValueError, match="bool"):
+        classify_frame(frame, TABLE, mask=np.ones((4, 5), dtype=np.uint8))
+
+
+def test_masked_pixels_fold_onto_color_ids():
+    frame = np.zeros((3, 4, 3), dtype=np.uint8)
+    frame[:2] = [10, 100, 100]
+    frame[2] = [120, 200, 50]
+    mask = np.ones((3, 4), dtype=bool)
+    mask[0, 0] = False
+    result = classify_frame(frame, TABLE, mask=mask, tile_rows=2)
+
+    assert result["color_map"][0, 0] == -1
+    assert result["histogram"] == {5: {"pixels": 7, "confidence": 1.0},
+                                   9: {"pixels": 4, "confidence": 1.0}}
+    assert result["pixels"] == 11
+    assert dominant_color(result) == 5
@@ -0,0 +1,62 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_grid_presistence.py
+# Purpose: Regression tests for the columnar grid snapshot
+# Scope: Exact grid → snapshot → grid round-trips (dict and SampleStore grids)
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+from grid_presistence import load_grid, load_grid_snapshot, save_grid_snapshot
+from load_area_array import load_area_array
+from sample_store import SampleStore
+
+
+def _samples():
+    return [
+        {"h": 10, "s": 200, "v": 150, "source": "cam_A"},
+        {"h": 10, "s": 200, "v": 150, "source": "cam_B", "timestamp": 12.5},
+        {"h": 11, "s": 201, "v": 149, "source": "cam_A"},
+        {"h": 90, "s": 40, "v": 30},
+    ]
+
+
+def _grid(store=None):
+    grid = {
+        (0, 255, 128): {"color_id": 5, "sample_density": 0, "pole_locked": False,
+                        "samples": [], "anchor": {"h": 0, "s": 255, "v": 128}, "drift": []},
+        (1, 2, 3): {"color_id": None, "note": {"odd": [1, 2]}, "samples": [{"h": 1, "x": "y"}]},
+    }
+    load_area_array(_samples(), grid, store=store)
+    return grid
+
+
+def _as_lists(grid):
+    return {key: {field: list(value) if field in ("samples", "drift") else value
+                  for field, value in node.items()}
+            for key, node in grid.items()}
+
+
+def test_snapshot_round_trips_dict_grid_exactly(tmp_path):
+    grid = _grid()
+    path = tmp_path / "grid.bbgrid"
+    save_grid_snapshot(path, grid)
+    loaded = load_grid(path)
+
+    assert loaded == grid
+    assert list(loaded) == list(grid)
+    for key in grid:
+        assert list(loaded[key]) == list(grid[key])
+        for before, after in zip(grid[key].get("samples", []), loaded[key].get("samples", [])):
+            assert list(after) == list(before)
+
+
+def test_snapshot_round_trips_store_backed_grid(tmp_path):
+    store = SampleStore()
+    grid = _grid(store)
+    path = tmp_path / "grid.bbgrid"
+    save_grid_snapshot(path, grid)
+
+    snapshot = load_grid_snapshot(path)
+    assert snapshot["sample_hsv"].shape == (4, 3)
+    assert snapshot["drift"].shape == (4, 3)
+    assert snapshot.to_grid() == _as_lists(grid)
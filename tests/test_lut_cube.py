@@ -0,0 +1,62 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_lut_cube.py
+# Purpose: Regression tests for the memory-mapped lookup cube cache
+# Scope: Meta validation before mapping, bounded number of cached cubes, optional confidence cube
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import json
+import os
+
+import numpy as np
+
+from batch_matcher import AnchorTable
+from lut_cube import load_lut_cube
+
+
+def _table(shift):
+    return AnchorTable(np.array([[10 + shift, 100, 100], [120, 200, 50]]), [5, 9])
+
+
+def _cubes(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith(".json"))
+
+
+def test_cache_keeps_newest_cubes(tmp_path):
+    cache_dir = str(tmp_path)
+    for shift in range(3):
+        cube = load_lut_cube(_table(shift), cache_dir, keep=2)
+    assert len(_cubes(cache_dir)) == 2
+    assert len(os.listdir(cache_dir)) == 6
+    assert cube.classify(np.array([[10 + 2, 100, 100]], dtype=np.uint8))[0].tolist() == [5]
+
+
+def test_bad_meta_forces_rebuild(tmp_path):
+    cache_dir = str(tmp_path)
+    cube = load_lut_cube(_table(0), cache_dir)
+    meta_path = os.path.join(cache_dir, _cubes(cache_dir)[0])
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["shape"] = [16, 16, 16]
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+    reloaded = load_lut_cube(_table(0), cache_dir)
+    assert reloaded.source_hash == cube.source_hash
+    with open(meta_path) as f:
+        assert json.load(f)["shape"] == [256, 256, 256]
+
+
+def test_confidence_cube_only_built_when_requested(tmp_path):
+    cache_dir = str(tmp_path)
+    cube = load_lut_cube(_table(0), cache_dir, with_confidence=False)
+    assert cube.confidence is None
+    assert not any(name.endswith(".conf.npy") for name in os.listdir(cache_dir))
+    with open(os.path.join(cache_dir, _cubes(cache_dir)[0])) as f:
+        assert json.load(f)["confidence"] is False
+
+    cube = load_lut_cube(_table(0), cache_dir)      # Meta says no confidence: rebuild with it
+    ids, conf = cube.classify(np.array([[10, 100, 100]], dtype=np.uint8))
+    assert ids.tolist() == [5] and conf.tolist() == [1.0]
+    assert any(name.endswith(".conf.npy") for name in os.listdir(cache_dir))
@@ -0,0 +1,84 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_palette_cache.py
+# Purpose: Regression tests for the compiled palette cache
+# Scope: Round-trip, invalidation on source change, corrupt/truncated files,
+#        per-path cache keys
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import json
+import os
+import shutil
+
+import pytest
+
+from palette_cache import cache_path, compile_palette, load_palette, read_palette_cache, save_palette_cache
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / "bricklink_colours.json")
+    shutil.copy("bricklink_colours.json", path)
+    return path
+
+
+def _expected(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_round_trip_reproduces_the_json(source, tmp_path):
+    path = str(tmp_path / "palette.bbpal")
+    save_palette_cache(compile_palette(source), path)
+    palette = read_palette_cache(path)
+    assert palette.to_dict() == _expected(source)
+    assert palette.source == compile_palette(source).source
+
+
+def test_cache_is_used_until_the_source_changes(source, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    first = load_palette(source, cache_dir)
+    assert os.path.exists(cache_path(source, cache_dir))
+    assert load_palette(source, cache_dir).source == first.source
+
+    os.utime(source, ns=(0, 0))                          # Touched, same content: no recompile
+    touched = load_palette(source, cache_dir)
+    assert touched.source["sha256"] == first.source["sha256"]
+    assert read_palette_cache(cache_path(source, cache_dir)).source["mtime_ns"] == 0
+
+    data = _expected(source)
+    entry = next(iter(data.values()))
+    entry["colourName"] = "Renamed"
+    with open(source, "w") as f:
+        json.dump(data, f)
+    changed = load_palette(source, cache_dir)
+    assert changed.entry(entry["colourID"])["colourName"] == "Renamed"
+    assert read_palette_cache(cache_path(source, cache_dir)).to_dict() == data
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: data[:len(data) // 2],                  # Truncated arrays
+    lambda data: data[:20],                              # Truncated header
+    lambda data: data[:12] + b"{" * (len(data) - 12),    # Garbled header JSON
+    lambda data: b"",
+])
+def test_corrupt_cache_is_recompiled(source, tmp_path, corrupt):
+    cache_dir = str(tmp_path / "cache")
+    load_palette(source, cache_dir)
+    path = cache_path(source, cache_dir)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(corrupt(data))
+
+    assert read_palette_cache(path) is None
+    assert load_palette(source, cache_dir).to_dict() == _expected(source)
+    assert read_palette_cache(path).to_dict() == _expected(source)
+
+
+def test_same_name_in_different_dirs_gets_separate_caches(source, tmp_path):
+    other = tmp_path / "other"
+    other.mkdir()
+    assert cache_path(source) != cache_path(str(other / "bricklink_colours.json"))
+    assert os.path.basename(cache_path(source)).startswith("bricklink_colours.json.")
@@ -0,0 +1,111 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_palette_table.py
+# Purpose: Regression tests for the shared struct-of-arrays PaletteTable
+# Scope: Duplicate color_id handling, journal replay overwrites, standalone views;
+#        values read from a view never alias table storage
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import gc
+import json
+import shutil
+
+import numpy as np
+import pytest
+
+from color_node import ColorNode
+from colorreferance import ColorReference, ColorRegistry
+from palette_table import STANDALONE_TABLE, PaletteTable
+
+TOLERANCE = {"hue": 12, "sat": 20, "val": 25}
+
+
+def test_duplicate_color_id_raises_instead_of_clobbering():
+    table = PaletteTable()
+    row = table.add(5, anchor=[0, 255, 128])
+    with pytest.raises(ValueError):
+        table.add(5, anchor=[90, 10, 10])
+    assert table.anchor[row].tolist() == [0, 255, 128]
+
+    assert table.add(5, anchor=[90, 10, 10], replace=True) == row
+    assert len(table) == 1
+    assert table.anchor[row].tolist() == [90, 10, 10]
+
+
+def test_none_color_ids_get_their_own_rows():
+    table = PaletteTable()
+    a = table.add(None, anchor=[1, 1, 1])
+    b = table.add(None, anchor=[2, 2, 2])
+    assert a != b
+    assert table.anchor[[a, b]].tolist() == [[1, 1, 1], [2, 2, 2]]
+
+
+def test_registry_views_reject_duplicates_but_replay_replaces(tmp_path):
+    path = str(tmp_path / "ColorReference.json")
+    shutil.copy("ColorReference.json", path)
+    with open(path) as f:
+        entry = json.load(f)[0]
+
+    registry = ColorRegistry(path)
+    with pytest.raises(ValueError):
+        ColorReference(entry, registry.table)
+
+    moved = dict(entry, drift_center=[3.0, 250.0, 120.0])
+    with open(path + ".journal", "w") as f:
+        f.write(json.dumps(moved) + "\n")
+    replayed = ColorRegistry(path)
+    assert len(replayed.table) == len(registry.table)
+    assert replayed.registry[entry["color_id"]].drift_center.tolist() == [3.0, 250.0, 120.0]
+
+
+def test_standalone_views_share_one_table_without_clobbering():
+    a = ColorNode(5, "Red", [255, 0, 0], [0, 255, 128], "Solid", TOLERANCE, 6.0)
+    b = ColorNode(5, "Red", [255, 0, 0], [10, 200, 100], "Solid", TOLERANCE, 6.0)
+    assert a._table is b._table is STANDALONE_TABLE
+    assert a.hsv_anchor.tolist() == [0, 255, 128]
+    assert b.hsv_anchor.tolist() == [10, 200, 100]
+
+    row = b._row
+    del b
+    gc.collect()
+    c = ColorNode(6, "Blue", [0, 0, 255], [120, 255, 128], "Solid", TOLERANCE, 6.0)
+    assert c._row == row                    # Released rows are recycled
+    assert a.hsv_anchor.tolist() == [0, 255, 128]
+
+
+def test_held_standalone_values_survive_row_recycling():
+    a = ColorNode(5, "Red", [255, 0, 0], [0, 255, 128], "Solid", TOLERANCE, 6.0)
+    anchor, tolerance = a.hsv_anchor, a.tolerance
+    del a
+    gc.collect()
+    ColorNode(6, "Blue", [0, 0, 255], [120, 255, 128], "Solid", {"hue": 1, "sat": 2, "val": 3}, 6.0)
+    assert anchor.tolist() == [0, 255, 128]
+    assert dict(tolerance) == TOLERANCE     # The mapping keeps its view (and row) alive
+
+
+def _entry(color_id, center):
+    return {"color_id": color_id, "color_name": str(color_id), "anchor_center": center,
+            "drift_center": center, "reset_center": center, "tolerance": TOLERANCE}
+
+
+def test_values_read_from_a_view_are_copies_across_growth():
+    table = PaletteTable(capacity=1)
+    ref = ColorReference(_entry(5, [0, 255, 128]), table)
+    center = ref.drift_center
+    center += 1                             # The caller's copy, not the table row
+    assert ref.drift_center.tolist() == [0, 255, 128]
+    ColorReference(_entry(6, [120, 255, 128]), table)      # Forces _grow()
+    ref.drift_center = [3, 250, 120]
+    assert center.tolist() == [1, 256, 129]
+    assert ref.drift_center.tolist() == [3, 250, 120]
+    assert table.drift_center[table.row(5)].tolist() == [3, 250, 120]
+
+
+def test_apply_drift_leaves_earlier_reads_alone():
+    node = ColorNode(5, "Red", [255, 0, 0], [0, 255, 128], "Solid", TOLERANCE, 6.0)
+    old = node.drift_center
+    node.add_sample([4, 251, 124])
+    assert old.tolist() == [0, 255, 128]
+    assert np.allclose(node.drift_center - old, node.last_drift_vector)
+    assert (node.last_drift_vector != 0).any()
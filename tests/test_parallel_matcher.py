@@ -0,0 +1,38 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_parallel_matcher.py
+# Purpose: Regression tests for process-pool batch matching
+# Scope: Sharded results are identical to batch_matcher.match_batch
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+
+from batch_matcher import AnchorTable, match_batch
+from lut_cube import resolve_anchor_table
+from parallel_matcher import ParallelMatcher
+
+
+def _assert_same(expected, result):
+    for want, got in zip(expected, result):
+        np.testing.assert_array_equal(got, want)
+        assert got.dtype == want.dtype
+
+
+def test_sharded_results_match_match_batch():
+    table = resolve_anchor_table("bricklink_colours.json")
+    rng = np.random.default_rng(0)
+    uint8_hsv = rng.integers(0, 256, (1000, 3), dtype=np.uint8)
+    float_hsv = rng.uniform(0, 255, (777, 3))
+
+    with ParallelMatcher(table, workers=2, shard=128) as matcher:
+        _assert_same(match_batch(uint8_hsv, table), matcher.match_batch(uint8_hsv))
+        _assert_same(match_batch(float_hsv, table), matcher.match_batch(float_hsv))
+        assert len(matcher.match_indices(np.zeros((0, 3), dtype=np.uint8))) == 0
+
+
+def test_empty_table_matches_match_batch():
+    table = AnchorTable(np.empty((0, 3)), [])
+    hsv = np.full((5, 3), 100, dtype=np.uint8)
+    with ParallelMatcher(table, workers=1) as matcher:
+        _assert_same(match_batch(hsv, table), matcher.match_batch(hsv))
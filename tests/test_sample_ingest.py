@@ -0,0 +1,48 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_sample_ingest.py
+# Purpose: Regression tests for the asyncio ingest service
+# Scope: Failing sources end cleanly and surface their error; CameraSource read()
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from batch_matcher import AnchorTable
+from sample_ingest import CameraSource, FakeCameraSource, IngestService, ingest_all, make_capture
+
+TABLE = AnchorTable(np.array([[10, 10, 10], [100, 100, 100]]), [1, 2])
+
+
+class BrokenCamera(CameraSource):
+    async def captures(self):
+        yield make_capture(self.name, "p0", [[10, 10, 10]])
+        raise OSError("camera unplugged")
+
+
+def test_failing_source_raises_instead_of_hanging():
+    recording = [{"part_id": i, "hsv": [[100, 100, 100]]} for i in range(3)]
+    service = IngestService(TABLE, batch_timeout=0)
+    service.add_source(BrokenCamera("cam_A"))
+    service.add_source(FakeCameraSource("cam_B", recording, interval=0.01))
+    results = []
+
+    async def consume():
+        async for result in service.run():
+            results.append(result)
+
+    with pytest.raises(OSError, match="unplugged"):
+        asyncio.run(asyncio.wait_for(consume(), timeout=5))
+    assert any(r["source"] == "cam_A" and r["part_id"] == "p0" for r in results)
+
+
+def test_camera_source_reads_until_none():
+    frames = iter([("p0", [[10, 10, 10]]), ("p1", [[100, 100, 100], [99, 99, 99]]), None])
+    results, stats = asyncio.run(ingest_all(TABLE, [CameraSource("cam_A", lambda: next(frames))]))
+
+    assert [r["part_id"] for r in results] == ["p0", "p1"]
+    assert [r["color_ids"].tolist() for r in results] == [[1], [2, 2]]
+    assert stats["cam_A"]["captures"] == 2
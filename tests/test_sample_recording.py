@@ -0,0 +1,86 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_sample_recording.py
+# Purpose: Regression tests for binary sample recordings and their replay
+# Scope: Write/read round-trip (mmap and in-memory), crashed-writer recovery,
+#        batched drift replay
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import json
+
+import numpy as np
+
+from drift_history import DriftHistory
+from drift_replay import replay_recording
+from sample_recording import MAGIC, RECORD_DTYPE, RecordingWriter, read_recording
+from utils import convert_hue
+
+CAPTURES = [
+    ("cam_A", 17, [[0, 255, 128], [1, 250, 130]], 1000.0),
+    ("cam_B", "p-2", [[120, 200, 50]], 1001.5),
+    ("cam_A", 17, [[2.6, 249.4, 131.0]], 1002.0),       # Floats are rounded to uint8
+]
+
+
+def _write(path):
+    with RecordingWriter(path, hue_scale="opencv") as rec:
+        for source, part, hsv, timestamp in CAPTURES:
+            rec.write(hsv, source, part_id=part, timestamp=timestamp)
+        rec.label(17, 5)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "run.bbrec")
+    _write(path)
+    for mmap in (True, False):
+        recording = read_recording(path, mmap=mmap)
+        assert recording.complete
+        assert len(recording) == 4
+        assert recording.sources == ["cam_A", "cam_B"]
+        assert recording.parts == [17, "p-2"]
+        assert recording.labels == {0: 5}
+        assert recording.hsv.tolist() == [[0, 255, 128], [1, 250, 130], [120, 200, 50], [3, 249, 131]]
+        assert recording.truth().tolist() == [5, 5, -1, 5]
+        captures = list(recording.captures())
+        assert [(c["source"], c["part_id"], c["timestamp"], len(c["hsv"])) for c in captures] == \
+            [("cam_A", 17, 1000.0, 2), ("cam_B", "p-2", 1001.5, 1), ("cam_A", 17, 1002.0, 1)]
+
+
+def test_crashed_writer_keeps_whole_records(tmp_path):
+    path = str(tmp_path / "crash.bbrec")
+    with RecordingWriter(path) as rec:
+        rec.write([[10, 20, 30], [40, 50, 60]], "cam_A", part_id=1, timestamp=5.0)
+    with open(path, "r+b") as f:                            # Cut the footer, leave a torn record
+        f.truncate(len(MAGIC) + 2 * RECORD_DTYPE.itemsize + 3)
+
+    recording = read_recording(path)
+    assert not recording.complete
+    assert recording.hsv.tolist() == [[10, 20, 30], [40, 50, 60]]
+    assert recording.sources == ["source_0"]
+
+
+def test_batched_replay_feeds_drift_history(tmp_path):
+    with open("ColorReference.json") as f:
+        reference = json.load(f)
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / "synthetic.bbrec")
+    with RecordingWriter(path) as rec:
+        for part in range(20):
+            entry = reference[part % len(reference)]
+            center = convert_hue(np.array(entry["anchor_center"], dtype=float), "degrees", "opencv")
+            hsv = center + rng.normal(0, 2, (10, 3))
+            hsv[:, 0] %= 180
+            rec.write(hsv, f"cam_{'AB'[part % 2]}", part_id=part, timestamp=1_700_000_000 + part)
+            rec.label(part, entry["color_id"])
+
+    history = DriftHistory()
+    batched = replay_recording(path, batch_size=32, history=history)
+    assert batched["batch_size"] == 32
+    assert sum(len(history.recent(cid)["timestamp"]) for cid in history.colors()) == 200
+    assert set(history.sources) == {"cam_A", "cam_B"}
+
+    # Without drift, batching cannot change which reference a sample matches
+    frozen = [replay_recording(path, {"dampener": 0.0}, batch_size=size) for size in (1, 32)]
+    assert frozen[0]["sample_accuracy"] == frozen[1]["sample_accuracy"]
+    assert frozen[0]["part_accuracy"] == frozen[1]["part_accuracy"]
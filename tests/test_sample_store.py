@@ -0,0 +1,51 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_sample_store.py
+# Purpose: Regression tests for the columnar SampleStore
+# Scope: Per-node row index, hsv validation, store-backed load_area_array
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+import pytest
+
+from load_area_array import load_area_array
+from sample_store import SampleStore
+
+
+def test_node_rows_follow_appends_and_extends():
+    store = SampleStore(capacity=2)
+    a, b = store.node_id("a"), store.node_id("b")
+    store.append({"h": 1, "s": 2, "v": 3}, "a")
+    store.extend([[4, 5, 6], [7, 8, 9], [10, 11, 12]], [b, a, b])
+    store.append({"h": 13, "s": 14, "v": 15, "source": "cam_B"}, "b")
+
+    assert store.rows_for(a).tolist() == [0, 2]
+    assert store.rows_for(b).tolist() == [1, 3, 4]
+    view = store.view("b")
+    assert len(view) == 3
+    assert view.hsv().tolist() == [[4, 5, 6], [10, 11, 12], [13, 14, 15]]
+    assert view[-1] == {"h": 13, "s": 14, "v": 15, "source": "cam_B"}
+
+
+def test_uint8_store_rejects_values_it_would_truncate():
+    store = SampleStore()
+    with pytest.raises(ValueError):
+        store.append({"h": 300, "s": 10, "v": 10}, "a")
+    with pytest.raises(ValueError):
+        store.extend([[10.5, 10, 10]], store.node_id("a"))
+    assert len(store) == 0
+
+    wide = SampleStore(hsv_dtype=np.float32)
+    wide.append({"h": 300.5, "s": 10, "v": 10}, "a")
+    assert wide.view("a").hsv().tolist() == [[300.5, 10, 10]]
+
+
+def test_store_backed_area_array_matches_lists():
+    samples = [{"h": h % 3, "s": 10, "v": 20 + h, "source": "cam_A"} for h in range(9)]
+    plain, backed = {}, {}
+    expected = load_area_array(samples, plain)
+    assert load_area_array(samples, backed, store=SampleStore()) == expected
+    for key, node in plain.items():
+        assert list(backed[key]["samples"]) == node["samples"]
+        assert list(backed[key]["drift"]) == node["drift"]
@@ -0,0 +1,96 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_shared_registry.py
+# Purpose: Regression tests for the memory-mapped registry seqlock
+# Scope: Cross-process reader/writer consistency, torn-read retry,
+#        magic/version and truncation checks
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from shared_registry import RegistryPublisher, RegistryReader
+
+GENERATIONS = 3000
+
+
+def _publish(publisher, g):
+    """Generation g: every field encodes g, so a torn read shows up as mixed values."""
+    n = 1 + g % 7
+    publisher.publish(np.arange(n) + g, np.full((n, 3), g), np.full((n, 3), g), np.full(n, g), np.full(n, g % 2))
+
+
+def _writer(path, ready):
+    publisher = RegistryPublisher(path, capacity=8)
+    ready.set()
+    for g in range(1, GENERATIONS + 1):
+        _publish(publisher, g)
+    publisher.close()
+
+
+def _assert_consistent(reader):
+    g = reader.generation
+    n = 1 + g % 7
+    assert reader.color_ids.tolist() == list(range(g, g + n))
+    assert (reader.drift_center == g).all() and reader.drift_center.shape == (n, 3)
+    assert (reader.tolerance == g).all() and (reader.max_drift == g).all()
+    assert (reader.locked == g % 2).all()
+
+
+def test_reader_never_sees_a_torn_generation(tmp_path):
+    path = str(tmp_path / "registry.bin")
+    RegistryPublisher(path, capacity=8).close()
+    ctx = multiprocessing.get_context("fork")
+    ready = ctx.Event()
+    writer = ctx.Process(target=_writer, args=(path, ready))
+    writer.start()
+    ready.wait(5)
+
+    reader = RegistryReader(path)
+    adopted = 0
+    while writer.is_alive() or reader.generation < GENERATIONS:
+        if reader.refresh():
+            adopted += 1
+            _assert_consistent(reader)
+    writer.join(10)
+    assert writer.exitcode == 0
+    assert reader.generation == GENERATIONS
+    assert adopted > 1
+    reader.close()
+
+
+def test_reader_retries_while_a_publish_is_in_progress(tmp_path):
+    path = str(tmp_path / "registry.bin")
+    publisher = RegistryPublisher(path, capacity=8)
+    _publish(publisher, 1)
+    reader = RegistryReader(path, max_retries=5)
+    _assert_consistent(reader)
+
+    publisher.region.header[2] += 1                 # Writer stalled mid-publish (odd sequence)
+    with pytest.raises(TimeoutError):
+        reader.refresh()
+    publisher.region.header[2] += 1                 # Publish finished without new data
+    assert reader.refresh() is True and reader.generation == 1
+    _publish(publisher, 2)
+    assert reader.refresh() is True
+    _assert_consistent(reader)
+    assert reader.refresh() is False                # Unchanged sequence: no work
+    reader.close()
+    publisher.close()
+
+
+def test_open_rejects_foreign_or_truncated_regions(tmp_path):
+    foreign = tmp_path / "foreign.bin"
+    foreign.write_bytes(b"BBSREG0\0" + bytes(4096))   # Older layout version
+    with pytest.raises(ValueError, match="layout version"):
+        RegistryReader(str(foreign))
+
+    path = str(tmp_path / "registry.bin")
+    RegistryPublisher(path, capacity=8).close()
+    with open(path, "r+b") as f:
+        f.truncate(200)
+    with pytest.raises(ValueError, match="truncated"):
+        RegistryReader(path)
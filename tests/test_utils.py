@@ -0,0 +1,27 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_utils.py
+# Purpose: Regression tests for the vectorized colour conversions
+# Scope: uint8 rgb_to_hsv stays bit-exact with the OpenCV-generated palette
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+
+from utils import _U8_CHUNK, regenerate_palette_hsv, rgb_to_hsv
+
+
+def test_palette_hsv_matches_opencv_values():
+    # bricklink_colours.json hsv fields came from cv2.cvtColor(COLOR_RGB2HSV)
+    assert regenerate_palette_hsv(write=False) == []
+
+
+def test_uint8_path_is_blockwise_consistent():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (_U8_CHUNK + 17, 3), dtype=np.uint8)
+    hsv = rgb_to_hsv(frame)
+    assert hsv.dtype == np.uint8
+    for i in rng.integers(0, len(frame), 50):
+        assert hsv[i].tolist() == rgb_to_hsv(frame[i:i + 1])[0].tolist()
+    assert rgb_to_hsv(np.array([[0, 0, 0], [255, 0, 0], [0, 0, 255]], dtype=np.uint8)).tolist() == \
+        [[0, 0, 0], [0, 255, 255], [120, 255, 255]]
@@ -0,0 +1,27 @@
+# ------------------------------------------------------------
+# 🧪 Module: tests/test_voxel_area_array.py
+# Purpose: Regression tests for VoxelAreaArray
+# Scope: Out-of-range samples are rejected, not clipped into edge voxels
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import numpy as np
+
+from load_area_array import VoxelAreaArray, load_area_array_voxels
+
+
+def test_out_of_range_samples_are_rejected():
+    voxels = VoxelAreaArray()
+    index, drift, confidence = voxels.ingest(np.array([[300, 10, 10], [255, 10, 10], [-1, 0, 0]]))
+    assert index[0] == -1 and index[2] == -1
+    assert voxels.rejected == 2
+    assert voxels.count.sum() == 1
+    assert confidence.tolist() == [0.0, 1.0, 0.0]
+
+
+def test_records_for_rejected_samples():
+    voxels = VoxelAreaArray()
+    records = load_area_array_voxels(np.array([[256, 0, 0], [8, 8, 8]]), voxels)
+    assert records[0]["center"] is None and records[0]["color_id"] is None
+    assert records[1]["center"] == (10, 10, 10)
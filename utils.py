@@ -0,0 +1,280 @@
+# ------------------------------------------------------------
+# 🧱 Tool: utils.py
+# Purpose: Vectorized colour-space conversion for BrickBeast
+# Scope: Batched RGB ↔ HSV ↔ CIELAB on uint8 / float32 arrays of any (..., 3) shape
+# Features:
+#   - Explicit hue scales: "opencv" (0–180, used by bricklink_colours.json),
+#     "full" (0–255) and "degrees" (0–360, used by ColorReference.json centers);
+#     S and V are always 0–255; convert_hue() moves between them
+#   - RGB is always 0–255 (uint8 or float); Lab is float32 (D65, sRGB)
+#   - Optional out= buffers so frames convert without new allocations
+#   - Large arrays are converted in chunks to keep temporaries bounded
+#   - Regenerates the hsv fields of bricklink_colours.json from rgb / hex
+# Created by: Craig Wilson / Copilot
+# Last Updated: 2026-10-17
+# ------------------------------------------------------------
+
+import json
+import os
+
+import numpy as np
+
+HUE_SCALES = {"opencv": 180.0, "full": 256.0, "degrees": 360.0}
+CHUNK = 1 << 20
+
+# sRGB (D65) → XYZ, and the D65 white point
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+], dtype=np.float32)
+_XYZ_TO_RGB = np.linalg.inv(_RGB_TO_XYZ.astype(np.float64)).astype(np.float32)
+_WHITE = np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+
+
+def _hue_period(hue_scale):
+    try:
+        return HUE_SCALES[hue_scale]
+    except KeyError:
+        raise ValueError(f"Unknown hue scale: {hue_scale} (expected one of {sorted(HUE_SCALES)})")
+
+
+def _prepare(values, out, out_dtype):
+    values = np.asarray(values)
+    if values.shape[-1] != 3:
+        raise ValueError(f"Expected (..., 3) colour array, got shape {values.shape}")
+    if out is None:
+        out = np.empty(values.shape, dtype=out_dtype)
+    elif out.shape != values.shape:
+        raise ValueError(f"out shape {out.shape} does not match input {values.shape}")
+    return values.reshape(-1, 3), out.reshape(-1, 3), out
+
+
+def _store(target, result):
+    if np.issubdtype(target.dtype, np.integer):
+        np.rint(result, out=result)
+        np.clip(result, 0, np.iinfo(target.dtype).max, out=result)
+    target[...] = result
+
+
+# ----------------------------
+# RGB ↔ HSV
+# ----------------------------
+
+_HSV_SHIFT = 12
+_U8_CHUNK = 1 << 16     # Pixels per integer-path block: temporaries stay in cache
+_DIV_TABLES = {}
+
+
+def _div_tables(period):
+    # OpenCV's fixed-point reciprocal tables for the 8-bit RGB→HSV path
+    if period not in _DIV_TABLES:
+        i = np.arange(256, dtype=np.float64)
+        with np.errstate(divide="ignore"):
+            sdiv = np.where(i > 0, np.rint((255 << _HSV_SHIFT) / i), 0)
+            hdiv = np.where(i > 0, np.rint((int(period) << _HSV_SHIFT) / (6 * i)), 0)
+        # int32 is enough: 255 * (255 << 12) and 1275 * (256 << 12) / 6 both fit
+        _DIV_TABLES[period] = (sdiv.astype(np.int32), hdiv.astype(np.int32))
+    return _DIV_TABLES[period]
+
+
+def _rgb_to_hsv_u8(block, period, out):
+    """
+    Integer path, bit-exact with cv2.cvtColor(COLOR_RGB2HSV / COLOR_RGB2HSV_FULL).
+    max/min stay uint8 and the fixed-point maths runs in place in int32.
+    """
+    sdiv, hdiv = _div_tables(period)
+    r, g, b = block[:, 0], block[:, 1], block[:, 2]
+    v = np.maximum(np.maximum(r, g), b)
+    diff = v - np.minimum(np.minimum(r, g), b)
+    d = diff.astype(np.int32)
+    half = 1 << (_HSV_SHIFT - 1)
+
+    s = d * sdiv[v]
+    s += half
+    s >>= _HSV_SHIFT
+    ri, gi, bi = r.astype(np.int32), g.astype(np.int32), b.astype(np.int32)
+    h = np.where(v == r, gi - bi, np.where(v == g, bi - ri + 2 * d, ri - gi + 4 * d))
+    h *= hdiv[diff]
+    h += half
+    h >>= _HSV_SHIFT
+    h[h < 0] += int(period)
+    out[:, 0] = h
+    out[:, 1] = s
+    out[:, 2] = v
+
+
+def rgb_to_hsv(rgb, hue_scale="opencv", out=None):
+    """
+    RGB (0–255) → HSV. uint8 input gives uint8 output unless out says otherwise;
+    uint8 → uint8 with "opencv" / "full" is bit-exact with cv2.cvtColor, which is
+    how the hsv fields in bricklink_colours.json were produced.
+    """
+    rgb = np.asarray(rgb)
+    period = _hue_period(hue_scale)
+    flat_in, flat_out, out = _prepare(rgb, out, np.uint8 if rgb.dtype == np.uint8 else np.float32)
+    exact = rgb.dtype == np.uint8 and flat_out.dtype == np.uint8 and hue_scale != "degrees"
+
+    if exact:
+        for start in range(0, len(flat_in), _U8_CHUNK):
+            _rgb_to_hsv_u8(flat_in[start:start + _U8_CHUNK], period, flat_out[start:start + _U8_CHUNK])
+        return out
+
+    for start in range(0, len(flat_in), CHUNK):
+        block = flat_in[start:start + CHUNK].astype(np.float32)
+        r, g, b = block[:, 0], block[:, 1], block[:, 2]
+        v = block.max(axis=1)
+        delta = v - block.min(axis=1)
+        s = np.where(v > 0, delta * 255 / np.maximum(v, 1e-6), 0)
+
+        safe = np.maximum(delta, 1e-6)
+        h = np.where(v == r, (g - b) / safe,
+            np.where(v == g, 2 + (b - r) / safe, 4 + (r - g) / safe)) * 60
+        h = np.where(delta > 0, h % 360, 0) * (period / 360)
+        if np.issubdtype(flat_out.dtype, np.integer):
+            h = np.rint(h) % period
+
+        _store(flat_out[start:start + CHUNK], np.stack([h, s, v], axis=1))
+    return out
+
+
+def hsv_to_rgb(hsv, hue_scale="opencv", out=None):
+    """HSV (hue in hue_scale, S/V 0–255) → RGB 0–255."""
+    hsv = np.asarray(hsv)
+    period = _hue_period(hue_scale)
+    flat_in, flat_out, out = _prepare(hsv, out, np.uint8 if hsv.dtype == np.uint8 else np.float32)
+
+    for start in range(0, len(flat_in), CHUNK):
+        block = flat_in[start:start + CHUNK].astype(np.float32)
+        h = (block[:, 0] * (6.0 / period)) % 6.0
+        s = block[:, 1] / 255
+        v = block[:, 2]
+
+        sector = np.floor(h).astype(np.int64)
+        frac = h - sector
+        p = v * (1 - s)
+        q = v * (1 - s * frac)
+        t = v * (1 - s * (1 - frac))
+        choices = np.stack([
+            np.stack([v, t, p], 1), np.stack([q, v, p], 1), np.stack([p, v, t], 1),
+            np.stack([p, q, v], 1), np.stack([t, p, v], 1), np.stack([v, p, q], 1),
+        ])
+        result = choices[sector % 6, np.arange(len(block))]
+        _store(flat_out[start:start + CHUNK], result)
+    return out
+
+
+# ----------------------------
+# RGB ↔ CIELAB
+# ----------------------------
+
+_LINEAR_U8 = None
+
+
+def _linearize(block, integral):
+    global _LINEAR_U8
+    if integral:
+        # 256-entry gamma table for uint8 input
+        if _LINEAR_U8 is None:
+            c = np.arange(256, dtype=np.float64) / 255
+            _LINEAR_U8 = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4).astype(np.float32)
+        return _LINEAR_U8[block]
+    c = block.astype(np.float32) / 255
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+
+def rgb_to_lab(rgb, out=None):
+    """RGB (0–255, sRGB D65) → CIELAB float32 (L 0–100)."""
+    rgb = np.asarray(rgb)
+    flat_in, flat_out, out = _prepare(rgb, out, np.float32)
+    integral = rgb.dtype == np.uint8
+
+    for start in range(0, len(flat_in), CHUNK):
+        xyz = _linearize(flat_in[start:start + CHUNK], integral) @ _RGB_TO_XYZ.T
+        xyz /= _WHITE
+        f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+        lab = np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+        _store(flat_out[start:start + CHUNK], lab)
+    return out
+
+
+def lab_to_rgb(lab, out=None):
+    """CIELAB → RGB 0–255 (float32 unless out is uint8); out-of-gamut values are clipped."""
+    lab = np.asarray(lab, dtype=np.float32)
+    flat_in, flat_out, out = _prepare(lab, out, np.float32)
+
+    for start in range(0, len(flat_in), CHUNK):
+        block = flat_in[start:start + CHUNK]
+        fy = (block[:, 0] + 16) / 116
+        f = np.stack([fy + block[:, 1] / 500, fy, fy - block[:, 2] / 200], axis=1)
+        xyz = np.where(f > 6 / 29, f ** 3, 3 * (6 / 29) ** 2 * (f - 4 / 29)) * _WHITE
+        linear = np.clip(xyz @ _XYZ_TO_RGB.T, 0, 1)
+        srgb = np.where(linear <= 0.0031308, linear * 12.92, 1.055 * linear ** (1 / 2.4) - 0.055)
+        _store(flat_out[start:start + CHUNK], np.clip(srgb * 255, 0, 255))
+    return out
+
+
+def hsv_to_lab(hsv, hue_scale="opencv", out=None):
+    return rgb_to_lab(hsv_to_rgb(np.asarray(hsv, dtype=np.float32), hue_scale), out=out)
+
+
+def convert_hue(hsv, from_scale, to_scale, out=None):
+    """
+    Rescales the hue channel between conventions, e.g. ColorReference.json
+    centers (hue in "degrees") → bricklink_colours.json ("opencv").
+    """
+    hsv = np.asarray(hsv)
+    if out is None:
+        out = np.array(hsv, dtype=np.float32 if hsv.dtype.kind != "f" else hsv.dtype)
+    else:
+        out[...] = hsv
+    src, dst = _hue_period(from_scale), _hue_period(to_scale)
+    hue = out[..., 0] * (dst / src)
+    if np.issubdtype(out.dtype, np.integer):
+        hue = np.rint(hue) % dst
+    out[..., 0] = hue
+    return out
+
+
+def hex_to_rgb(hex_code):
+    code = hex_code.lstrip("#")
+    return [int(code[i:i + 2], 16) for i in (0, 2, 4)]
+
+
+# ----------------------------
+# Palette Maintenance
+# ----------------------------
+
+def regenerate_palette_hsv(filepath="bricklink_colours.json", hue_scale="opencv", write=True):
+    """
+    Recomputes every entry's hsv from its rgb (or hex when rgb is missing).
+
+    Returns:
+        list: [(colourID, old_hsv, new_hsv), ...] for entries that changed
+    """
+    with open(filepath, "r") as f:
+        palette = json.load(f)
+
+    entries = list(palette.values())
+    rgb = np.array([e.get("rgb") or hex_to_rgb(e["hex"]) for e in entries], dtype=np.uint8).reshape(-1, 3)
+    hsv = rgb_to_hsv(rgb, hue_scale).tolist()
+
+    changed = []
+    for entry, new in zip(entries, hsv):
+        if entry.get("hsv") != new:
+            changed.append((entry["colourID"], entry.get("hsv"), new))
+            entry["hsv"] = new
+
+    if write and changed:
+        tmp = f"{filepath}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(palette, f, indent=2)
+        os.replace(tmp, filepath)
+    return changed
+
+
+if __name__ == "__main__":
+    changes = regenerate_palette_hsv()
+    print(f"{len(changes)} palette hsv entries regenerated")
+    for cid, old, new in changes:
+        print(f"  {cid}: {old} → {new}")